@@ -3,21 +3,32 @@
 # Example: If bfabric_web_apps is version 0.1.3, bfabric_web_app_template must also be 0.1.3.
 # Verify and update versions accordingly before running the application.
 
-from dash import Input, Output, State, html, dcc
+from dash import Input, Output, State, html, dcc, ctx, no_update
 import dash_bootstrap_components as dbc
 import bfabric_web_apps
+from utils.bfabric_wrappers import install_wrappers
+install_wrappers()  # Before generic.callbacks binds the library functions
 from generic.callbacks import app
 from generic.components import no_auth
-from pathlib import Path
 from dash.dash_table import DataTable
-import os
-import pandas as pd
-from bfabric_web_apps.utils.redis_queue import q
-from bfabric_web_apps import run_main_job, get_logger, read_file_as_bytes, dataset_to_dictionary
+from bfabric_web_apps import get_logger, dataset_to_dictionary
 from datetime import datetime
-from utils.samplesheet_utils import create_sample_sheet_csv
+import uuid
+from utils.cache_utils import make_cache_key
+from utils.session_utils import save_dataset, touch_dataset, load_dataset, get_dataset_handle
+from utils.run_history import get_last_run
+from utils.table_utils import create_table_session, get_table_page, get_table_df, update_page_selection, get_selected_row_ids, ROW_ID_COLUMN
+from utils.pipeline_utils import DEFAULT_FASTA, DEFAULT_GTF
+from utils.progress_utils import get_active_progress, compute_eta
+from utils.results_store import list_matrices, get_matrix, read_matrix_page
+from utils.qc_analytics import find_counts_matrix, get_qc, QC_TOP_GENES
+from utils.lazy_imports import lazy_import
+from utils.log_sink import buffered_logger
+from utils.queue_utils import start_queue_snapshotter, get_queue_update
+from utils.submit_utils import enqueue_submission, get_submit_status
 from utils.layout_components import app_specific_layout, documentation_content, app_title
 
+np = lazy_import("numpy")
 
 
 ######################################################################################################
@@ -82,8 +93,8 @@ def populate_default_values(entity_data, app_data):
         # If no entity data is provided, return default values
         return "Unknown", None, None
     name = entity_data.get("name", "Unknown")
-    fasta = "FASTA_1"
-    gtf = "GTF_1"
+    fasta = DEFAULT_FASTA
+    gtf = DEFAULT_GTF
     return name, fasta, gtf
 
 
@@ -100,10 +111,22 @@ def populate_default_values(entity_data, app_data):
     Input("entity", "data"),
 )
 def update_dataset(entity_data):
+    """
+    Store the dataset server-side and keep only its handle in the browser.
+    """
     if not entity_data: 
         return {}
-    df = dataset_to_dictionary(entity_data.get("full_api_response", {}))
-    return df
+
+    # Keyed by entity id and modification time: an edited dataset gets a fresh session.
+    full_api_response = entity_data.get("full_api_response", {})
+    handle = make_cache_key(full_api_response.get("id"), entity_data.get("modified"))
+    if not touch_dataset(handle):
+        dataset = dataset_to_dictionary(full_api_response)
+        if not dataset:
+            return {}
+        save_dataset(dataset, handle)
+
+    return {"handle": handle, "entity_id": full_api_response.get("id")}
 
 
 
@@ -112,11 +135,11 @@ def update_dataset(entity_data):
 # ------------------------------------------------------------------------------
 @app.callback(
     Output('auth-div', 'children'),
+    Output("table-session", "data"),
     Input("dataset", "data"),
-    State("token_data", "data"),
-    State("entity", "data")
+    State("token_data", "data")
 )
-def load_dataset_to_ui(data, token_data, entity_data):
+def load_dataset_to_ui(data, token_data):
     """
     Disables the sidebar inputs if the user is not authenticated
     or if DEV mode is toggled. Also displays user/entity data in `auth-div`.
@@ -133,26 +156,34 @@ def load_dataset_to_ui(data, token_data, entity_data):
         disabled = False
 
     # Prepare the content for the 'auth-div'
-    if not entity_data or not token_data:
-        # Not authenticated or no entity data
+    table_session = None
+    if not token_data:
+        # Not authenticated
         auth_div_content = html.Div(children=no_auth)
     else:
-        # If token and entity data exist, display them
+        # If token and dataset exist, display them
         try:
+            handle = get_dataset_handle(data)
 
-            df = pd.DataFrame(data) 
-
-            if df.empty:
-                return html.Div("No dataset loaded")
+            if not handle:
+                return html.Div("No dataset loaded"), None
 
             else:
+                # The dataset stays server-side; the table only fetches the visible page.
+                table_session = create_table_session(handle)
+                columns = list(load_dataset(handle).keys())
+
                 table = DataTable(
                 id='datatable',
-                data=df.to_dict('records'),        
-                columns=[{"name": i, "id": i} for i in df.columns], 
-                selected_rows=[i for i in range(len(df))],
+                data=[],
+                columns=[{"name": i, "id": i} for i in columns],
                 row_selectable='multi',
-                page_action="native",
+                page_action="custom",
+                sort_action="custom",
+                sort_mode="multi",
+                filter_action="custom",
+                filter_query="",
+                sort_by=[],
                 page_current=0,
                 page_size=15,
                 style_data={
@@ -180,7 +211,15 @@ def load_dataset_to_ui(data, token_data, entity_data):
 
                 auth_div_content = html.Div([
                     html.H4("Dataset"),
-                    table
+                    dcc.Dropdown(
+                        id="datatable-columns",
+                        options=[{"label": i, "value": i} for i in columns],
+                        value=columns,
+                        multi=True,
+                        style={"maxWidth": "90%", "marginBottom": "10px", "fontSize": "0.85rem"}
+                    ),
+                    table,
+                    html.Div(id="datatable-selection-summary", style={"fontSize": "0.85rem", "marginTop": "5px"})
                 ])
                         
         except Exception as e:
@@ -188,10 +227,276 @@ def load_dataset_to_ui(data, token_data, entity_data):
             auth_div_content = html.P(f"Error Logging into B-Fabric: {str(e)}")
 
     return (
-        auth_div_content
+        auth_div_content,
+        table_session
     )
 
 
+# ------------------------------------------------------------------------------
+# 4) CALLBACKS FOR SERVER-SIDE PAGING, FILTERING, SORTING AND SELECTION
+# ------------------------------------------------------------------------------
+@app.callback(
+    Output("datatable", "data"),
+    Output("datatable", "columns"),
+    Output("datatable", "page_count"),
+    Output("datatable", "selected_rows"),
+    Input("datatable", "page_current"),
+    Input("datatable", "page_size"),
+    Input("datatable", "sort_by"),
+    Input("datatable", "filter_query"),
+    Input("datatable-columns", "value"),
+    State("table-session", "data"),
+)
+def update_table_page(page_current, page_size, sort_by, filter_query, columns, table_session):
+    """
+    Send only the visible page and columns of the dataset to the browser.
+    """
+    records, page_count, selected_rows = get_table_page(
+        table_session, page_current or 0, page_size, sort_by, filter_query, columns
+    )
+    visible_columns = [{"name": i, "id": i} for i in columns or [] if i != ROW_ID_COLUMN]
+    return records, visible_columns, page_count, selected_rows
+
+
+@app.callback(
+    Output("datatable-selection-summary", "children"),
+    Input("datatable", "selected_rows"),
+    State("datatable", "data"),
+    State("table-session", "data"),
+)
+def update_table_selection(selected_rows, page_data, table_session):
+    """
+    Keep the row selection server-side, so it survives paging and filtering.
+    """
+    page_data = page_data or []
+    page_row_ids = [row[ROW_ID_COLUMN] for row in page_data]
+    selected_row_ids = [page_data[i][ROW_ID_COLUMN] for i in selected_rows or [] if i < len(page_data)]
+    update_page_selection(table_session, page_row_ids, selected_row_ids)
+
+    df = get_table_df(table_session)
+    return f"{len(get_selected_row_ids(table_session, df))} of {len(df)} samples selected"
+
+
+# ------------------------------------------------------------------------------
+# CALLBACK TO SHOW LIVE PIPELINE PROGRESS
+# ------------------------------------------------------------------------------
+def format_duration(seconds):
+    """Format seconds as e.g. '1h 05m' or '12m'."""
+    minutes = int(seconds // 60)
+    return f"{minutes // 60}h {minutes % 60:02d}m" if minutes >= 60 else f"{minutes}m"
+
+
+@app.callback(
+    Output("pipeline-progress", "children"),
+    Input("progress-interval", "n_intervals"),
+    State("token_data", "data"),
+)
+def update_pipeline_progress(n_intervals, token_data):
+    """
+    Render the per-process progress and ETA the workers publish from the Nextflow trace.
+    """
+    if not token_data:
+        return []
+
+    runs = get_active_progress(token_data.get("user_data"))
+    if not runs:
+        return []
+
+    now = datetime.now().timestamp()
+    cards = [html.H5("Pipeline progress")]
+    for run in runs:
+        processes = run.get("processes", {})
+        done = sum(p["done"] for p in processes.values())
+        failed = sum(p["failed"] for p in processes.values())
+        expected = max(run.get("expected_tasks") or 1, done)
+
+        if run["status"] == "running":
+            eta = compute_eta(run, now)
+            status = f"running for {format_duration(now - run['started'])}"
+            status += f", about {format_duration(eta)} left" if eta is not None else ""
+            value = min(100 * done / expected, 99)
+        else:
+            status = f"{run['status']} after {format_duration(run.get('updated', now) - run['started'])}"
+            value = 100
+
+        slowest = sorted(processes.items(), key=lambda item: -item[1]["realtime_s"])[:3]
+        cards.append(html.Div([
+            html.P(f"Job {run['job_id']}: {done} task(s) done, {failed} failed, {status}",
+                   style={"margin-bottom": "4px", "font-size": "16px"}),
+            dbc.Progress(value=value, color="danger" if run["status"] == "failed" else None,
+                         striped=run["status"] == "running", animated=run["status"] == "running"),
+            html.Small(", ".join(
+                f"{name.split(':')[-1]}: {p['done']} done, {format_duration(p['realtime_s'])}"
+                for name, p in slowest
+            )),
+        ], style={"margin-bottom": "12px"}))
+
+    return cards
+
+
+# ------------------------------------------------------------------------------
+# CALLBACK TO REFRESH THE QUEUE TAB
+# ------------------------------------------------------------------------------
+@app.callback(
+    Output("page-content-queue-children", "children", allow_duplicate=True),
+    Output("queue-version", "data"),
+    Input("queue-interval", "n_intervals"),
+    State("queue-version", "data"),
+    prevent_initial_call=True
+)
+def update_queue_tab(n_intervals, queue_version):
+    """
+    Send the queue layout to this tab only when its snapshot version changed.
+    """
+    layout, version = get_queue_update(queue_version)
+    if layout is None:
+        return no_update, no_update
+    return layout, version
+
+
+# ------------------------------------------------------------------------------
+# CALLBACKS FOR THE RESULTS TAB
+# ------------------------------------------------------------------------------
+RESULTS_DEFAULT_SAMPLES = 10
+
+
+def get_results_dir(dataset_data, fasta, gtf):
+    """
+    Output directory of the last finished run of the open dataset with the
+    selected FASTA/GTF, looked up server-side (never taken from the browser).
+    """
+    last_run = get_last_run((dataset_data or {}).get("entity_id"), fasta, gtf)
+    return last_run["output_dir"] if last_run else None
+
+
+@app.callback(
+    Output("results-run-info", "children"),
+    Output("results-matrix", "options"),
+    Output("results-matrix", "value"),
+    Input("dataset", "data"),
+    Input("fasta", "value"),
+    Input("gtf", "value"),
+)
+def update_results_run(dataset_data, fasta, gtf):
+    """
+    List the matrices of the last finished run in the results tab.
+    """
+    last_run = get_last_run((dataset_data or {}).get("entity_id"), fasta, gtf)
+    if not last_run:
+        return "No finished run of this dataset with the selected FASTA/GTF yet.", [], None
+
+    matrices = [entry["name"] for entry in list_matrices(last_run["output_dir"])]
+    info = f"Run {last_run['output_dir']}, finished {last_run['finished']}, {len(last_run['samples'])} sample(s)."
+    if not matrices:
+        info += " It has no results store."
+    return info, [{"label": name, "value": name} for name in matrices], matrices[0] if matrices else None
+
+
+@app.callback(
+    Output("results-samples", "options"),
+    Output("results-samples", "value"),
+    Input("results-matrix", "value"),
+    State("dataset", "data"),
+    State("fasta", "value"),
+    State("gtf", "value"),
+)
+def update_results_samples(matrix, dataset_data, fasta, gtf):
+    """
+    Offer the sample columns of the chosen matrix; only the first few are read by default.
+    """
+    results_dir = get_results_dir(dataset_data, fasta, gtf)
+    entry = get_matrix(results_dir, matrix) if results_dir and matrix else None
+    if not entry:
+        return [], []
+    return [{"label": s, "value": s} for s in entry["samples"]], entry["samples"][:RESULTS_DEFAULT_SAMPLES]
+
+
+@app.callback(
+    Output("results-table", "data"),
+    Output("results-table", "columns"),
+    Output("results-table", "page_count"),
+    Output("results-table", "page_current"),
+    Input("results-table", "page_current"),
+    Input("results-table", "page_size"),
+    Input("results-samples", "value"),
+    Input("results-search", "value"),
+    State("results-matrix", "value"),
+    State("dataset", "data"),
+    State("fasta", "value"),
+    State("gtf", "value"),
+)
+def update_results_page(page_current, page_size, samples, search, matrix, dataset_data, fasta, gtf):
+    """
+    Read only the visible page and the selected samples from the memory-mapped matrix.
+    """
+    results_dir = get_results_dir(dataset_data, fasta, gtf)
+    entry = get_matrix(results_dir, matrix) if results_dir and matrix else None
+    if not entry:
+        return [], [], 1, 0
+
+    # A new search or sample selection starts on the first page again.
+    if ctx.triggered_id != "results-table":
+        page_current = 0
+
+    page_size = page_size or 20
+    records, n_rows = read_matrix_page(entry, samples, (page_current or 0) * page_size, page_size, search)
+    columns = [{"name": c, "id": c} for c in entry["id_columns"] + [s for s in samples or [] if s in entry["samples"]]]
+    return records, columns, max((n_rows + page_size - 1) // page_size, 1), page_current or 0
+
+
+# Larger cohorts are shown as the first samples in PC1 order, to keep the heatmap responsive
+QC_HEATMAP_MAX_SAMPLES = 200
+
+
+@app.callback(
+    Output("results-qc", "children"),
+    Input("dataset", "data"),
+    Input("fasta", "value"),
+    Input("gtf", "value"),
+)
+def update_results_qc(dataset_data, fasta, gtf):
+    """
+    Plot library sizes, detected genes, PCA and sample correlation of the last run's gene counts.
+    """
+    results_dir = get_results_dir(dataset_data, fasta, gtf)
+    entry = find_counts_matrix(results_dir) if results_dir else None
+    if not entry:
+        return html.P("QC needs the gene count matrix of a finished run.", style={"fontSize": "0.85rem"})
+
+    qc = get_qc(entry)
+    samples = qc["samples"]
+    pca, explained = qc["pca"], qc["explained_variance"]
+
+    library_figure = {
+        "data": [
+            {"type": "bar", "x": samples, "y": qc["library_size"].tolist(), "name": "Library size"},
+            {"type": "scatter", "mode": "markers", "x": samples, "y": qc["detected"].tolist(),
+             "name": "Detected genes", "yaxis": "y2"},
+        ],
+        "layout": {"title": "Library size and detected genes", "yaxis": {"title": "Counts"},
+                   "yaxis2": {"title": "Genes", "overlaying": "y", "side": "right"}},
+    }
+
+    pca_figure = {
+        "data": [{"type": "scatter", "mode": "markers", "x": pca[:, 0].tolist(),
+                  "y": pca[:, 1].tolist() if pca.shape[1] > 1 else [0] * len(samples), "text": samples}],
+        "layout": {"title": f"PCA of the {min(qc['genes'], QC_TOP_GENES)} most variable genes (log2 CPM)",
+                   "xaxis": {"title": f"PC1 ({explained[0]:.0%})"},
+                   "yaxis": {"title": f"PC2 ({explained[1]:.0%})" if len(explained) > 1 else "PC2"}},
+    }
+
+    order = np.argsort(pca[:, 0])[:QC_HEATMAP_MAX_SAMPLES]
+    ordered = [samples[i] for i in order]
+    correlation_figure = {
+        "data": [{"type": "heatmap", "x": ordered, "y": ordered, "colorscale": "Viridis",
+                  "z": np.round(qc["correlation"][np.ix_(order, order)], 3).tolist()}],
+        "layout": {"title": "Sample correlation (Pearson, log2 CPM)"
+                            + (f", first {len(order)} of {len(samples)} samples" if len(order) < len(samples) else "")},
+    }
+
+    return [dcc.Graph(figure=figure) for figure in (library_figure, pca_figure, correlation_figure)]
+
+
 ######################################################################################################
 ############################### STEP 3: Submit the Main Job! #########################################
 ###################################################################################################### 
@@ -201,7 +506,13 @@ def load_dataset_to_ui(data, token_data, entity_data):
         Output("alert-fade-success", "is_open"),
         Output("alert-fade-fail", "is_open"),
         Output("alert-fade-fail", "children"),
-        Output("refresh-workunits", "children")
+        Output("refresh-workunits", "children"),
+        Output("alert-fade-duplicate", "is_open"),
+        Output("alert-fade-duplicate", "children"),
+        Output("alert-fade-pending", "is_open"),
+        Output("alert-fade-pending", "children"),
+        Output("pending-submission", "data"),
+        Output("submit-interval", "disabled"),
     ],
     [Input("Submit", "n_clicks")],  # "Yes!" button inside the modal
     [
@@ -217,6 +528,10 @@ def load_dataset_to_ui(data, token_data, entity_data):
         State("charge_run", "on"),
         State('url', 'search'),
         State("dataset", "data"),
+        State("shards", "value"),
+        State("rerun-mode", "value"),
+        State("table-session", "data"),
+        State("force-rerun", "value"),
     ],
     prevent_initial_call=True
 )
@@ -225,110 +540,100 @@ def run_main_job_callback(n_clicks,
                      ram_val, cpu_val,
                      mail_val, fasta_val,
                      gtf_val,
-                     token_data, queue, charge_run, url_params, dataset):
+                     token_data, queue, charge_run, url_params, dataset_store, shards_val,
+                     rerun_mode, table_session, force_rerun):
     """
+    Record the submission and return right away; the preparation job
+    (utils/submit_utils.py) then builds on the worker:
     1. Files as bytes -> samplesheets usw
     2. Bash Comments -> Run NF Core pipline
     3. Resource Paths
-    4. Attachments Paths
+    4. Attachments -> scanned from the output directory by the worker
     5. Create Charges -> True
     """
 
-    L = get_logger(token_data)
+    # Audit entries are sent to B-Fabric in the background, so the alert does not wait on them.
+    L = buffered_logger(get_logger(token_data))
     try:
-        # Log that the user has initiated the main job pipeline.
-        L.log_operation("Info | ORIGIN: rnaseq web app", "Job started: User initiated main job pipeline.")
-
-
-        # 1. Create samplesheet csv
-        create_sample_sheet_csv(dataset)
-
-        # 2. Files as bytes -> samplesheets usw
-        files_as_byte_strings = {}
-
-        files_as_byte_strings["./samplesheet.csv"] = read_file_as_bytes("./samplesheet.csv")
-        L.log_operation("Info | ORIGIN: rnaseq web app", "Pipeline samplesheet loaded from ./samplesheet.csv.")
-        files_as_byte_strings["./NFC_RNA.config"] = read_file_as_bytes("./NFC_RNA.config")
-        L.log_operation("Info | ORIGIN: rnaseq web app", "NFC_RNA configuration loaded from ./NFC_RNA.config.")
-
-        # 3. Bash command
-
-        timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-        output_dir = "/STORAGE/OUTPUT_rnaseq_" + timestamp
-        work_dir = "/STORAGE/temp_rnaseq_run"
-
-        run_pipeline_command = (
-            f"/home/nfc/.local/bin/nextflow run nf-core/rnaseq "
-            f"--input {work_dir}/samplesheet.csv "
-            f"--fasta {work_dir}/fasta_and_gtf_files/Homo_sapiens.GRCh38.dna.primary_assembly.fa "
-            f"--gtf {work_dir}/fasta_and_gtf_files/Homo_sapiens.GRCh38.109.gtf "
-            f"--skip_trimming "
-            f"--outdir {output_dir} "
-            f"-profile docker "
-            f"--custom_config_base {work_dir}"
-        )
-
-        # Use echo in subprocess
-        bash_command = f'echo "{run_pipeline_command}"'
-        create_out_dir = f"mkdir {output_dir}"
-        delete_old_work_dir = f"rm -Rf {work_dir}/work"
-
-        bash_commands = [delete_old_work_dir, create_out_dir ,bash_command]
-
-        project_id = 37767
-
-        # Update charge_run based on its value
-        if charge_run and project_id:
-            charge_run = [project_id]
-        else:
-            charge_run = []
-
-
-        # 4. Create resource paths mapping file or folder to container IDs.
-        resource_paths = {f'{output_dir}': 37767}
-
-        # 5. Set attachment paths (e.g., for reports)
-        attachment_paths = {
-            f'{output_dir}/multiqc/star_salmon/multiqc_report.html': 'multiqc_report.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_12/qualimapReport.html': 'Run_1913_12_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_11/qualimapReport.html': 'Run_1913_11_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_10/qualimapReport.html': 'Run_1913_10_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_9/qualimapReport.html': 'Run_1913_9_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_6/qualimapReport.html': 'Run_1913_6_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_2/qualimapReport.html': 'Run_1913_2_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_4/qualimapReport.html': 'Run_1913_4_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_1/qualimapReport.html': 'Run_1913_1_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_3/qualimapReport.html': 'Run_1913_3_qualimapReport.html',
-            f'{output_dir}/star_salmon/qualimap/Run_1913_8/qualimapReport.html': 'Run_1913_8_qualimapReport.html',
-            f'{output_dir}/star_salmon/deseq2_qc/deseq2.plots.pdf': 'deseq2.plots.pdf',
-            f'{output_dir}/pipeline_info/execution_report_2025-04-18_11-37-24.html': 'execution_report_2025-04-18_11-37-24.html',
-            f'{output_dir}/multiqc/star_salmon/multiqc_report_plots/pdf/fastqc_raw_per_base_sequence_quality_plot.pdf': 'fastqc_raw_per_base_sequence_quality_plot.pdf',
-            f'{output_dir}/multiqc/star_salmon/multiqc_report_plots/pdf/general_stats_table.pdf': 'general_stats_table.pdf',
-            f'{output_dir}/multiqc/star_salmon/multiqc_report_plots/pdf/dupradar.pdf': 'dupradar.pdf',
-        }
-
-        # 6. Enqueue the main job into the Redis queue for asynchronous execution.        
-        q(queue).enqueue(run_main_job, kwargs={
-            "files_as_byte_strings": files_as_byte_strings,
-            "bash_commands": bash_commands,
-            "resource_paths": resource_paths,
-            "attachment_paths": attachment_paths,
-            "token": url_params,
-            "service_id":bfabric_web_apps.SERVICE_ID,
-            "charge": charge_run
+        # Every submission gets its own job id, which keys all files it ships to the worker.
+        job_id = uuid.uuid4().hex
+
+        # Only the intent is recorded here; a preparation job on the worker loads the
+        # dataset, validates it and enqueues the pipeline, while the browser polls its status.
+        handle = get_dataset_handle(dataset_store)
+        if not touch_dataset(handle):
+            raise KeyError("The dataset session expired; please reload the page.")
+
+        enqueue_submission(job_id, {
+            "name": name_val,
+            "comment": comment_val,
+            "ram": ram_val,
+            "cpus": cpu_val,
+            "mail": mail_val,
+            "fasta": fasta_val,
+            "gtf": gtf_val,
+            "token_data": token_data,
+            "queue": queue,
+            "charge_run": charge_run,
+            "url_params": url_params,
+            "dataset_handle": handle,
+            "entity_id": dataset_store.get("entity_id"),
+            "shards": shards_val,
+            "rerun_mode": rerun_mode,
+            "table_session": table_session,
+            "force": bool(force_rerun),
+            "submitted": datetime.now().timestamp(),
         })
+        L.log_operation("Info | ORIGIN: rnaseq web app", f"Job started: User initiated main job pipeline ({job_id}).")
 
-
-        # Log that the job was submitted successfully.
-        L.log_operation("Info | ORIGIN: rnaseq web app", f"Job submitted successfully to {queue} Redis queue.")
-        # Return success alert open, failure alert closed, no error message, and a success message.
-        return True, False, "", "Job submitted successfully"
+        return False, False, "", no_update, False, "", True, f"Preparing job {job_id} ...", {"job_id": job_id}, False
 
     except Exception as e:
         # Log that the job submission failed.
         L.log_operation("Info | ORIGIN: rnaseq web app", f"Job submission failed: {str(e)}")
         # If an error occurs, return failure alert open with the error message.
-        return False, True, f"Job submission failed: {str(e)}", "Job submission failed"
+        return False, True, f"Job submission failed: {str(e)}", "Job submission failed", False, "", False, "", None, True
+
+
+@app.callback(
+    [
+        Output("alert-fade-success", "is_open", allow_duplicate=True),
+        Output("alert-fade-fail", "is_open", allow_duplicate=True),
+        Output("alert-fade-fail", "children", allow_duplicate=True),
+        Output("refresh-workunits", "children", allow_duplicate=True),
+        Output("alert-fade-duplicate", "is_open", allow_duplicate=True),
+        Output("alert-fade-duplicate", "children", allow_duplicate=True),
+        Output("alert-fade-pending", "is_open", allow_duplicate=True),
+        Output("alert-fade-pending", "children", allow_duplicate=True),
+        Output("pending-submission", "data", allow_duplicate=True),
+        Output("submit-interval", "disabled", allow_duplicate=True),
+    ],
+    Input("submit-interval", "n_intervals"),
+    State("pending-submission", "data"),
+    prevent_initial_call=True
+)
+def poll_submission(n_intervals, pending):
+    """
+    Follow the preparation job of the last submit and show its outcome.
+    """
+    job_id = (pending or {}).get("job_id")
+    record = get_submit_status(job_id) if job_id else None
+    if record is None:
+        return False, False, "", no_update, False, "", False, "", None, True
+
+    status, message = record["status"], record["message"]
+    if status == "queued":
+        return (no_update,) * 6 + (True, f"Job {job_id} is waiting for a worker to prepare it ...", no_update, False)
+    if status in ("preparing", "enqueuing"):
+        return (no_update,) * 6 + (True, f"Preparing job {job_id} ...", no_update, False)
+
+    # Final: close the pending alert, stop polling and open the alert of the outcome.
+    done = (False, "", None, True)
+    if status == "submitted":
+        return (True, False, "", "Job submitted successfully", False, "") + done
+    if status == "failed":
+        return (False, True, message, "Job submission failed", False, "") + done
+    return (False, False, "", no_update, True, message) + done
 
 
 # ------------------------------------------------------------------------------
@@ -336,6 +641,9 @@ def run_main_job_callback(n_clicks,
 # ------------------------------------------------------------------------------
 if __name__ == "__main__":
 
+    # One background snapshotter (elected across processes) builds the queue tab for all users.
+    start_queue_snapshotter()
+
     app.run(
         debug=bfabric_web_apps.DEBUG,
         port=bfabric_web_apps.PORT,
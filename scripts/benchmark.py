@@ -0,0 +1,273 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import argparse
+import gc
+import json
+import tempfile
+import time
+import tracemalloc
+
+# ------------------------------------------------------------------------------
+# BENCHMARK OF THE APP'S CALLBACKS AND SUBMIT PATH
+# ------------------------------------------------------------------------------
+# Runs the callbacks directly against synthetic B-Fabric dataset responses,
+# an in-memory Redis (fakeredis) and a stubbed B-Fabric logger, and reports
+# latency, peak Python memory and payload size per callback and dataset size.
+#
+#   python scripts/benchmark.py --sizes 10 1000 50000
+#   python scripts/benchmark.py --output results.json
+#   python scripts/benchmark.py --baseline results.json --max-slowdown 1.5
+DEFAULT_SIZES = [10, 100, 1000, 10000, 50000]
+LANES_PER_SAMPLE = 1
+MIN_REGRESSION_SECONDS = 0.01  # Slowdowns below this are timer noise
+
+
+def install_fake_redis():
+    """
+    Point the shared Redis connection at fakeredis before the app modules import it.
+    """
+    try:
+        import fakeredis
+    except ImportError:
+        sys.exit("The benchmark needs fakeredis: pip install fakeredis")
+
+    from bfabric_web_apps.utils import redis_connection, redis_queue, callbacks
+
+    fake = fakeredis.FakeRedis()
+    redis_connection.redis_conn = fake
+    redis_queue.conn = fake
+    callbacks.redis_conn = fake
+    return fake
+
+
+class StubLogger:
+    """
+    Stands in for the B-Fabric logger: records operations without any API call.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.jobid = 0
+        self.operations = []
+        self.logs = []
+        self.power_user_wrapper = self
+
+    def log_operation(self, operation, message, params=None, flush_logs=True):
+        self.operations.append((operation, message))
+        self.logs.append(message)
+
+    def save(self, endpoint, obj):
+        return [obj]
+
+
+def make_dataset_response(n_samples, lanes=LANES_PER_SAMPLE, dataset_id=1):
+    """
+    Build a synthetic B-Fabric dataset API response with n_samples paired-end samples.
+    """
+    attributes = ["Sample", "FASTQ Read 1", "FASTQ Read 2", "Order", "Species"]
+    items = []
+    for i in range(n_samples):
+        for lane in range(lanes):
+            values = [
+                f"sample_{i:05d}",
+                f"/STORAGE/benchmark/p1000/sample_{i:05d}_L{lane:03d}_R1.fastq.gz",
+                f"/STORAGE/benchmark/p1000/sample_{i:05d}_L{lane:03d}_R2.fastq.gz",
+                "37767",
+                "Homo sapiens",
+            ]
+            items.append({"field": [
+                {"attributeposition": str(position), "value": value}
+                for position, value in enumerate(values, start=1)
+            ]})
+
+    return {
+        "id": dataset_id,
+        "attribute": [{"name": name, "position": position} for position, name in enumerate(attributes, start=1)],
+        "item": items,
+    }
+
+
+def payload_size(value):
+    """
+    Size in bytes of a callback result as Dash would send it to the browser.
+    """
+    import plotly
+    return len(json.dumps(value, cls=plotly.utils.PlotlyJSONEncoder).encode("utf-8"))
+
+
+def measure(func, *args, trace_memory=False):
+    """
+    Call func once and return (result, seconds, peak traced memory in bytes or None).
+
+    tracemalloc slows allocation-heavy code down considerably, so memory is only
+    traced on request and such runs are not used for the latency.
+    """
+    gc.collect()
+    if trace_memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    result = func(*args)
+    seconds = time.perf_counter() - start
+    peak = None
+    if trace_memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _enqueued_bytes(fake_redis):
+    jobs = [key for key in fake_redis.keys("rq:job:*") if b":" not in key[len("rq:job:"):]]
+    return sum(len(fake_redis.hget(key, "data") or b"") for key in jobs)
+
+
+def run_benchmarks(sizes, repeat, fake_redis):
+    import index
+    from rq.job import Job
+    from utils import samplesheet_utils, submit_utils
+    from utils.session_utils import load_dataset, get_dataset_handle
+
+    # Stub every B-Fabric round trip of the submit path
+    index.get_logger = StubLogger
+    submit_utils.get_logger = StubLogger
+
+    # The benchmark runs the preparation job itself, as a submit worker would
+    submit_utils.has_submit_worker = lambda: True
+
+    # The synthetic FASTQ paths do not exist, so the file check would reject every submit
+    submit_utils.validate_sample_sheet = lambda samplesheet_df, check_files=True: samplesheet_utils.validate_sample_sheet(
+        samplesheet_df, check_files=False
+    )
+
+    # Load the lazily imported libraries up front, so the first measurement does not include them
+    samplesheet_utils.pd.DataFrame()
+
+    token_data = {"user_data": 1, "environment": "benchmark", "jobId": 1}
+    results = []
+
+    def record(callback, n_samples, seconds, peak, size):
+        results.append({
+            "callback": callback,
+            "samples": n_samples,
+            "seconds": None if peak is not None else seconds,
+            "peak_mb": None if peak is None else peak / 1024 ** 2,
+            "payload_kb": size / 1024,
+        })
+        if peak is None:
+            print(f"{callback:<26} {n_samples:>7} samples  {seconds * 1000:10.1f} ms  {size / 1024:10.1f} KB")
+        else:
+            print(f"{callback:<26} {n_samples:>7} samples  {peak / 1024 ** 2:10.1f} MB peak")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for n_samples in sizes:
+            response = make_dataset_response(n_samples, dataset_id=n_samples)
+
+            # The first pass traces memory, the remaining ones time the callbacks
+            for attempt in range(repeat + 1):
+                trace_memory = attempt == 0
+                fake_redis.flushall()
+                entity_data = {"full_api_response": response, "modified": f"{n_samples}-{attempt}", "name": "benchmark"}
+
+                dataset_store, seconds, peak = measure(index.update_dataset, entity_data, trace_memory=trace_memory)
+                record("update_dataset", n_samples, seconds, peak, payload_size(dataset_store))
+
+                layout, seconds, peak = measure(index.load_dataset_to_ui, dataset_store, token_data, trace_memory=trace_memory)
+                record("load_dataset_to_ui", n_samples, seconds, peak, payload_size(layout))
+
+                dataset = load_dataset(get_dataset_handle(dataset_store))
+                path = f"{tmp_dir}/samplesheet_{n_samples}.csv"
+                _, seconds, peak = measure(samplesheet_utils.create_sample_sheet_csv, dataset, path, trace_memory=trace_memory)
+                record("create_sample_sheet_csv", n_samples, seconds, peak, Path(path).stat().st_size)
+
+                outputs, seconds, peak = measure(
+                    index.run_main_job_callback,
+                    1, "benchmark", "", 32, 8, "", None, None,
+                    token_data, "light", False, "?token=benchmark", dataset_store, 1, "all", None, False,
+                    trace_memory=trace_memory
+                )
+                if not outputs[6]:
+                    print(f"  run_main_job_callback did not submit: {outputs[2]}")
+                    continue
+                record("run_main_job_callback", n_samples, seconds, peak, _enqueued_bytes(fake_redis))
+
+                # Second phase, as the worker runs it
+                prepare_job = Job.fetch(submit_utils.get_prepare_job_id(outputs[8]["job_id"]), connection=fake_redis)
+                fake_redis.delete(prepare_job.key)
+                status, seconds, peak = measure(
+                    lambda: submit_utils.run_prepare_job(**prepare_job.kwargs), trace_memory=trace_memory
+                )
+                if status != "submitted":
+                    print(f"  run_prepare_job did not submit: {submit_utils.get_submit_status(outputs[8]['job_id'])}")
+                record("run_prepare_job", n_samples, seconds, peak, _enqueued_bytes(fake_redis))
+
+    return results
+
+
+def compare_to_baseline(results, baseline_path, max_slowdown):
+    """
+    Print callbacks that got slower than max_slowdown x the baseline; True if none did.
+    """
+    with open(baseline_path) as f:
+        baseline = {(r["callback"], r["samples"]): r for r in json.load(f)}
+
+    ok = True
+    for (callback, n_samples), runs in _group(results).items():
+        reference = baseline.get((callback, n_samples))
+        if not reference:
+            continue
+        seconds = min(r["seconds"] for r in runs)
+        if seconds > reference["seconds"] * max_slowdown and seconds - reference["seconds"] > MIN_REGRESSION_SECONDS:
+            ok = False
+            print(f"REGRESSION {callback} at {n_samples} samples: "
+                  f"{seconds * 1000:.1f} ms vs {reference['seconds'] * 1000:.1f} ms baseline")
+    return ok
+
+
+def _group(results):
+    grouped = {}
+    for result in results:
+        grouped.setdefault((result["callback"], result["samples"]), []).append(result)
+    return grouped
+
+
+def summarize(results):
+    """
+    Keep the best (minimum) latency of repeated runs, the traced memory and the largest payload.
+    """
+    return [
+        {
+            "callback": callback,
+            "samples": n_samples,
+            "seconds": min(r["seconds"] for r in runs if r["seconds"] is not None),
+            "peak_mb": max(r["peak_mb"] for r in runs if r["peak_mb"] is not None),
+            "payload_kb": max(r["payload_kb"] for r in runs),
+        }
+        for (callback, n_samples), runs in _group(results).items()
+    ]
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Benchmark the app's callbacks on synthetic datasets.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                        help="Dataset sizes (number of samples) to benchmark.")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Timed runs per callback and size; the fastest one is reported.")
+    parser.add_argument("--output", help="Write the summarized results to this JSON file.")
+    parser.add_argument("--baseline", help="JSON file of a previous run to compare against.")
+    parser.add_argument("--max-slowdown", type=float, default=1.5,
+                        help="Allowed latency factor over the baseline before failing.")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1.")
+
+    fake_redis = install_fake_redis()
+    summary = summarize(run_benchmarks(args.sizes, args.repeat, fake_redis))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline and not compare_to_baseline(summary, args.baseline, args.max_slowdown):
+        sys.exit(1)
@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import argparse
+import time
+from utils.index_cache import INDEX_CACHE_DIR, MAX_CACHED_INDEXES, MAX_CACHE_BYTES, list_cached_indexes, evict_index_cache
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="List or evict cached STAR/Salmon reference indexes.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    subparsers.add_parser("list", help="List cached indexes, most recently used first.")
+
+    evict_parser = subparsers.add_parser("evict", help="Evict least recently used indexes.")
+    evict_parser.add_argument("--max-entries", type=int, default=MAX_CACHED_INDEXES,
+                              help="Maximum number of cached indexes to keep.")
+    evict_parser.add_argument("--max-gb", type=float, default=MAX_CACHE_BYTES / 1024 ** 3,
+                              help="Maximum total cache size in GB.")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        entries = list_cached_indexes()
+        print(f"{len(entries)} cached index(es) in {INDEX_CACHE_DIR}")
+        for entry in entries:
+            print(
+                f"{entry['key']}  {entry['size_bytes'] / 1024 ** 3:8.1f} GB  "
+                f"last used {time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used']))}  "
+                f"{entry['fasta']} + {entry['gtf']}"
+            )
+    else:
+        evicted = evict_index_cache(max_entries=args.max_entries, max_bytes=int(args.max_gb * 1024 ** 3))
+        print(f"Evicted {len(evicted)} index(es).")
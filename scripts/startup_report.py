@@ -0,0 +1,102 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import argparse
+import os
+import statistics
+import subprocess
+import time
+
+from utils.lazy_imports import STARTUP_DEFERRED_MODULES
+
+# ------------------------------------------------------------------------------
+# COLD START REPORT
+# ------------------------------------------------------------------------------
+# Imports the app in fresh interpreters with `python -X importtime`, reports the
+# cold start and the heaviest imports, and fails when the import time exceeds
+# the budget or a deferred module (pandas, numpy, ...) is loaded at startup.
+#
+#   python scripts/startup_report.py
+#   python scripts/startup_report.py --runs 10 --budget 2.5 --top 20
+REPO_ROOT = Path(__file__).resolve().parent.parent
+IMPORT_TIME_BUDGET = 3.0  # Seconds for `import index` on the web servers
+
+
+def parse_importtime(stderr):
+    """
+    Parse `-X importtime` output.
+
+    Returns:
+        list[tuple]: (module, depth, self seconds, cumulative seconds) in import order.
+    """
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), depth, int(self_us) / 1e6, int(cumulative_us) / 1e6))
+    return entries
+
+
+def measure_cold_start(module):
+    """
+    Import module in a fresh interpreter.
+
+    Returns:
+        tuple: (wall seconds of the whole process, parsed importtime entries)
+    """
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=REPO_ROOT, capture_output=True, text=True, env=dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+    )
+    wall = time.perf_counter() - start
+    if result.returncode != 0:
+        sys.exit(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+    return wall, parse_importtime(result.stderr)
+
+
+if __name__ == "__main__":
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description="Report the cold start time of the app.")
+    parser.add_argument("--module", default="index", help="Module whose import is measured.")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters; the median is reported.")
+    parser.add_argument("--budget", type=float, default=IMPORT_TIME_BUDGET,
+                        help="Maximum median import time in seconds.")
+    parser.add_argument("--top", type=int, default=15, help="Number of heaviest imports to list.")
+    args = parser.parse_args()
+
+    walls, import_times, runs = [], [], []
+    for _ in range(args.runs):
+        wall, entries = measure_cold_start(args.module)
+        walls.append(wall)
+        import_times.append(sum(cumulative for _, depth, _, cumulative in entries if depth == 0))
+        runs.append(entries)
+
+    median_import = statistics.median(import_times)
+    print(f"Cold start of `import {args.module}` over {args.runs} run(s):")
+    print(f"  process wall time  {statistics.median(walls):6.2f} s (median)")
+    print(f"  import time        {median_import:6.2f} s (median, budget {args.budget:.2f} s)")
+
+    # Heaviest imports, by cumulative time of the median run
+    entries = runs[import_times.index(sorted(import_times)[len(import_times) // 2])]
+    print("\nHeaviest imports:")
+    for name, depth, _, cumulative in sorted(
+        (e for e in entries if e[1] <= 1), key=lambda e: -e[3]
+    )[:args.top]:
+        print(f"  {cumulative:6.3f} s  {'  ' * depth}{name}")
+
+    loaded = sorted({name for name, _, _, _ in entries if name.split(".")[0] in STARTUP_DEFERRED_MODULES})
+    deferred_loaded = sorted({name.split(".")[0] for name in loaded})
+
+    ok = True
+    if deferred_loaded:
+        ok = False
+        print(f"\nFAIL: {', '.join(deferred_loaded)} imported at startup; import it with utils.lazy_imports.lazy_import.")
+    if median_import > args.budget:
+        ok = False
+        print(f"\nFAIL: import time {median_import:.2f} s exceeds the budget of {args.budget:.2f} s.")
+
+    sys.exit(0 if ok else 1)
@@ -1,18 +1,34 @@
 import sys
+from pathlib import Path
 sys.path.append("../bfabric-web-apps")
+# Jobs are enqueued as functions of this repository (e.g. utils.job_utils.run_rnaseq_job)
+sys.path.append(str(Path(__file__).resolve().parent.parent))
 
 import argparse
 from bfabric_web_apps import run_worker, REDIS_HOST, REDIS_PORT
+from utils.worker_pool import run_worker_pool
 
 if __name__ == "__main__":
     # Parse command-line arguments
     parser = argparse.ArgumentParser(description="Run worker with specific queues.")
-    parser.add_argument("--queues", type=str, default="light,heavy",
+    # The submit queue gets a worker of its own (--queues submit), so submits are
+    # prepared right away instead of waiting for a pipeline run to finish.
+    parser.add_argument("--queues", type=str, default="light,heavy,transfer",
                         help="Comma-separated list of queue names (e.g., --queues=queue1,queue2)")
+    parser.add_argument("--pool", type=int, default=0,
+                        help="Start this many workers that share the host's CPU/RAM slots (0 = single worker)")
+    parser.add_argument("--cpus", type=int, default=None,
+                        help="CPUs the pool may hand out (default: all host CPUs)")
+    parser.add_argument("--memory-gb", type=int, default=None,
+                        help="Memory in GB the pool may hand out (default: all host memory)")
     args = parser.parse_args()
     
     # Convert the comma-separated string into a list
     queue_names = args.queues.split(",")
     
-    # Run the worker with the specified queue names
-    run_worker(REDIS_HOST, REDIS_PORT, queue_names)
\ No newline at end of file
+    if args.pool:
+        # Run a pool of workers that only start jobs whose declared resources fit
+        run_worker_pool(REDIS_HOST, REDIS_PORT, queue_names, args.pool, cpus=args.cpus, memory_gb=args.memory_gb)
+    else:
+        # Run the worker with the specified queue names
+        run_worker(REDIS_HOST, REDIS_PORT, queue_names)
@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+import pytest
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    Point every loaded app module that uses the shared Redis connection at fakeredis.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    fake = fakeredis.FakeRedis()
+
+    from bfabric_web_apps.utils import redis_connection
+    monkeypatch.setattr(redis_connection, "redis_conn", fake)
+    for name, module in list(sys.modules.items()):
+        if name.startswith(("utils.", "generic.")) and hasattr(module, "redis_conn"):
+            monkeypatch.setattr(module, "redis_conn", fake)
+    return fake
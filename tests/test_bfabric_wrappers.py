@@ -0,0 +1,58 @@
+from datetime import datetime, timedelta
+
+import bfabric_web_apps
+
+from utils import bfabric_wrappers
+from utils.bfabric_wrappers import get_token_cache_ttl, cached_process_url_and_token, TOKEN_EXPIRY_FORMAT
+
+
+def token_data(expires_in):
+    return {"token_expires": (datetime.now() + expires_in).strftime(TOKEN_EXPIRY_FORMAT)}
+
+
+def test_ttl_is_capped_at_token_expiry():
+    assert get_token_cache_ttl(token_data(timedelta(hours=1)), ttl=300) == 300
+    assert 50 <= get_token_cache_ttl(token_data(timedelta(seconds=60)), ttl=300) <= 60
+    assert get_token_cache_ttl(token_data(timedelta(seconds=-5)), ttl=300) == 0
+    assert get_token_cache_ttl({}, ttl=300) == 0
+
+
+def test_sessions_are_cached_until_expiry(fake_redis, monkeypatch):
+    calls = []
+
+    def process_url_and_token(url_params):
+        calls.append(url_params)
+        return "token", token_data(timedelta(hours=1)), {"name": "e"}, {"name": "a"}, "title", [], None
+
+    monkeypatch.setitem(bfabric_wrappers._originals, "process_url_and_token", process_url_and_token)
+
+    assert cached_process_url_and_token("?token=a")[0] == "token"
+    assert cached_process_url_and_token("?token=a")[0] == "token"
+    assert calls == ["?token=a"]
+
+
+def test_incomplete_or_expiring_sessions_are_not_cached(fake_redis, monkeypatch):
+    calls = []
+
+    def process_url_and_token(url_params):
+        calls.append(url_params)
+        if url_params == "?token=expired":
+            return None, None, None, None, " ", None, None
+        return "token", token_data(timedelta(seconds=-1)), {}, {}, "title", [], None
+
+    monkeypatch.setitem(bfabric_wrappers._originals, "process_url_and_token", process_url_and_token)
+
+    for url_params in ("?token=expired", "?token=expired", "?token=old", "?token=old"):
+        cached_process_url_and_token(url_params)
+    assert len(calls) == 4
+
+
+def test_install_replaces_library_functions(monkeypatch):
+    monkeypatch.setattr(bfabric_wrappers, "_originals", {})
+    original = bfabric_web_apps.process_url_and_token
+    monkeypatch.setattr(bfabric_web_apps, "process_url_and_token", original)
+
+    bfabric_wrappers.install_wrappers()
+
+    assert bfabric_web_apps.process_url_and_token is cached_process_url_and_token
+    assert bfabric_wrappers._originals["process_url_and_token"] is original
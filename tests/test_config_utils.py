@@ -0,0 +1,43 @@
+from utils import config_utils
+from utils.config_utils import GB, build_nextflow_config, get_process_resources
+
+
+def test_memory_scales_with_the_fastq_size_of_one_sample_and_is_capped():
+    resources = get_process_resources(ram_gb=64, cpus=8, fastq_bytes=40 * GB, n_samples=4, use_history=False)
+
+    # 10 GB per sample: STAR 32 + 10, Qualimap 4 + 2 x 10
+    assert resources[".*:STAR_ALIGN"] == {"cpus": 8, "memory": 42}
+    assert resources[".*:QUALIMAP_RNASEQ"] == {"cpus": 2, "memory": 24}
+    assert resources[".*:SALMON_QUANT"]["cpus"] == 8
+
+    capped = get_process_resources(ram_gb=16, cpus=4, fastq_bytes=40 * GB, n_samples=4, use_history=False)
+    assert capped[".*:STAR_ALIGN"] == {"cpus": 4, "memory": 16}
+
+
+def test_learned_resources_replace_the_static_model(monkeypatch):
+    monkeypatch.setattr(config_utils, "get_learned_resources",
+                        lambda per_sample_gb: {".*:STAR_ALIGN": {"cpus": 16, "memory": 20.2}})
+
+    resources = get_process_resources(ram_gb=64, cpus=8, fastq_bytes=4 * GB, n_samples=4)
+
+    assert resources[".*:STAR_ALIGN"] == {"cpus": 8, "memory": 21}
+
+
+def test_unavailable_history_falls_back_to_the_static_model(monkeypatch):
+    def fail(per_sample_gb):
+        raise ConnectionError("no redis")
+    monkeypatch.setattr(config_utils, "get_learned_resources", fail)
+
+    assert get_process_resources(32, 4, 0, 1) == get_process_resources(32, 4, 0, 1, use_history=False)
+
+
+def test_config_declares_limits_trace_and_process_requests(monkeypatch):
+    monkeypatch.setattr(config_utils, "get_learned_resources", lambda per_sample_gb: {})
+
+    config = build_nextflow_config(ram_gb="32", cpus="6", fastq_bytes=2 * GB, n_samples=2).decode("utf-8")
+
+    assert "    max_memory = '32 GB'" in config
+    assert "    resourceLimits = [cpus: 6, memory: '32 GB']" in config
+    assert "    raw = true" in config
+    assert "    withName: '.*:STAR_ALIGN' {\n        cpus = 6\n        memory = '32 GB'\n    }" in config
+    assert config.endswith("}\n")
@@ -0,0 +1,110 @@
+import os
+import subprocess
+
+import pytest
+
+from utils import index_cache
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch, fake_redis):
+    monkeypatch.setattr(index_cache, "INDEX_CACHE_DIR", str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+def make_entry(cache_dir, key, last_used):
+    entry_dir = cache_dir / key
+    (entry_dir / "star").mkdir(parents=True)
+    (entry_dir / "star" / "SA").write_bytes(b"x" * 10)
+    (entry_dir / ".complete").touch()
+    (entry_dir / ".last_used").touch()
+    os.utime(entry_dir / ".last_used", (last_used, last_used))
+    return entry_dir
+
+
+def test_evict_skips_pinned_entries(cache_dir):
+    make_entry(cache_dir, "old", 1000)
+    make_entry(cache_dir, "older", 500)
+    make_entry(cache_dir, "new", 2000)
+    index_cache.pin_index("older", "job_1")
+
+    evicted = index_cache.evict_index_cache(max_entries=2)
+
+    assert evicted == ["old"]
+    assert sorted(os.listdir(cache_dir)) == ["new", "older"]
+
+
+def test_unpinned_entry_is_evicted(cache_dir):
+    make_entry(cache_dir, "a", 1000)
+    make_entry(cache_dir, "b", 2000)
+    index_cache.pin_index("a", "job_1")
+    index_cache.unpin_index("a", "job_1")
+
+    assert index_cache.evict_index_cache(max_entries=1) == ["a"]
+
+
+def test_expired_pin_does_not_protect(cache_dir):
+    make_entry(cache_dir, "a", 1000)
+    make_entry(cache_dir, "b", 2000)
+    index_cache.pin_index("a", "lost_job", ttl=-1)
+
+    assert index_cache.evict_index_cache(max_entries=1) == ["a"]
+
+
+def test_lookup_between_pin_check_and_rename_keeps_the_entry(cache_dir, monkeypatch):
+    make_entry(cache_dir, "a", 1000)
+    make_entry(cache_dir, "b", 2000)
+    is_index_pinned = index_cache.is_index_pinned
+    hits = []
+    calls = []
+
+    def racing_is_index_pinned(key):
+        # A job looks the entry up right after the eviction found it unpinned
+        calls.append(key)
+        if len(calls) == 1:
+            pinned = is_index_pinned(key)
+            hits.append(index_cache.get_cached_index(key, job_id="job_1"))
+            return pinned
+        return is_index_pinned(key)
+
+    monkeypatch.setattr(index_cache, "is_index_pinned", racing_is_index_pinned)
+
+    assert index_cache.evict_index_cache(max_entries=1) == ["b"]
+    assert hits[0] is not None
+    assert os.path.exists(hits[0]["star_index"])
+    assert sorted(os.listdir(cache_dir)) == ["a"]
+
+
+def test_cache_hit_pins_for_job(cache_dir):
+    make_entry(cache_dir, "a", 1000)
+
+    assert index_cache.get_cached_index("a", job_id="job_1")["star_index"].endswith("a/star")
+    assert index_cache.is_index_pinned("a")
+    assert index_cache.get_cached_index("missing", job_id="job_1") is None
+    assert not index_cache.is_index_pinned("missing")
+
+
+def run_commands(commands):
+    for command in commands:
+        subprocess.run(["bash", "-c", command], check=True)
+
+
+def test_promote_uses_per_job_tmp_dir_and_keeps_first_entry(cache_dir, tmp_path):
+    output_dir = tmp_path / "out"
+    (output_dir / "genome" / "index" / "star").mkdir(parents=True)
+    (output_dir / "genome" / "index" / "star" / "SA").write_text("first")
+
+    commands = index_cache.build_promote_commands("k", str(output_dir), "g.fa", "g.gtf", "job_1")
+    assert f"{cache_dir}/k.job_1.tmp" in commands[0]
+    cache_dir.mkdir()
+    run_commands(commands)
+
+    entry_dir = cache_dir / "k"
+    assert (entry_dir / ".complete").exists()
+    assert (entry_dir / "star" / "SA").read_text() == "first"
+
+    # A second job promoting the same index leaves the existing entry and no tmp dir behind
+    (output_dir / "genome" / "index" / "star" / "SA").write_text("second")
+    run_commands(index_cache.build_promote_commands("k", str(output_dir), "g.fa", "g.gtf", "job_2"))
+    assert (entry_dir / "star" / "SA").read_text() == "first"
+    assert sorted(os.listdir(cache_dir)) == ["k"]
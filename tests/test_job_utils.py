@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+from utils import job_utils
+from utils.run_history import get_last_run
+from utils.submission_utils import claim_submission, get_submission
+
+TRACE = "task_id\tname\tstatus\n1\tSTAR (s1)\tCOMPLETED\n2\tSALMON (s1)\t{status}\n"
+
+
+class StubLogger:
+    def log_operation(self, *args, **kwargs):
+        pass
+
+
+class StubJob:
+    id = "job1"
+
+
+@pytest.fixture
+def worker(fake_redis, tmp_path, monkeypatch):
+    """
+    Run run_rnaseq_job with run_main_job replaced by one that writes a fake output tree.
+    """
+    attached = []
+    monkeypatch.setattr(job_utils, "process_url_and_token", lambda token: (token, {"user_data": 1}))
+    monkeypatch.setattr(job_utils, "get_logger", lambda token_data: StubLogger())
+    monkeypatch.setattr(job_utils, "get_current_job", lambda: StubJob())
+    monkeypatch.setattr(job_utils, "register_attachments",
+                        lambda token_data, manifest, max_workers: attached.append(manifest))
+
+    def run(task_status="COMPLETED", write_outputs=True, dry_run=False, files_as_byte_strings={}, check_files=False):
+        output_dir = tmp_path / "out"
+        trace_path = tmp_path / "trace.txt"
+
+        def fake_run_main_job(**kwargs):
+            output_dir.mkdir()
+            if write_outputs:
+                (output_dir / "star_salmon").mkdir()
+                (output_dir / "star_salmon" / "salmon.merged.gene_counts.tsv").write_text("gene_id\ts1\ng1\t5\ng2\t0\n")
+                (output_dir / "multiqc" / "star_salmon").mkdir(parents=True)
+                (output_dir / "multiqc" / "star_salmon" / "multiqc_report.html").write_text("<html></html>")
+                trace_path.write_text(TRACE.format(status=task_status))
+
+        monkeypatch.setattr(job_utils, "run_main_job", fake_run_main_job)
+        claim_submission("key", "job1", str(output_dir), "light")
+        job_utils.run_rnaseq_job(
+            files_as_byte_strings=files_as_byte_strings, bash_commands=[], resource_paths={}, token="?token=t",
+            output_dir=str(output_dir), submission_key="key",
+            progress=None if dry_run else {"trace_path": str(trace_path), "expected_tasks": 2},
+            run_record={"entity_id": 7, "fasta": "fa", "gtf": "gtf", "samples": ["s1"]},
+            dry_run=dry_run,
+            check_files=check_files
+        )
+        return output_dir
+
+    run.attached = attached
+    return run
+
+
+def test_successful_run_registers_results_and_finishes_its_submission(worker):
+    output_dir = worker()
+
+    assert get_submission("key")["status"] == "finished"
+    assert get_last_run(7, "fa", "gtf")["output_dir"] == str(output_dir)
+    assert (output_dir / "results_store" / "manifest.json").exists()
+    [manifest] = worker.attached
+    assert sorted(manifest.values()) == ["attachment_manifest.json", "multiqc_report.html"]
+
+
+def test_run_with_failed_tasks_releases_its_submission(worker):
+    with pytest.raises(RuntimeError, match="1 failed task"):
+        worker(task_status="FAILED")
+
+    assert get_submission("key") is None
+    assert get_last_run(7, "fa", "gtf") is None
+    assert worker.attached == []
+
+
+def test_run_without_outputs_fails(worker):
+    with pytest.raises(RuntimeError, match="No merged count matrix"):
+        worker(write_outputs=False)
+
+    assert get_submission("key") is None
+
+
+def test_dry_run_finishes_without_outputs(worker):
+    worker(write_outputs=False, dry_run=True)
+
+    assert get_submission("key")["status"] == "finished"
+    assert [sorted(manifest.values()) for manifest in worker.attached] == [["attachment_manifest.json"]]
+
+
+def test_missing_fastq_files_are_found_before_the_run_when_asked(worker, tmp_path):
+    fastq = tmp_path / "s1_R1.fastq.gz"
+    samplesheet = f"sample,fastq_1,fastq_2,strandedness\ns1,{fastq},,auto\n".encode()
+
+    with pytest.raises(job_utils.SamplesheetValidationError, match="not found"):
+        worker(files_as_byte_strings={"/jobs/job1/samplesheet.csv": samplesheet}, check_files=True)
+    assert get_submission("key") is None
+    assert not (tmp_path / "out").exists()
+
+    fastq.touch()
+    worker(files_as_byte_strings={"/jobs/job1/samplesheet.csv": samplesheet}, check_files=True)
+    assert get_submission("key")["status"] == "finished"
+
+
+@pytest.fixture
+def transfer(fake_redis, tmp_path, monkeypatch):
+    """
+    A finished sharded run with its manifest, and a mounted gstore to stage it to.
+    """
+    gstore = tmp_path / "gstore"
+    gstore.mkdir()
+    monkeypatch.setattr(job_utils.bfabric_web_apps, "GSTORE_REMOTE_PATH", str(gstore))
+    monkeypatch.setattr(job_utils, "process_url_and_token", lambda token: (token, {}))
+    monkeypatch.setattr(job_utils, "get_logger", lambda token_data: StubLogger())
+    monkeypatch.setattr(job_utils, "update_resource_paths", lambda token_data, output_dir, destination: 0)
+
+    output_dir = tmp_path / "out"
+    (output_dir / "multiqc").mkdir(parents=True)
+    (output_dir / "multiqc" / "multiqc_report.html").write_text("<html></html>")
+    report = str(output_dir / "multiqc" / "multiqc_report.html")
+    job_utils.write_manifest(str(output_dir), {report: "multiqc_report.html"})
+    (tmp_path / "out_shards" / "shard_0").mkdir(parents=True)
+    (tmp_path / "out_shards" / "shard_0" / "s1.bam").write_bytes(b"bam")
+
+    return output_dir, gstore / "unknown_entity" / "out"
+
+
+def test_staged_run_and_shards_replace_the_local_copies(transfer):
+    output_dir, destination = transfer
+
+    job_utils.run_transfer_job(str(output_dir), "?token=t", max_workers=2)
+
+    assert (destination / "multiqc" / "multiqc_report.html").read_text() == "<html></html>"
+    assert (destination.parent / "out_shards" / "shard_0" / "s1.bam").read_bytes() == b"bam"
+    assert not output_dir.exists()
+    assert not (output_dir.parent / "out_shards").exists()
+
+
+def test_corrupt_staged_attachment_keeps_the_local_copy(transfer, monkeypatch):
+    output_dir, destination = transfer
+    stage_output_tree = job_utils.stage_output_tree
+
+    def stage_and_corrupt(source, target, max_workers):
+        summary = stage_output_tree(source, target, max_workers)
+        report = os.path.join(target, "multiqc", "multiqc_report.html")
+        if os.path.exists(report):
+            os.remove(report)  # Staged files may be hardlinks of the source
+            with open(report, "w") as f:
+                f.write("x" * len("<html></html>"))  # Same size, other content
+        return summary
+
+    monkeypatch.setattr(job_utils, "stage_output_tree", stage_and_corrupt)
+
+    with pytest.raises(RuntimeError, match="corrupt"):
+        job_utils.run_transfer_job(str(output_dir), "?token=t", max_workers=2)
+    assert (output_dir / "multiqc" / "multiqc_report.html").read_text() == "<html></html>"
+    assert (output_dir.parent / "out_shards").exists()
+
+
+def test_manifest_names_reports_uniquely_and_records_checksums(tmp_path):
+    for path in [
+        "multiqc/star_salmon/multiqc_report.html",
+        "multiqc/star_rsem/multiqc_report.html",
+        "s1/qualimap/s1/qualimapReport.html",
+        "pipeline_info/execution_report_2025-04-18_11-37-24.html",
+        "pipeline_info/execution_trace.txt",
+    ]:
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_text(path)
+
+    manifest = job_utils.scan_output_manifest(str(tmp_path))
+
+    assert sorted(manifest.values()) == [
+        "execution_report_2025-04-18_11-37-24.html",
+        "multiqc_report.html",
+        "multiqc_star_salmon_multiqc_report.html",
+        "s1_qualimapReport.html",
+    ]
+
+    with open(job_utils.write_manifest(str(tmp_path), manifest, max_workers=2)) as f:
+        entries = {entry["name"]: entry for entry in json.load(f)}
+    report = tmp_path / "s1" / "qualimap" / "s1" / "qualimapReport.html"
+    assert entries["s1_qualimapReport.html"]["sha256"] == hashlib.sha256(report.read_bytes()).hexdigest()
+
+
+def test_attachments_are_registered_one_file_per_call(monkeypatch):
+    attached = []
+    monkeypatch.setattr(job_utils, "get_logger", lambda token_data: StubLogger())
+    monkeypatch.setattr(job_utils, "attach_gstore_files_to_entities_as_link",
+                        lambda token_data, logger, attachment_paths: attached.append(attachment_paths))
+
+    job_utils.register_attachments({}, {f"/out/r{i}.html": f"r{i}.html" for i in range(5)}, max_workers=3)
+
+    assert sorted(attached, key=str) == [{f"/out/r{i}.html": f"r{i}.html"} for i in range(5)]
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from pathlib import Path
+
+from utils.lazy_imports import STARTUP_DEFERRED_MODULES
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def run_python(code):
+    """
+    Run code in a fresh interpreter, so modules loaded by other tests do not count.
+    """
+    return subprocess.run([sys.executable, "-c", code], cwd=REPO_ROOT, capture_output=True, text=True)
+
+
+def test_lazy_module_is_loaded_on_first_attribute_access():
+    result = run_python(
+        "import sys\n"
+        "from utils.lazy_imports import lazy_import\n"
+        "pd = lazy_import('pandas')\n"
+        "assert 'pandas.core.frame' not in sys.modules, 'loaded on lazy_import'\n"
+        "pd.DataFrame\n"
+        "assert 'pandas.core.frame' in sys.modules, 'not loaded on access'\n"
+    )
+
+    assert result.returncode == 0, result.stderr
+
+
+def test_app_import_stays_lazy():
+    # A lazily imported module is registered under its own name, but none of its submodules is loaded
+    result = run_python(
+        "import sys\n"
+        "import index\n"
+        f"print(sorted(name for name in sys.modules if '.' in name and name.split('.')[0] in {STARTUP_DEFERRED_MODULES!r}))\n"
+    )
+
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip().splitlines()[-1] == "[]"
@@ -0,0 +1,67 @@
+import threading
+
+import pytest
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from utils import log_sink
+from utils.log_sink import BufferedLogger, flush_logger
+
+
+class FakeLogger:
+    def __init__(self, errors=()):
+        self.jobid = 1
+        self.logs = []
+        self.saved = []
+        self.errors = list(errors)
+        self.power_user_wrapper = self
+
+    def log_operation(self, operation, message, params=None, flush_logs=True):
+        self.logs.append(message)
+
+    def save(self, endpoint, obj):
+        if self.errors:
+            raise self.errors.pop(0)
+        self.saved.append(obj["logthis"])
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(log_sink, "LOG_RETRY_BACKOFF", 0)
+
+
+def buffered(logger, *messages):
+    buffered = BufferedLogger(logger)
+    for message in messages:
+        buffered.log_operation("Info", message, flush_logs=False)
+    return buffered
+
+
+def test_unsent_batch_is_retried():
+    logger = FakeLogger(errors=[ConnectionError("refused")])
+
+    assert flush_logger(buffered(logger, "a", "b"))
+    assert logger.saved == ["a\nb"]
+
+
+def test_batch_that_timed_out_is_not_sent_twice():
+    logger = FakeLogger(errors=[ReadTimeout("no answer")])
+
+    assert not flush_logger(buffered(logger, "a"))
+    assert logger.saved == []
+
+
+def test_retrying_logger_does_not_block_other_loggers():
+    release = threading.Event()
+    slow = FakeLogger()
+    slow.save = lambda endpoint, obj: release.wait(5)
+    fast = FakeLogger()
+    slow_buffered, fast_buffered = buffered(slow, "slow"), buffered(fast, "fast")
+
+    thread = threading.Thread(target=flush_logger, args=(slow_buffered,))
+    thread.start()
+    try:
+        assert flush_logger(fast_buffered)
+        assert fast.saved == ["fast"] and thread.is_alive()
+    finally:
+        release.set()
+        thread.join()
@@ -0,0 +1,50 @@
+import pytest
+
+from utils.pipeline_utils import get_run_key, get_run_dir, build_run_pipeline_command, NEXTFLOW_BIN
+
+DATASET = {"Sample": ["s1", "s2"], "FASTQ Read 1": ["/STORAGE/a.fastq.gz", "/STORAGE/b.fastq.gz"]}
+
+
+def test_run_key_is_stable_and_depends_on_dataset_and_params():
+    key = get_run_key(DATASET, {"fasta": "a.fa", "gtf": "a.gtf"})
+
+    assert key == get_run_key(dict(reversed(DATASET.items())), {"gtf": "a.gtf", "fasta": "a.fa"})
+    assert key != get_run_key(DATASET, {"fasta": "b.fa", "gtf": "a.gtf"})
+    assert key != get_run_key({"Sample": ["s1"], "FASTQ Read 1": ["/STORAGE/a.fastq.gz"]}, {"fasta": "a.fa", "gtf": "a.gtf"})
+    assert len(key) == 16
+
+
+def test_command_resumes_from_the_run_directory_and_writes_a_trace():
+    run_dir = get_run_dir("abc")
+
+    command = build_run_pipeline_command("/in.csv", "/out", run_dir, config_path="/job.config",
+                                         trace_path="/trace.txt")
+
+    assert command.startswith(f"cd {run_dir} && {NEXTFLOW_BIN} run nf-core/rnaseq ")
+    assert f"-work-dir {run_dir}/work" in command
+    assert command.endswith(" -c /job.config -with-trace /trace.txt -resume")
+
+
+@pytest.mark.parametrize("kwargs, present, absent", [
+    ({"resume": False}, [], ["-resume", "-with-trace", "--star_index", "--save_reference"]),
+    ({"star_index": "/idx/star", "salmon_index": "/idx/salmon"}, ["--star_index /idx/star", "--salmon_index /idx/salmon"],
+     ["--save_reference"]),
+    ({"save_reference": True}, ["--save_reference"], ["--star_index"]),
+])
+def test_optional_flags(kwargs, present, absent):
+    command = build_run_pipeline_command("/in.csv", "/out", "/run", **kwargs)
+
+    assert all(flag in command for flag in present)
+    assert not any(flag in command for flag in absent)
+
+
+def test_payload_runs_the_command_unless_dry_run(fake_redis):
+    from utils.job_utils import build_pipeline_payload
+
+    payload = build_pipeline_payload("job1", DATASET, "/out", 32, 4, dry_run=False)
+    dry_payload = build_pipeline_payload("job2", DATASET, "/out", 32, 4, dry_run=True)
+
+    assert payload["bash_commands"][2].startswith("cd ")
+    assert payload["progress"]["trace_path"].endswith("job1_trace.txt")
+    assert dry_payload["bash_commands"][-1].startswith('echo "cd ')
+    assert (dry_payload["progress"], dry_payload["resource_history"], dry_payload["dry_run"]) == (None, None, True)
@@ -0,0 +1,75 @@
+import pytest
+
+from utils.progress_utils import (
+    track_progress, get_active_progress, compute_eta, summarize_tasks, read_trace, get_failed_tasks
+)
+
+TRACE = (
+    "task_id\tname\tprocess\tstatus\trealtime\n"
+    "1\tSTAR (s1)\tNFCORE:STAR\tCOMPLETED\t2000\n"
+    "2\tSALMON (s1)\tNFCORE:SALMON\tFAILED\t500\n"
+    "3\tSALMON (s1)\tNFCORE:SALMON\tCOMPLETED\t1500\n"
+    "4\tSTAR (s2)\tNFCORE:STAR\tFAILED\t100\n"
+)
+
+
+def test_trace_is_summarized_per_process(tmp_path):
+    trace = tmp_path / "trace.txt"
+    trace.write_text(TRACE)
+    tasks = read_trace(str(trace))
+
+    assert summarize_tasks(tasks) == {
+        "NFCORE:STAR": {"done": 1, "failed": 1, "realtime_s": 2.1},
+        "NFCORE:SALMON": {"done": 1, "failed": 1, "realtime_s": 2.0},
+    }
+    assert get_failed_tasks(tasks) == ["STAR (s2)"]
+
+
+def run_tracked(tmp_path, trace_text, user_id=1):
+    trace = tmp_path / "trace.txt"
+    if trace_text is not None:
+        trace.write_text(trace_text)
+    with track_progress("job1", str(trace), expected_tasks=10, user_id=user_id):
+        pass
+    return get_active_progress(user_id)
+
+
+def test_run_with_failed_tasks_is_reported_failed(fake_redis, tmp_path):
+    [run] = run_tracked(tmp_path, TRACE)
+
+    assert (run["job_id"], run["status"], run["failed_tasks"]) == ("job1", "failed", ["STAR (s2)"])
+
+
+def test_run_without_trace_is_reported_failed(fake_redis, tmp_path):
+    [run] = run_tracked(tmp_path, None)
+
+    assert run["status"] == "failed"
+
+
+def test_run_whose_failed_tasks_were_retried_is_reported_finished(fake_redis, tmp_path):
+    [run] = run_tracked(tmp_path, TRACE.rsplit("4\t", 1)[0])
+
+    assert run["status"] == "finished"
+
+
+def test_users_only_see_their_own_runs(fake_redis, tmp_path):
+    run_tracked(tmp_path, TRACE, user_id=1)
+
+    assert [run["job_id"] for run in get_active_progress(1)] == ["job1"]
+    assert get_active_progress(2) == []
+
+
+def test_eta_uses_the_estimate_until_tasks_finished():
+    progress = {"started": 0, "expected_tasks": 10, "estimate_hours": 1, "processes": {}}
+
+    assert compute_eta(progress, now=600) == 3000
+    assert compute_eta(dict(progress, estimate_hours=None), now=600) is None
+
+
+def test_eta_blends_trace_extrapolation_with_the_estimate():
+    progress = {"started": 0, "expected_tasks": 10, "estimate_hours": None,
+                "processes": {"STAR": {"done": 5, "failed": 0, "realtime_s": 0}}}
+
+    assert compute_eta(progress, now=1000) == pytest.approx(1000)
+    # Half done: the 2,000 s projection and the 3,600 s estimate count equally
+    assert compute_eta(dict(progress, estimate_hours=1), now=1000) == pytest.approx(1800)
@@ -0,0 +1,53 @@
+import numpy as np
+import pytest
+
+from utils.qc_analytics import compute_qc, find_counts_matrix, get_qc, log_cpm
+from utils.results_store import convert_count_matrices
+
+
+@pytest.fixture
+def counts(tmp_path):
+    rng = np.random.default_rng(0)
+    values = rng.poisson(rng.gamma(2, 50, size=(200, 1)), size=(200, 6))
+    values[:, 3:] *= np.arange(1, 201)[:, None] % 3  # Two groups of samples
+    lines = ["gene_id\t" + "\t".join(f"s{j}" for j in range(6))]
+    lines += [f"g{i:04d}\t" + "\t".join(map(str, row)) for i, row in enumerate(values)]
+    (tmp_path / "star_salmon").mkdir()
+    (tmp_path / "star_salmon" / "salmon.merged.gene_counts.tsv").write_text("\n".join(lines) + "\n")
+    convert_count_matrices(str(tmp_path))
+    return find_counts_matrix(str(tmp_path)), values.astype(np.float64)
+
+
+def test_chunked_statistics_match_the_whole_matrix(counts):
+    entry, values = counts
+
+    qc = compute_qc(entry, chunk_rows=7, top_genes=50, n_components=3)
+
+    library_sizes = values.sum(axis=0)
+    assert qc["library_size"].tolist() == library_sizes.astype(int).tolist()
+    assert qc["detected"].tolist() == (values > 0).sum(axis=0).tolist()
+    expected_correlation = np.corrcoef(log_cpm(values, library_sizes).T)
+    assert np.allclose(qc["correlation"], expected_correlation, atol=1e-5)
+
+
+def test_pca_uses_the_most_variable_genes(counts):
+    entry, values = counts
+
+    qc = compute_qc(entry, chunk_rows=7, top_genes=50, n_components=3)
+
+    logged = log_cpm(values, values.sum(axis=0))
+    top = np.sort(np.argsort(logged.var(axis=1))[-50:])
+    centered = logged[top] - logged[top].mean(axis=1, keepdims=True)
+    s = np.linalg.svd(centered.T, compute_uv=False)
+    assert qc["pca"].shape == (6, 3)
+    assert np.allclose(qc["explained_variance"], (s ** 2 / (s ** 2).sum())[:3])
+    assert np.allclose(np.abs(qc["pca"][:, 0]), np.abs(np.linalg.svd(centered.T)[0][:, 0] * s[0]), atol=1e-4)
+
+
+def test_qc_is_cached_by_content(fake_redis, counts, monkeypatch):
+    entry, _ = counts
+    first = get_qc(entry)
+
+    monkeypatch.setattr("utils.qc_analytics.compute_qc", lambda *args, **kwargs: pytest.fail("not cached"))
+
+    assert get_qc(entry)["library_size"].tolist() == first["library_size"].tolist()
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import pytest
+from dash.exceptions import PreventUpdate
+
+from utils import queue_utils
+
+
+def test_snapshot_is_served_and_rewritten_only_on_change(fake_redis, monkeypatch):
+    layouts = iter([{"props": {"children": "a"}}, {"props": {"children": "a"}}, {"props": {"children": "b"}}])
+    monkeypatch.setattr(queue_utils, "get_redis_queue_layout", lambda: next(layouts))
+
+    first = queue_utils.publish_queue_snapshot()
+    assert queue_utils.publish_queue_snapshot() == first
+    assert queue_utils.get_queue_layout() == {"props": {"children": "a"}}
+
+    assert queue_utils.publish_queue_snapshot() != first
+    assert queue_utils.get_queue_layout() == {"props": {"children": "b"}}
+    assert 0 < fake_redis.ttl(queue_utils.SNAPSHOT_KEY) <= queue_utils.SNAPSHOT_TTL
+
+
+def test_layout_is_built_directly_without_a_snapshot(fake_redis, monkeypatch):
+    monkeypatch.setattr(queue_utils, "get_redis_queue_layout", lambda: {"props": {"children": "live"}})
+
+    assert queue_utils.get_queue_layout() == {"props": {"children": "live"}}
+
+
+def test_import_does_not_start_the_snapshotter():
+    assert not queue_utils._snapshotter_started
+
+
+def test_update_is_sent_only_when_the_version_changed(fake_redis, monkeypatch):
+    layouts = iter([{"props": {"children": "a"}}, {"props": {"children": "b"}}])
+    monkeypatch.setattr(queue_utils, "get_redis_queue_layout", lambda: next(layouts))
+
+    layout, version = queue_utils.get_queue_update(None)
+    assert layout == {"props": {"children": "a"}}
+    assert queue_utils.get_queue_update(version) == (None, version)
+
+    queue_utils.publish_queue_snapshot()
+    layout, new_version = queue_utils.get_queue_update(version)
+    assert layout == {"props": {"children": "b"}} and new_version != version
+
+
+def test_template_callback_only_serves_page_load(fake_redis, monkeypatch):
+    monkeypatch.setattr(queue_utils, "get_redis_queue_layout", lambda: {"props": {"children": "live"}})
+
+    monkeypatch.setattr(queue_utils, "ctx", SimpleNamespace(triggered_id="queue-interval"))
+    with pytest.raises(PreventUpdate):
+        queue_utils.get_queue_layout_on_load()
+
+    monkeypatch.setattr(queue_utils, "ctx", SimpleNamespace(triggered_id="token_data"))
+    assert queue_utils.get_queue_layout_on_load() == {"props": {"children": "live"}}
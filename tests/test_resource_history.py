@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from utils import resource_history
+from utils.resource_history import ingest_trace, get_history, fit_memory, fit_cpus, get_learned_resources, GB
+
+HEADER = "task_id\tprocess\tname\tstatus\tcpus\t%cpu\tpeak_rss\trealtime\trchar"
+
+
+def write_trace(path, tasks):
+    """
+    Write a synthetic Nextflow trace; tasks are (process, status, cpus, %cpu, peak RSS in GB).
+    """
+    lines = [HEADER] + [
+        f"{i}\tNFCORE_RNASEQ:RNASEQ:{process}\t{process} (s{i})\t{status}\t{cpus}\t{cpu_pct}%\t{int(rss_gb * GB)}\t60000\t{GB}"
+        for i, (process, status, cpus, cpu_pct, rss_gb) in enumerate(tasks)
+    ]
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def test_only_completed_tasks_are_ingested(fake_redis, tmp_path):
+    trace = write_trace(tmp_path / "trace.txt", [
+        ("STAR_ALIGN", "COMPLETED", 8, 640.0, 30),
+        ("STAR_ALIGN", "FAILED", 8, 10.0, 1),
+        ("STAR_ALIGN", "CACHED", 8, 0, 0),
+        ("SALMON_QUANT", "COMPLETED", 6, 150.0, 4),
+    ])
+
+    assert ingest_trace(trace, input_gb=2.0) == 2
+    history = get_history()
+    assert sorted(history) == ["SALMON_QUANT", "STAR_ALIGN"]
+    assert history["STAR_ALIGN"][0] == {
+        "input_gb": 2.0, "peak_rss_gb": 30.0, "realtime_s": 60.0, "cpu_used": 6.4, "cpus": 8, "rchar_gb": 1.0
+    }
+
+
+def test_memory_fit_follows_input_size_and_covers_every_task():
+    rng = random.Random(0)
+    observations = [
+        {"input_gb": x, "peak_rss_gb": 4 + 3 * x + rng.uniform(-0.5, 0.5)}
+        for x in [0.5, 1, 1.5, 2, 3, 4, 5, 6] for _ in range(3)
+    ]
+
+    for o in observations:
+        assert fit_memory(observations, o["input_gb"]) >= o["peak_rss_gb"] * resource_history.MEMORY_MARGIN
+    assert fit_memory(observations, 10) == pytest.approx((4 + 3 * 10) * resource_history.MEMORY_MARGIN, rel=0.1)
+
+
+def test_memory_fit_never_decreases_with_input_size():
+    observations = [{"input_gb": x, "peak_rss_gb": 10 - x} for x in [1, 2, 3, 4, 5]]
+
+    assert fit_memory(observations, 50) == fit_memory(observations, 1)
+
+
+def test_cpu_fit_uses_a_high_quantile_and_skips_cpu_bound_tasks():
+    underused = [{"cpu_used": used, "cpus": 8} for used in [1.5, 2.0, 2.2, 2.4, 2.5, 2.6, 2.8, 3.1, 2.9, 2.7]]
+    assert fit_cpus(underused) == 4
+
+    saturated = [{"cpu_used": used, "cpus": 4} for used in [3.8, 3.9, 3.7, 3.95, 3.9]]
+    assert fit_cpus(saturated) is None
+
+
+def test_processes_need_enough_history_to_be_learned(fake_redis, tmp_path):
+    for run in range(resource_history.MIN_OBSERVATIONS):
+        trace = write_trace(tmp_path / f"trace_{run}.txt", [("STAR_ALIGN", "COMPLETED", 8, 300.0, 20 + run)])
+        ingest_trace(trace, input_gb=1.0 + run)
+    ingest_trace(write_trace(tmp_path / "other.txt", [("SALMON_QUANT", "COMPLETED", 6, 150.0, 4)]), input_gb=1.0)
+
+    learned = get_learned_resources(input_gb=3.0)
+
+    assert list(learned) == [".*:STAR_ALIGN"]
+    assert learned[".*:STAR_ALIGN"]["cpus"] == 3
+    assert learned[".*:STAR_ALIGN"]["memory"] >= 22 * resource_history.MEMORY_MARGIN
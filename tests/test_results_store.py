@@ -0,0 +1,62 @@
+import shutil
+
+from utils.results_store import convert_count_matrices, list_matrices, get_matrix, read_matrix_page
+
+MATRIX = "star_salmon/salmon.merged.gene_counts"
+
+
+def write_counts(output_dir, n_genes=25):
+    lines = ["gene_id\tgene_name\ts1\ts2\ts3"]
+    for i in reversed(range(n_genes)):
+        lines.append(f"ENSG{i:05d}\t{'ACTB' if i == 7 else f'G{i}'}\t{i}\t{i * 2}\t{i * 3}")
+    (output_dir / "star_salmon").mkdir(parents=True)
+    (output_dir / "star_salmon" / "salmon.merged.gene_counts.tsv").write_text("\n".join(lines) + "\n")
+
+
+def test_matrices_are_converted_sorted_with_a_manifest(tmp_path):
+    write_counts(tmp_path)
+
+    [entry] = convert_count_matrices(str(tmp_path))
+
+    assert (entry["name"], entry["id_columns"], entry["samples"], entry["rows"]) == (
+        MATRIX, ["gene_id", "gene_name"], ["s1", "s2", "s3"], 25
+    )
+    assert list_matrices(str(tmp_path))[0]["sha256"] == entry["sha256"]
+
+
+def test_pages_are_projected_to_the_selected_samples(tmp_path):
+    write_counts(tmp_path)
+    convert_count_matrices(str(tmp_path))
+    entry = get_matrix(str(tmp_path), MATRIX)
+
+    page, total = read_matrix_page(entry, ["s2", "unknown"], offset=10, limit=10)
+    last_page, _ = read_matrix_page(entry, ["s2"], offset=20, limit=10)
+
+    assert total == 25
+    assert page[0] == {"gene_id": "ENSG00010", "gene_name": "G10", "s2": 20}
+    assert [row["gene_id"] for row in last_page] == [f"ENSG{i:05d}" for i in range(20, 25)]
+
+
+def test_search_pages_through_matching_rows_only(tmp_path):
+    write_counts(tmp_path)
+    convert_count_matrices(str(tmp_path))
+    entry = get_matrix(str(tmp_path), MATRIX)
+
+    page, total = read_matrix_page(entry, ["s1"], offset=0, limit=10, search="actb")
+    assert (page, total) == ([{"gene_id": "ENSG00007", "gene_name": "ACTB", "s1": 7}], 1)
+
+    page, total = read_matrix_page(entry, ["s1"], offset=10, limit=10, search="ensg0001")
+    assert total == 10 and page == []
+
+
+def test_store_stays_readable_after_the_output_tree_moved(tmp_path):
+    write_counts(tmp_path / "run")
+    convert_count_matrices(str(tmp_path / "run"))
+    shutil.move(str(tmp_path / "run"), str(tmp_path / "gstore"))
+
+    entry = get_matrix(str(tmp_path / "gstore"), MATRIX)
+
+    assert entry["path"].startswith(str(tmp_path / "gstore"))
+    assert read_matrix_page(entry, ["s3"], offset=0, limit=1)[0] == [
+        {"gene_id": "ENSG00000", "gene_name": "G0", "s3": 0}
+    ]
@@ -0,0 +1,36 @@
+from utils.config_utils import GB
+from utils.routing_utils import estimate_job_cost, route_queue, LIGHT_QUEUE_MAX_MEMORY_GB
+
+PRIMARY = "Homo_sapiens.GRCh38.dna.primary_assembly.fa"
+TOPLEVEL = "Homo_sapiens.GRCh38.dna.toplevel.fa"
+
+
+def test_estimate_adds_index_build_sample_and_fastq_costs():
+    estimate = estimate_job_cost(10, 20 * GB, PRIMARY)
+
+    # 0.25 base + 0.75 index + 10 x 0.02 + 20 GB x 0.04
+    assert estimate == {"runtime_hours": 2.0, "peak_memory_gb": 32.0}
+
+
+def test_cached_index_skips_the_index_build():
+    assert estimate_job_cost(10, 20 * GB, PRIMARY, index_cached=True)["runtime_hours"] == 1.25
+
+
+def test_small_dataset_goes_to_the_light_queue():
+    queue, reason = route_queue(estimate_job_cost(2, 2 * GB, PRIMARY))
+
+    assert (queue, reason) == ("light", "predicted to fit the light queue limits")
+
+
+def test_long_or_memory_hungry_runs_go_to_the_heavy_queue():
+    assert route_queue(estimate_job_cost(100, 50 * GB, PRIMARY))[0] == "heavy"
+
+    queue, reason = route_queue(estimate_job_cost(1, 1 * GB, TOPLEVEL, index_cached=True))
+    assert queue == "heavy" and f"> {LIGHT_QUEUE_MAX_MEMORY_GB} GB" in reason
+
+
+def test_user_choice_overrides_the_cost_model_and_auto_does_not():
+    heavy_estimate = estimate_job_cost(100, 50 * GB, PRIMARY)
+
+    assert route_queue(heavy_estimate, override="light") == ("light", "user override to 'light'")
+    assert route_queue(heavy_estimate, override="auto")[0] == "heavy"
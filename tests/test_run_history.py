@@ -0,0 +1,37 @@
+from utils.run_history import get_last_run, record_run, relocate_run, select_rerun_rows, subset_dataset
+
+# s1 was sequenced on two lanes
+DATASET = {"Sample": ["s1", "s1", "s2", "s3"], "Path": ["a", "b", "c", "d"]}
+LAST_RUN = {"output_dir": "/STORAGE/OUTPUT_rnaseq_1", "samples": ["s1", "s2"]}
+
+
+def test_all_rows_are_processed_without_a_base_run():
+    assert select_rerun_rows(DATASET, "all", [2], LAST_RUN) == ([0, 1, 2, 3], None)
+
+
+def test_selected_sample_brings_all_of_its_lanes_and_merges_into_the_last_run():
+    rows, base_run = select_rerun_rows(DATASET, "selected", [1], LAST_RUN)
+
+    assert (rows, base_run) == ([0, 1], LAST_RUN)
+    assert subset_dataset(DATASET, rows) == {"Sample": ["s1", "s1"], "Path": ["a", "b"]}
+
+
+def test_new_mode_only_processes_samples_without_results():
+    assert select_rerun_rows(DATASET, "new", [], LAST_RUN) == ([3], LAST_RUN)
+    complete_run = dict(LAST_RUN, samples=["s1", "s2", "s3"])
+    assert select_rerun_rows(DATASET, "new", [], complete_run) == ([], complete_run)
+
+
+def test_subset_without_a_last_run_or_covering_everything_is_a_plain_run():
+    assert select_rerun_rows(DATASET, "selected", [0], None) == ([0, 1], None)
+    assert select_rerun_rows(DATASET, "selected", [0, 2, 3], LAST_RUN) == ([0, 1, 2, 3], None)
+    assert select_rerun_rows(DATASET, "new", [], None) == ([0, 1, 2, 3], None)
+
+
+def test_staged_run_is_relocated_only_if_it_is_still_the_last_one(fake_redis):
+    record_run(7, "fa", "gtf", "/STORAGE/run1", ["s1"])
+    relocate_run(7, "fa", "gtf", "/STORAGE/run0", "/gstore/run0")
+    assert get_last_run(7, "fa", "gtf")["output_dir"] == "/STORAGE/run1"
+
+    relocate_run(7, "fa", "gtf", "/STORAGE/run1", "/gstore/run1")
+    assert get_last_run(7, "fa", "gtf")["output_dir"] == "/gstore/run1"
@@ -0,0 +1,143 @@
+import pandas as pd
+import pytest
+
+from utils.samplesheet_utils import (
+    build_sample_sheet_df, validate_sample_sheet, create_sample_sheet_csv, find_unmounted_roots,
+    SamplesheetValidationError, build_sample_sheet_bytes
+)
+
+
+@pytest.fixture
+def fastq_dir(tmp_path):
+    for name in ["a_R1.fastq.gz", "a_R2.fastq.gz", "b_R1.fastq.gz", "b_R2.fastq.gz", "c.fq.gz"]:
+        (tmp_path / name).write_bytes(b"")
+    return tmp_path
+
+
+def make_df(rows):
+    return build_sample_sheet_df({
+        "Sample": [row[0] for row in rows],
+        "FASTQ Read 1": [row[1] for row in rows],
+        "FASTQ Read 2": [row[2] for row in rows],
+    })
+
+
+def test_valid_samplesheet_has_no_problems(fastq_dir):
+    df = make_df([
+        ("a", f"{fastq_dir}/a_R1.fastq.gz", f"{fastq_dir}/a_R2.fastq.gz"),
+        ("b", f"{fastq_dir}/b_R1.fastq.gz", f"{fastq_dir}/b_R2.fastq.gz"),
+        ("c", f"{fastq_dir}/c.fq.gz", ""),
+    ])
+
+    assert validate_sample_sheet(df) == []
+    assert list(df["strandedness"]) == ["auto"] * 3
+
+
+def test_all_problems_are_reported_at_once(fastq_dir):
+    df = make_df([
+        ("", f"{fastq_dir}/a_R1.fastq.gz", ""),
+        ("bad name", f"{fastq_dir}/b_R1.fastq", ""),
+        ("d", "", ""),
+        ("e", f"{fastq_dir}/a_R1.fastq.gz", ""),
+        ("f", f"{fastq_dir}/c.fq.gz", f"{fastq_dir}/c.fq.gz"),
+        ("g", f"{fastq_dir}/b_R2.fastq.gz", f"{fastq_dir}/missing_R2.fastq.gz"),
+        ("g", f"{fastq_dir}/b_R1.fastq.gz", ""),
+    ])
+
+    problems = " | ".join(validate_sample_sheet(df))
+
+    assert "Missing sample name in row(s) 1" in problems
+    assert "Sample names contain spaces in row(s) 2" in problems
+    assert "Missing FASTQ Read 1 in row(s) 3" in problems
+    assert "fastq_1 does not end in .fastq.gz/.fq.gz in row(s) 2" in problems
+    assert "Samples mix single-end and paired-end rows: g" in problems
+    assert "used by more than one sample or read" in problems
+    assert "Read 1 and Read 2 are the same file in row(s) 5" in problems
+    assert "2 FASTQ file(s) not found" in problems and "missing_R2.fastq.gz" in problems
+
+
+def test_missing_files_are_problems_even_if_none_exists(tmp_path):
+    df = make_df([("a", f"{tmp_path}/a_R1.fastq.gz", ""), ("b", f"{tmp_path}/b_R1.fastq.gz", "")])
+
+    assert validate_sample_sheet(df) == [f"2 FASTQ file(s) not found: {tmp_path}/a_R1.fastq.gz, {tmp_path}/b_R1.fastq.gz"]
+
+
+def test_unmounted_storage_is_reported_once():
+    df = make_df([(f"s{i}", f"/NOT_MOUNTED_STORAGE/p1/s{i}_R1.fastq.gz", "") for i in range(100)])
+
+    assert find_unmounted_roots(df["fastq_1"]) == ["/NOT_MOUNTED_STORAGE"]
+    assert validate_sample_sheet(df) == [
+        "FASTQ storage not mounted on this server: /NOT_MOUNTED_STORAGE (100 file(s) could not be checked)"
+    ]
+    assert validate_sample_sheet(df, check_files=False) == []
+
+
+def test_build_bytes_raises_with_every_problem():
+    with pytest.raises(SamplesheetValidationError) as error:
+        build_sample_sheet_bytes({"Sample": ["a b", ""], "FASTQ Read 1": ["x.txt", "y.fastq.gz"]}, validate=True)
+
+    assert len(error.value.problems) >= 3
+
+
+def test_create_sample_sheet_csv_raises_instead_of_printing(tmp_path):
+    path = tmp_path / "samplesheet.csv"
+    with pytest.raises(KeyError):
+        create_sample_sheet_csv({"Sample": ["a"]}, str(path))
+    assert not path.exists()
+
+    create_sample_sheet_csv({"Sample": ["a"], "FASTQ Read 1": ["a.fastq.gz"]}, str(path))
+    assert path.read_text().splitlines() == ["sample,fastq_1,fastq_2,strandedness", "a,a.fastq.gz,,auto"]
+
+
+def old_samplesheet_bytes(dataset):
+    """
+    The samplesheet the original row-by-row create_sample_sheet_csv wrote, as bytes.
+    """
+    df = pd.DataFrame(dataset)
+    df["fastq_1"] = df["FASTQ Read 1"]
+    df["fastq_2"] = df["FASTQ Read 2"]
+    df["sample"] = df["Sample"]
+    df["strandedness"] = "auto"
+    return df[["sample", "fastq_1", "fastq_2", "strandedness"]].to_csv(index=False).encode("utf-8")
+
+
+SAMPLESHEET_CASES = {
+    "single-end": (
+        [("a", "a_R1.fastq.gz", ""), ("b", "b_R1.fq.gz", "")],
+        [],
+    ),
+    "paired-end": (
+        [("a", "a_R1.fastq.gz", "a_R2.fastq.gz"), ("b", "b_R1.fastq.gz", "b_R2.fastq.gz")],
+        [],
+    ),
+    "multi-lane": (
+        [("a", "a_L1_R1.fastq.gz", "a_L1_R2.fastq.gz"), ("a", "a_L2_R1.fastq.gz", "a_L2_R2.fastq.gz"),
+         ("b", "b_L1_R1.fastq.gz", "")],
+        [],
+    ),
+    "bad rows": (
+        [("", "a_R1.fastq.gz", ""), ("b c", "b_R1.fastq", ""), ("d", "", ""),
+         ("e", "e_L1_R1.fastq.gz", "e_L1_R2.fastq.gz"), ("e", "e_L2_R1.fastq.gz", ""),
+         ("f", "a_R1.fastq.gz", "")],
+        [
+            "Missing sample name in row(s) 1",
+            "Sample names contain spaces in row(s) 2",
+            "Missing FASTQ Read 1 in row(s) 3",
+            "fastq_1 does not end in .fastq.gz/.fq.gz in row(s) 2",
+            "Samples mix single-end and paired-end rows: e",
+            "FASTQ files used by more than one sample or read: a_R1.fastq.gz",
+        ],
+    ),
+}
+
+
+@pytest.mark.parametrize("rows, expected_problems", SAMPLESHEET_CASES.values(), ids=SAMPLESHEET_CASES.keys())
+def test_samplesheet_matches_the_row_by_row_builder(rows, expected_problems):
+    dataset = {
+        "Sample": [row[0] for row in rows],
+        "FASTQ Read 1": [row[1] for row in rows],
+        "FASTQ Read 2": [row[2] for row in rows],
+    }
+
+    assert build_sample_sheet_bytes(dataset) == old_samplesheet_bytes(dataset)
+    assert validate_sample_sheet(build_sample_sheet_df(dataset), check_files=False) == expected_problems
@@ -0,0 +1,38 @@
+import pytest
+
+from utils import session_utils
+from utils.session_utils import save_dataset, touch_dataset, load_dataset, get_dataset_handle, SESSION_TTL
+
+DATASET = {"Sample": ["s1", "s2"], "FASTQ Read 1": ["s1_R1.fastq.gz", "s2_R1.fastq.gz"]}
+
+
+def test_dataset_round_trips_through_its_handle(fake_redis):
+    handle = save_dataset(DATASET)
+
+    assert load_dataset(handle) == DATASET
+    assert get_dataset_handle({"handle": handle, "entity_id": 1}) == handle
+    assert get_dataset_handle(None) is None
+
+
+def test_access_refreshes_the_session_ttl(fake_redis):
+    handle = save_dataset(DATASET, "h1")
+    fake_redis.expire(session_utils._session_key(handle), 10)
+
+    load_dataset(handle)
+    assert fake_redis.ttl(session_utils._session_key(handle)) > SESSION_TTL - 5
+
+    fake_redis.expire(session_utils._session_key(handle), 10)
+    assert touch_dataset(handle)
+    assert fake_redis.ttl(session_utils._session_key(handle)) > SESSION_TTL - 5
+
+
+def test_expired_session_is_reported_even_if_memoized(fake_redis):
+    handle = save_dataset(DATASET)
+    load_dataset(handle)
+
+    fake_redis.delete(session_utils._session_key(handle))
+
+    assert not touch_dataset(handle)
+    assert not touch_dataset(None)
+    with pytest.raises(KeyError, match="expired"):
+        load_dataset(handle)
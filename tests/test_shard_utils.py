@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import pandas as pd
+
+from utils.shard_utils import split_dataset, merge_count_matrices, merge_multiqc_data, merge_shard_outputs
+
+
+def write_tsv(path, df):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(path, sep="\t", index=False)
+
+
+def test_split_keeps_lanes_of_a_sample_together():
+    dataset = {
+        "Sample": ["a", "a", "a", "b", "c", "c", "d"],
+        "FASTQ Read 1": [f"r{i}.fastq.gz" for i in range(7)],
+    }
+
+    shards = split_dataset(dataset, 3)
+
+    assert len(shards) == 3
+    samples_per_shard = [set(shard["Sample"]) for shard in shards]
+    assert sum(len(samples) for samples in samples_per_shard) == 4  # No sample in two shards
+    assert sorted(sum((shard["FASTQ Read 1"] for shard in shards), [])) == sorted(dataset["FASTQ Read 1"])
+    assert split_dataset(dataset, 1) == [dataset]
+
+
+def test_count_matrices_are_merged_column_wise_and_last_directory_wins(tmp_path):
+    name = "star_salmon/salmon.merged.gene_counts.tsv"
+    write_tsv(tmp_path / "base" / name, pd.DataFrame({"gene_id": ["g1", "g2"], "gene_name": ["A", "B"], "s1": [1, 2], "s2": [3, 4]}))
+    write_tsv(tmp_path / "shard" / name, pd.DataFrame({"gene_id": ["g1", "g3"], "gene_name": ["A", "C"], "s2": [30, 50]}))
+
+    paths = merge_count_matrices([str(tmp_path / "base"), str(tmp_path / "shard")], str(tmp_path / "out"))
+
+    merged = pd.read_csv(paths[0], sep="\t").set_index("gene_id")
+    assert list(merged.columns) == ["gene_name", "s1", "s2"]
+    assert merged.loc["g1", "s2"] == 30  # Reprocessed sample replaces the base column
+    assert merged.loc["g2", "s2"] == 0  # Missing counts are zero
+    assert merged.loc["g3", "s1"] == 0
+
+
+def test_multiqc_sample_tables_are_deduplicated_by_sample(tmp_path):
+    name = "multiqc/star_salmon/multiqc_data/multiqc_general_stats.txt"
+    write_tsv(tmp_path / "base" / name, pd.DataFrame({"Sample": ["s1", "s2"], "reads": [1, 2]}))
+    write_tsv(tmp_path / "shard" / name, pd.DataFrame({"Sample": ["s2", "s3"], "reads": [20, 3]}))
+
+    merge_multiqc_data([str(tmp_path / "base"), str(tmp_path / "shard")], str(tmp_path / "out"))
+
+    merged = pd.read_csv(tmp_path / "out" / name, sep="\t")
+    assert merged.to_dict("list") == {"Sample": ["s1", "s2", "s3"], "reads": [1, 20, 3]}
+
+
+def test_multiqc_tables_without_sample_key_are_concatenated(tmp_path):
+    name = "multiqc/star_salmon/multiqc_data/multiqc_sources.txt"
+    columns = ["Module", "Section", "Sample Name", "Source"]
+    write_tsv(tmp_path / "s0" / name, pd.DataFrame([
+        ["FastQC", "all_sections", "s1", "/s0/s1_fastqc.zip"],
+        ["STAR", "all_sections", "s1", "/s0/s1.Log.final.out"],
+    ], columns=columns))
+    write_tsv(tmp_path / "s1" / name, pd.DataFrame([
+        ["FastQC", "all_sections", "s2", "/s1/s2_fastqc.zip"],
+        ["STAR", "all_sections", "s1", "/s0/s1.Log.final.out"],
+    ], columns=columns))
+
+    merge_multiqc_data([str(tmp_path / "s0"), str(tmp_path / "s1")], str(tmp_path / "out"))
+
+    merged = pd.read_csv(tmp_path / "out" / name, sep="\t")
+    assert list(merged["Module"]) == ["FastQC", "FastQC", "STAR"]
+    assert sorted(merged["Sample Name"]) == ["s1", "s1", "s2"]
+
+
+def test_shard_reports_are_kept_side_by_side(tmp_path):
+    for i in range(2):
+        report = tmp_path / f"s{i}" / "multiqc" / "star_salmon" / "multiqc_report.html"
+        report.parent.mkdir(parents=True)
+        report.write_text(f"report {i}")
+
+    merge_shard_outputs([str(tmp_path / "s0"), str(tmp_path / "s1")], str(tmp_path / "out"))
+
+    reports = sorted(Path(tmp_path / "out" / "multiqc" / "star_salmon").glob("multiqc_report_shard_*.html"))
+    assert [report.read_text() for report in reports] == ["report 0", "report 1"]
@@ -0,0 +1,90 @@
+import pytest
+from rq import Queue
+
+from utils.submission_utils import claim_submission, get_submission, release_submission, update_submission
+from utils.job_utils import check_run_outputs
+
+TRACE_HEADER = "task_id\tname\tstatus\n"
+
+
+@pytest.fixture
+def queue(fake_redis):
+    return Queue("light", connection=fake_redis)
+
+
+def test_failed_run_releases_its_claim_and_can_be_resubmitted(fake_redis):
+    assert claim_submission("key", "job1", "/out1", "light") is None
+    update_submission("key", status="queued")
+
+    # The worker found no results and released the claim
+    release_submission("key", "job1")
+
+    assert get_submission("key") is None
+    assert claim_submission("key", "job2", "/out2", "light") is None
+    assert get_submission("key")["job_id"] == "job2"
+
+
+def test_only_the_owner_releases_a_claim(fake_redis):
+    claim_submission("key", "job1", "/out1", "light")
+
+    release_submission("key", "job2")
+
+    assert claim_submission("key", "job2", "/out2", "light")["job_id"] == "job1"
+
+
+def test_queued_run_is_reported_as_duplicate_even_when_forced(queue):
+    queue.enqueue("math.sqrt", 4, job_id="job1")
+    claim_submission("key", "job1", "/out1", "light")
+
+    existing = claim_submission("key", "job2", "/out2", "light", force=True)
+
+    assert (existing["job_id"], existing["status"]) == ("job1", "queued")
+
+
+def test_force_replaces_a_finished_run(fake_redis):
+    claim_submission("key", "job1", "/out1", "light")
+    update_submission("key", status="finished")
+
+    assert claim_submission("key", "job2", "/out2", "light")["status"] == "finished"
+    assert claim_submission("key", "job2", "/out2", "light", force=True) is None
+    assert get_submission("key")["job_id"] == "job2"
+
+
+def test_failed_job_frees_the_claim(queue):
+    job = queue.enqueue("math.sqrt", 4, job_id="job1")
+    claim_submission("key", "job1", "/out1", "light")
+    job.set_status("failed")
+
+    assert get_submission("key") is None
+
+
+def test_merge_waiting_on_a_failed_shard_frees_the_claim(queue):
+    shard = queue.enqueue("math.sqrt", 4, job_id="job1_shard0")
+    queue.enqueue("math.sqrt", 9, job_id="job1", depends_on=shard)
+    claim_submission("key", "job1", "/out1", "light")
+    assert get_submission("key")["status"] == "deferred"
+
+    shard.set_status("failed")
+
+    assert get_submission("key") is None
+
+
+def test_run_without_count_matrix_or_with_failed_tasks_is_not_successful(tmp_path):
+    trace = tmp_path / "trace.txt"
+    trace.write_text(TRACE_HEADER + "1\tSTAR (s1)\tCOMPLETED\n2\tSALMON (s1)\tFAILED\n")
+
+    problems = check_run_outputs(str(tmp_path), str(trace))
+
+    assert problems == [f"No merged count matrix found in {tmp_path}", "1 failed task(s): SALMON (s1)"]
+    assert check_run_outputs(trace_path=str(tmp_path / "missing.txt")) == [
+        f"Nextflow trace {tmp_path / 'missing.txt'} not found"
+    ]
+
+
+def test_retried_task_does_not_fail_the_run(tmp_path):
+    (tmp_path / "star_salmon").mkdir()
+    (tmp_path / "star_salmon" / "salmon.merged.gene_counts.tsv").write_text("gene_id\ts1\ng1\t1\n")
+    trace = tmp_path / "trace.txt"
+    trace.write_text(TRACE_HEADER + "1\tSALMON (s1)\tFAILED\n2\tSALMON (s1)\tCOMPLETED\n")
+
+    assert check_run_outputs(str(tmp_path), str(trace)) == []
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from rq import Queue, Worker
+
+from utils import submit_utils
+from utils.submit_utils import (
+    SUBMIT_QUEUE, get_prepare_job_id, get_submit_status, set_submit_status, transition_submit_status
+)
+
+
+class StubLogger:
+    def log_operation(self, *args, **kwargs):
+        pass
+
+
+def test_submission_nobody_picked_up_times_out_and_is_cancelled(fake_redis):
+    queue = Queue(SUBMIT_QUEUE, connection=fake_redis)
+    job = queue.enqueue("math.sqrt", 4, job_id=get_prepare_job_id("job1"))
+    set_submit_status("job1", "queued")
+
+    assert get_submit_status("job1")["status"] == "queued"
+    assert get_submit_status("job1", timeout=-1)["status"] == "failed"
+    assert job.get_status() == "canceled"
+    assert queue.count == 0
+
+
+def test_timed_out_job_a_worker_just_started_is_not_cancelled(fake_redis, monkeypatch):
+    queue = Queue(SUBMIT_QUEUE, connection=fake_redis)
+    job = queue.enqueue("math.sqrt", 4, job_id=get_prepare_job_id("job1"))
+    set_submit_status("job1", "queued")
+    job.set_status("started")
+
+    assert get_submit_status("job1", timeout=-1)["status"] == "failed"
+    assert job.get_status() == "started"
+
+    # The worker then finds the submission failed and prepares nothing
+    monkeypatch.setattr(submit_utils, "get_logger", lambda token_data: StubLogger())
+    monkeypatch.setattr(submit_utils, "prepare_submission", lambda *args, **kwargs: pytest.fail("prepared"))
+    assert submit_utils.run_prepare_job("job1", {"token_data": {}}) == "failed"
+
+
+def test_inline_preparation_times_out_only_before_it_enqueues(fake_redis):
+    set_submit_status("job1", "queued", inline=True)
+    transition_submit_status("job1", ("queued",), "preparing")
+    assert get_submit_status("job1", timeout=-1)["status"] == "failed"
+    assert transition_submit_status("job1", ("preparing",), "enqueuing") is None
+
+    set_submit_status("job2", "queued", inline=True)
+    transition_submit_status("job2", ("queued",), "preparing")
+    assert transition_submit_status("job2", ("preparing",), "enqueuing")["inline"]
+    assert get_submit_status("job2", timeout=-1)["status"] == "enqueuing"
+
+
+def test_lost_preparation_job_is_reported_failed(fake_redis):
+    set_submit_status("job1", "preparing")
+
+    assert get_submit_status("job1")["status"] == "failed"
+
+
+def test_submission_is_prepared_in_the_app_without_a_submit_worker(fake_redis, monkeypatch):
+    prepared = []
+    monkeypatch.setattr(submit_utils, "run_prepare_job", lambda job_id, intent, inline: prepared.append(inline))
+
+    submit_utils.enqueue_submission("job1", {})
+    for _ in range(100):
+        if prepared:
+            break
+        time.sleep(0.01)
+
+    assert prepared == [True]
+    assert Queue(SUBMIT_QUEUE, connection=fake_redis).count == 0
+    assert get_submit_status("job1")["status"] == "queued"
+
+
+def test_submission_goes_to_a_live_submit_worker(fake_redis, monkeypatch):
+    monkeypatch.setattr(submit_utils, "q", lambda name: Queue(name, connection=fake_redis))
+    queue = Queue(SUBMIT_QUEUE, connection=fake_redis)
+    Worker([queue], connection=fake_redis).register_birth()
+
+    submit_utils.enqueue_submission("job1", {})
+
+    assert queue.job_ids == [get_prepare_job_id("job1")]
@@ -0,0 +1,63 @@
+import pytest
+
+from utils import table_utils
+from utils.session_utils import save_dataset
+from utils.table_utils import (
+    create_table_session, get_table_df, get_table_page, update_page_selection, get_selected_row_ids,
+    ROW_ID_COLUMN, _dataset_key
+)
+
+
+@pytest.fixture
+def table_session(fake_redis):
+    dataset = {
+        "id": ["a1", "a2", "a3", "a4"],
+        "Sample": ["s1", "s2", "s3", "s4"],
+        "Reads": [10, 40, 20, 30],
+    }
+    return create_table_session(save_dataset(dataset))
+
+
+def test_dataset_id_column_is_kept(table_session):
+    df = get_table_df(table_session)
+
+    assert list(df["id"]) == ["a1", "a2", "a3", "a4"]
+    assert list(df[ROW_ID_COLUMN]) == [0, 1, 2, 3]
+
+
+def test_page_with_sort_filter_and_projection(table_session):
+    records, page_count, selected = get_table_page(
+        table_session, 0, 2, sort_by=[{"column_id": "Reads", "direction": "desc"}],
+        filter_query="{Reads} gt 15", columns=["Sample"]
+    )
+
+    assert records == [{"Sample": "s2", ROW_ID_COLUMN: 1}, {"Sample": "s4", ROW_ID_COLUMN: 3}]
+    assert page_count == 2
+    assert selected == [0, 1]
+
+
+def test_selection_is_tracked_as_deselections(table_session):
+    update_page_selection(table_session, [0, 1], [1])
+
+    assert get_selected_row_ids(table_session) == [1, 2, 3]
+    _, _, selected = get_table_page(table_session, 0, 2)
+    assert selected == [1]
+
+
+def test_expired_session_is_reported(table_session, fake_redis):
+    get_table_df(table_session)
+    fake_redis.delete(_dataset_key(table_session))
+
+    with pytest.raises(KeyError):
+        get_table_df(table_session)
+
+
+def test_table_frame_is_memoized_per_process(table_session, monkeypatch):
+    loads = []
+    cached_call = table_utils.cached_call
+    monkeypatch.setattr(table_utils, "cached_call", lambda *args, **kwargs: loads.append(1) or cached_call(*args, **kwargs))
+
+    df = get_table_df(table_session)
+    assert get_table_df(table_session) is df
+    assert get_selected_row_ids(table_session, df) == [0, 1, 2, 3]
+    assert loads == [1]
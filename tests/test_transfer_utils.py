@@ -0,0 +1,73 @@
+import hashlib
+import json
+import os
+
+from utils import transfer_utils
+from utils.transfer_utils import copy_file_chunked, stage_output_tree, verify_staged_tree, update_resource_paths
+
+
+def make_tree(root):
+    (root / "star_salmon").mkdir(parents=True)
+    (root / "star_salmon" / "counts.tsv").write_bytes(os.urandom(10_000))
+    (root / "multiqc.html").write_text("<html></html>")
+    return root
+
+
+def test_interrupted_copy_resumes_with_only_the_missing_chunks(tmp_path):
+    source = tmp_path / "source.bin"
+    source.write_bytes(os.urandom(10_000))
+    destination = str(tmp_path / "destination.bin")
+
+    copy_file_chunked(str(source), destination, chunk_size=1000)
+    # Simulate an interruption after 4 of 10 chunks were recorded
+    os.replace(destination, destination + transfer_utils.PARTIAL_SUFFIX)
+    state = {"size": 10_000, "mtime": source.stat().st_mtime, "chunks": {}}
+    for index in range(4):
+        state["chunks"][str(index)] = hashlib.sha256(
+            source.read_bytes()[index * 1000:(index + 1) * 1000]
+        ).hexdigest()
+    with open(destination + transfer_utils.STATE_SUFFIX, "w") as f:
+        json.dump(state, f)
+
+    assert copy_file_chunked(str(source), destination, chunk_size=1000, max_workers=3) == 6000
+    assert open(destination, "rb").read() == source.read_bytes()
+    assert not os.path.exists(destination + transfer_utils.STATE_SUFFIX)
+
+
+def test_staged_tree_is_verified(tmp_path, monkeypatch):
+    monkeypatch.setattr(transfer_utils, "same_filesystem", lambda *args: False)  # Force real copies
+    output_dir = make_tree(tmp_path / "out")
+    destination = str(tmp_path / "gstore" / "out")
+
+    summary = stage_output_tree(str(output_dir), destination, max_workers=2)
+
+    assert (summary["files"], summary["copy"], summary["bytes_copied"]) == (2, 2, 10_013)
+    assert verify_staged_tree(str(output_dir), destination) == []
+    os.truncate(os.path.join(destination, "star_salmon", "counts.tsv"), 10)
+    assert verify_staged_tree(str(output_dir), destination) == [os.path.join("star_salmon", "counts.tsv")]
+
+
+class FakeWrapper:
+    def __init__(self, resources):
+        self.resources = resources
+
+    def read(self, endpoint, query):
+        return [r for r in self.resources.values() if r["relativepath"] in query["relativepath"]]
+
+    def save(self, endpoint, obj):
+        self.resources[obj["id"]].update(obj)
+
+
+def test_resources_are_pointed_at_the_staged_tree_once(tmp_path, monkeypatch):
+    output_dir = make_tree(tmp_path / "out")
+    wrapper = FakeWrapper({
+        1: {"id": 1, "relativepath": str(output_dir / "multiqc.html")},
+        2: {"id": 2, "relativepath": str(output_dir / "star_salmon" / "counts.tsv")},
+    })
+    monkeypatch.setattr(transfer_utils, "get_power_user_wrapper", lambda token_data: wrapper)
+    monkeypatch.setattr(transfer_utils.bfabric_web_apps, "GSTORE_REMOTE_PATH", "/gstore")
+
+    assert update_resource_paths({}, str(output_dir), "/gstore/p1/out", batch_size=1) == 2
+    assert wrapper.resources[2]["relativepath"] == "p1/out/star_salmon/counts.tsv"
+    assert wrapper.resources[2]["storageid"] == transfer_utils.GSTORE_STORAGE_ID
+    assert update_resource_paths({}, str(output_dir), "/gstore/p1/out") == 0
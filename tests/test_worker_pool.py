@@ -0,0 +1,99 @@
+from datetime import timedelta
+
+import pytest
+import redis
+from rq import Queue
+from rq.utils import utcnow
+
+from utils import worker_pool
+from utils.worker_pool import SlotLedger, SlotWorker, BACKFILL_LIMIT
+
+
+@pytest.fixture
+def queue(fake_redis):
+    return Queue("light", connection=fake_redis)
+
+
+def make_worker(queue, cpus, memory_gb):
+    worker = SlotWorker([queue], connection=queue.connection)
+    worker.ledger = SlotLedger(cpus, memory_gb)
+    return worker
+
+
+def test_job_that_does_not_fit_stays_queued_and_smaller_jobs_start(queue):
+    big = queue.enqueue("math.sqrt", 4, meta={"cpus": 8, "memory_gb": 16})
+    small = queue.enqueue("math.sqrt", 9, meta={"cpus": 2, "memory_gb": 4})
+    worker = make_worker(queue, 8, 16)
+    worker.ledger.try_acquire(4, 8)  # Another pool worker runs a job
+
+    job, _ = worker.dequeue_job_and_maintain_ttl(timeout=None)
+
+    assert job.id == small.id
+    assert queue.job_ids == [big.id]
+    assert (worker.ledger.free_cpus.value, worker.ledger.free_memory_gb.value) == (2, 4)
+
+
+def test_nothing_is_dequeued_while_no_job_fits(queue):
+    queue.enqueue("math.sqrt", 4, meta={"cpus": 4, "memory_gb": 4})
+    worker = make_worker(queue, 4, 4)
+    worker.ledger.try_acquire(1, 1)
+
+    assert worker.dequeue_job_and_maintain_ttl(timeout=None) is None
+    assert queue.count == 1
+
+
+def test_long_waiting_job_is_not_overtaken(queue):
+    big = queue.enqueue("math.sqrt", 4, meta={"cpus": 8, "memory_gb": 16})
+    big.enqueued_at = utcnow() - timedelta(seconds=BACKFILL_LIMIT + 1)
+    big.save()
+    queue.enqueue("math.sqrt", 9, meta={"cpus": 1, "memory_gb": 1})
+    worker = make_worker(queue, 8, 16)
+    worker.ledger.try_acquire(1, 1)
+
+    assert worker.dequeue_job_and_maintain_ttl(timeout=None) is None
+    assert queue.count == 2
+
+
+def test_long_waiting_job_is_not_overtaken_from_other_queues(queue, fake_redis):
+    big = queue.enqueue("math.sqrt", 4, meta={"cpus": 8, "memory_gb": 16})
+    big.enqueued_at = utcnow() - timedelta(seconds=BACKFILL_LIMIT + 1)
+    big.save()
+    other = Queue("heavy", connection=fake_redis)
+    other.enqueue("math.sqrt", 9, meta={"cpus": 1, "memory_gb": 1})
+    worker = SlotWorker([queue, other], connection=fake_redis)
+    worker.ledger = SlotLedger(8, 16)
+    worker.ledger.try_acquire(1, 1)
+
+    assert worker.dequeue_job_and_maintain_ttl(timeout=None) is None
+    assert (queue.count, other.count) == (1, 1)
+
+
+def test_lost_redis_connection_is_retried_with_backoff(queue, monkeypatch):
+    small = queue.enqueue("math.sqrt", 9, meta={"cpus": 1, "memory_gb": 1})
+    worker = make_worker(queue, 4, 4)
+    reserve_next_job = worker._reserve_next_job
+    failures = [redis.exceptions.ConnectionError("down")] * 2
+    sleeps = []
+
+    def flaky_reserve_next_job():
+        if failures:
+            raise failures.pop()
+        return reserve_next_job()
+
+    monkeypatch.setattr(worker, "_reserve_next_job", flaky_reserve_next_job)
+    monkeypatch.setattr(worker_pool.time, "sleep", sleeps.append)
+
+    job, _ = worker.dequeue_job_and_maintain_ttl(timeout=None)
+
+    assert job.id == small.id
+    assert sleeps == [1.0, worker.exponential_backoff_factor]
+
+
+def test_slots_are_returned_after_the_job(queue):
+    queue.enqueue("math.sqrt", 4, meta={"cpus": 2, "memory_gb": 2})
+    worker = make_worker(queue, 4, 4)
+
+    worker.work(burst=True)
+
+    assert queue.count == 0
+    assert (worker.ledger.free_cpus.value, worker.ledger.free_memory_gb.value) == (4, 4)
@@ -0,0 +1,70 @@
+from datetime import datetime
+
+import bfabric_web_apps
+
+from utils.cache_utils import cache_get, cache_set, make_cache_key
+from utils.queue_utils import get_queue_layout_on_load
+from utils.workunit_utils import populate_cached_workunit_details
+
+# ------------------------------------------------------------------------------
+# CACHING WRAPPERS AROUND BFABRIC_WEB_APPS
+# ------------------------------------------------------------------------------
+# generic/callbacks.py is shipped with the template and must stay unmodified,
+# so the app's caching wraps the library functions it calls instead.
+# install_wrappers() replaces them on the bfabric_web_apps package and must run
+# before generic.callbacks is imported (see index.py); the worker keeps the
+# original functions.
+TOKEN_CACHE_TTL = 60 * 5  # Seconds
+TOKEN_CACHE_MAX_ENTRIES = 256
+TOKEN_EXPIRY_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_originals = {}
+
+
+def get_token_cache_ttl(token_data, ttl=TOKEN_CACHE_TTL):
+    """
+    Seconds a validated token may be cached: at most ttl, and never past the token's expiry.
+
+    Returns:
+        int: The TTL, or 0 if the token must not be cached.
+    """
+    try:
+        expires = datetime.strptime(token_data["token_expires"], TOKEN_EXPIRY_FORMAT)
+    except (KeyError, TypeError, ValueError):
+        return 0
+    return max(min(ttl, int((expires - datetime.now()).total_seconds())), 0)
+
+
+def cached_process_url_and_token(url_params):
+    """
+    process_url_and_token with validated sessions shared across processes and tabs.
+
+    Only complete sessions are cached, so expired or invalid tokens are
+    re-checked every time.
+    """
+    process_url_and_token = _originals.get("process_url_and_token", bfabric_web_apps.process_url_and_token)
+    if not url_params:
+        return process_url_and_token(url_params)
+
+    cache_key = make_cache_key(url_params)
+    result = cache_get("token", cache_key)
+    if result is None:
+        result = process_url_and_token(url_params)
+        ttl = get_token_cache_ttl(result[1]) if None not in result[:4] else 0
+        if ttl:
+            cache_set("token", cache_key, result, ttl=ttl, max_entries=TOKEN_CACHE_MAX_ENTRIES)
+    return result
+
+
+def install_wrappers():
+    """
+    Replace the library functions used by generic/callbacks.py with their cached versions.
+    """
+    wrappers = {
+        "process_url_and_token": cached_process_url_and_token,
+        "get_redis_queue_layout": get_queue_layout_on_load,
+        "populate_workunit_details": populate_cached_workunit_details,
+    }
+    for name, wrapper in wrappers.items():
+        _originals.setdefault(name, getattr(bfabric_web_apps, name))
+        setattr(bfabric_web_apps, name, wrapper)
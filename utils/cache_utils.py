@@ -0,0 +1,93 @@
+import hashlib
+import pickle
+import time
+
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+# ------------------------------------------------------------------------------
+# SHARED REDIS CACHE
+# ------------------------------------------------------------------------------
+# Values live in Redis so every web server process shares them:
+#
+#   rnaseq:cache:<namespace>:<key>   pickled value, expires after its TTL
+#   rnaseq:cache:<namespace>:lru     sorted set of keys scored by last access
+#
+# Each namespace is bounded to a maximum number of entries; the least recently
+# used keys are dropped first once the bound is exceeded.
+CACHE_KEY_PREFIX = "rnaseq:cache"
+DEFAULT_TTL = 60 * 5  # Seconds
+DEFAULT_MAX_ENTRIES = 128
+
+
+def _value_key(namespace, key):
+    return f"{CACHE_KEY_PREFIX}:{namespace}:{key}"
+
+
+def _lru_key(namespace):
+    return f"{CACHE_KEY_PREFIX}:{namespace}:lru"
+
+
+def make_cache_key(*parts):
+    """
+    Build a compact cache key from arbitrary parts (ids, timestamps, tokens).
+
+    Parts are hashed so secrets such as tokens never appear in Redis key names.
+    """
+    return hashlib.sha256(":".join(str(part) for part in parts).encode("utf-8")).hexdigest()[:32]
+
+
+def cache_get(namespace, key):
+    """
+    Return a cached value, or None on a miss.
+    """
+    try:
+        raw = redis_conn.get(_value_key(namespace, key))
+    except Exception as e:
+        print(f"Cache read failed for {namespace}: {e}")
+        return None
+
+    if raw is None:
+        return None
+
+    redis_conn.zadd(_lru_key(namespace), {key: time.time()})
+    return pickle.loads(raw)
+
+
+def cache_set(namespace, key, value, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Store a value and evict the least recently used entries beyond max_entries.
+    """
+    try:
+        pipe = redis_conn.pipeline()
+        pipe.set(_value_key(namespace, key), pickle.dumps(value), ex=ttl)
+        pipe.zadd(_lru_key(namespace), {key: time.time()})
+        pipe.execute()
+
+        excess = redis_conn.zcard(_lru_key(namespace)) - max_entries
+        if excess > 0:
+            evicted = [k.decode("utf-8") for k, _ in redis_conn.zpopmin(_lru_key(namespace), excess)]
+            redis_conn.delete(*[_value_key(namespace, k) for k in evicted])
+    except Exception as e:
+        print(f"Cache write failed for {namespace}: {e}")
+
+
+def cache_invalidate(namespace, key):
+    """
+    Drop a single entry, e.g. after the underlying B-Fabric object changed.
+    """
+    redis_conn.delete(_value_key(namespace, key))
+    redis_conn.zrem(_lru_key(namespace), key)
+
+
+def cached_call(namespace, key, compute, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+    """
+    Return the cached value for key, computing and storing it on a miss.
+
+    None results are not cached, so failed fetches are retried on the next call.
+    """
+    value = cache_get(namespace, key)
+    if value is None:
+        value = compute()
+        if value is not None:
+            cache_set(namespace, key, value, ttl=ttl, max_entries=max_entries)
+    return value
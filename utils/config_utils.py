@@ -0,0 +1,119 @@
+import math
+
+from utils.progress_utils import TRACE_FIELDS
+from utils.resource_history import get_learned_resources
+
+GB = 1024 ** 3
+
+# ------------------------------------------------------------------------------
+# PER-PROCESS RESOURCE MODEL
+# ------------------------------------------------------------------------------
+# Each entry maps a Nextflow process selector to a base memory (GB), the extra
+# memory per GB of FASTQ input of a single sample, and the maximum number of
+# CPUs the tool makes good use of (None = all selected CPUs). Processes with
+# enough history (utils/resource_history.py) get fitted requests instead.
+PROCESS_RESOURCES = {
+    ".*": {"memory": 4, "memory_per_gb": 0.5, "max_cpus": 2},
+    ".*:STAR_GENOMEGENERATE": {"memory": 32, "memory_per_gb": 0, "max_cpus": None},
+    ".*:STAR_ALIGN": {"memory": 32, "memory_per_gb": 1, "max_cpus": None},
+    ".*:SALMON_INDEX": {"memory": 16, "memory_per_gb": 0, "max_cpus": None},
+    ".*:SALMON_QUANT": {"memory": 4, "memory_per_gb": 1, "max_cpus": 8},
+    ".*:QUALIMAP_RNASEQ": {"memory": 4, "memory_per_gb": 2, "max_cpus": 2},
+}
+
+MIN_MEMORY_GB = 2
+
+
+def get_process_resources(ram_gb, cpus, fastq_bytes, n_samples, use_history=True):
+    """
+    Compute the CPU and memory request of every process selector.
+
+    Memory grows with the FASTQ size of a single sample (the unit a task works
+    on) and is capped at the RAM selected in the UI; CPUs are capped at the
+    selected CPU count. Requests fitted to the history of past runs replace
+    the static model where available.
+
+    Args:
+        ram_gb (int): RAM selected in the sidebar, in GB.
+        cpus (int): CPUs selected in the sidebar.
+        fastq_bytes (int): Total FASTQ size of the dataset in bytes.
+        n_samples (int): Number of samples in the dataset.
+        use_history (bool): Whether to use the resource history.
+
+    Returns:
+        dict: {selector: {"cpus": int, "memory": int (GB)}}
+    """
+    per_sample_gb = fastq_bytes / GB / max(n_samples, 1)
+
+    resources = {}
+    for selector, model in PROCESS_RESOURCES.items():
+        memory = model["memory"] + model["memory_per_gb"] * per_sample_gb
+        resources[selector] = {
+            "cpus": min(cpus, model["max_cpus"]) if model["max_cpus"] else cpus,
+            "memory": int(min(max(round(memory), MIN_MEMORY_GB), ram_gb)),
+        }
+
+    learned = {}
+    if use_history:
+        try:
+            learned = get_learned_resources(per_sample_gb)
+        except Exception as e:
+            print(f"Resource history unavailable, using the static model: {e}")
+
+    for selector, fitted in learned.items():
+        static = resources.get(selector, resources[".*"])
+        resources[selector] = {
+            "cpus": min(fitted["cpus"], cpus) if fitted["cpus"] else static["cpus"],
+            "memory": int(min(max(math.ceil(fitted["memory"]), MIN_MEMORY_GB), ram_gb)),
+        }
+    return resources
+
+
+def build_nextflow_config(ram_gb, cpus, fastq_bytes=0, n_samples=1):
+    """
+    Build the Nextflow config of one submission.
+
+    Replaces the static NFC_RNA.config: the global limits follow the RAM/CPU
+    selection, and STAR, Salmon and Qualimap get their own requests scaled to
+    the dataset size.
+
+    Returns:
+        bytes: The config file content, ready to be placed in files_as_byte_strings.
+    """
+    ram_gb = int(ram_gb)
+    cpus = int(cpus)
+
+    lines = [
+        "params {",
+        f"    max_cpus = {cpus}",
+        f"    max_memory = '{ram_gb} GB'",
+        "}",
+        "",
+        "// Raw trace values (ms, bytes) are followed by the worker for live progress",
+        "trace {",
+        "    raw = true",
+        "    overwrite = true",
+        f"    fields = '{','.join(TRACE_FIELDS)}'",
+        "}",
+        "",
+        "// The local executor must not use more of the host than the job declared",
+        "executor {",
+        f"    cpus = {cpus}",
+        f"    memory = '{ram_gb} GB'",
+        "}",
+        "",
+        "process {",
+        f"    resourceLimits = [cpus: {cpus}, memory: '{ram_gb} GB']",
+    ]
+
+    for selector, resources in get_process_resources(ram_gb, cpus, fastq_bytes, n_samples).items():
+        lines += [
+            f"    withName: '{selector}' {{",
+            f"        cpus = {resources['cpus']}",
+            f"        memory = '{resources['memory']} GB'",
+            "    }",
+        ]
+
+    lines.append("}")
+
+    return ("\n".join(lines) + "\n").encode("utf-8")
@@ -0,0 +1,50 @@
+import os
+
+FASTQ_COLUMNS = ["FASTQ Read 1", "FASTQ Read 2"]
+
+
+def get_fastq_paths(dataset):
+    """
+    Collect all FASTQ paths referenced by a dataset.
+
+    Args:
+        dataset (dict): Dataset dictionary as returned by dataset_to_dictionary.
+
+    Returns:
+        list[str]: Non-empty FASTQ paths from the read columns.
+    """
+    if not dataset:
+        return []
+
+    paths = []
+    for column in FASTQ_COLUMNS:
+        paths.extend(path for path in dataset.get(column, []) if path)
+    return paths
+
+
+def get_total_fastq_bytes(dataset):
+    """
+    Sum the size of all FASTQ files of a dataset.
+
+    Files that are not reachable from this server are skipped, so the
+    result is a lower bound when the storage is only mounted on the workers.
+
+    Returns:
+        int: Total size in bytes.
+    """
+    total = 0
+    for path in get_fastq_paths(dataset):
+        try:
+            total += os.path.getsize(path)
+        except OSError:
+            continue
+    return total
+
+
+def get_sample_count(dataset):
+    """
+    Return the number of samples (rows) in a dataset.
+    """
+    if not dataset:
+        return 0
+    return len(dataset.get("Sample", next(iter(dataset.values()), [])))
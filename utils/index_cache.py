@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+
+import bfabric_web_apps
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+# ------------------------------------------------------------------------------
+# CONTENT-ADDRESSED REFERENCE INDEX CACHE
+# ------------------------------------------------------------------------------
+# STAR/Salmon indexes are stored on scratch under a key derived from the content
+# of the FASTA and GTF they were built from:
+#
+#   <INDEX_CACHE_DIR>/<key>/star/        STAR index
+#   <INDEX_CACHE_DIR>/<key>/salmon/      Salmon index (if the run built one)
+#   <INDEX_CACHE_DIR>/<key>/index.json   FASTA/GTF the index was built from
+#   <INDEX_CACHE_DIR>/<key>/.complete    Written last, marks the entry as usable
+#   <INDEX_CACHE_DIR>/<key>/.last_used   Touched on every hit, drives LRU eviction
+#
+# The cache directory must be visible to both the web server and the workers.
+# A job that uses an entry pins it until it finished, so eviction never
+# removes an index under a queued or running pipeline:
+#
+#   rnaseq:index:pins:<key>   sorted set {job_id: lease expiry (epoch seconds)}
+#
+# The lease expires on its own if a job is lost without unpinning.
+INDEX_CACHE_DIR = f"{bfabric_web_apps.SCRATCH_PATH}/rnaseq_index_cache"
+FINGERPRINTS_FILE = f"{INDEX_CACHE_DIR}/fingerprints.json"
+
+MAX_CACHED_INDEXES = 4
+MAX_CACHE_BYTES = 500 * 1024 ** 3
+
+PIN_KEY_PREFIX = "rnaseq:index:pins"
+PIN_TTL = 60 * 60 * 24 * 7  # Seconds; longer than a job waits and runs
+
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _load_fingerprints():
+    try:
+        with open(FINGERPRINTS_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_fingerprints(fingerprints):
+    os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+    tmp_path = f"{FINGERPRINTS_FILE}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(fingerprints, f)
+    os.replace(tmp_path, FINGERPRINTS_FILE)
+
+
+def file_fingerprint(path):
+    """
+    Return the SHA-256 of a reference file's content.
+
+    Hashing a multi-GB FASTA is expensive, so the digest is remembered per
+    (path, size, mtime) and only recomputed when the file changes.
+
+    Returns:
+        str or None: Hex digest, or None if the file is not readable here.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+
+    stamp = f"{path}:{stat.st_size}:{stat.st_mtime_ns}"
+    fingerprints = _load_fingerprints()
+    if stamp in fingerprints:
+        return fingerprints[stamp]
+
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+
+    fingerprints = {k: v for k, v in fingerprints.items() if not k.startswith(f"{path}:")}
+    fingerprints[stamp] = digest.hexdigest()
+    try:
+        _save_fingerprints(fingerprints)
+    except OSError as e:
+        print(f"Could not store reference fingerprint: {e}")
+
+    return fingerprints[stamp]
+
+
+def get_index_key(fasta_path, gtf_path):
+    """
+    Compute the cache key of the index built from a FASTA and a GTF.
+
+    Returns:
+        str or None: The key, or None if either file cannot be read from this server.
+    """
+    fasta_digest = file_fingerprint(fasta_path)
+    gtf_digest = file_fingerprint(gtf_path)
+    if fasta_digest is None or gtf_digest is None:
+        return None
+    return hashlib.sha256(f"{fasta_digest}:{gtf_digest}".encode("utf-8")).hexdigest()[:16]
+
+
+def get_index_entry_dir(key):
+    return f"{INDEX_CACHE_DIR}/{key}"
+
+
+def _pin_key(key):
+    return f"{PIN_KEY_PREFIX}:{key}"
+
+
+def pin_index(key, job_id, ttl=PIN_TTL):
+    """
+    Protect a cache entry from eviction while the given job may use it.
+    """
+    redis_conn.zadd(_pin_key(key), {job_id: time.time() + ttl})
+    redis_conn.expire(_pin_key(key), ttl)
+
+
+def unpin_index(key, job_id):
+    """
+    Release a job's pin, once the job finished (successfully or not).
+    """
+    if key and job_id:
+        redis_conn.zrem(_pin_key(key), job_id)
+
+
+def is_index_pinned(key):
+    """
+    Whether any job holds an unexpired pin on a cache entry.
+    """
+    redis_conn.zremrangebyscore(_pin_key(key), "-inf", time.time())
+    return redis_conn.zcard(_pin_key(key)) > 0
+
+
+def get_cached_index(key, job_id=None):
+    """
+    Look up a complete cache entry and mark it as recently used.
+
+    Args:
+        key (str): Cache key from get_index_key.
+        job_id (str, optional): Job that will use the entry; it is pinned for that job.
+
+    Returns:
+        dict or None: {"star_index": path, "salmon_index": path or None}, or None on a miss.
+    """
+    if not key:
+        return None
+
+    entry_dir = get_index_entry_dir(key)
+    # Pin before checking, so an eviction running concurrently either sees the pin or the entry is gone.
+    if job_id:
+        pin_index(key, job_id)
+    if not os.path.exists(f"{entry_dir}/.complete"):
+        unpin_index(key, job_id)
+        return None
+
+    try:
+        with open(f"{entry_dir}/.last_used", "a"):
+            os.utime(f"{entry_dir}/.last_used")
+    except OSError:
+        pass
+
+    salmon_dir = f"{entry_dir}/salmon"
+    return {
+        "star_index": f"{entry_dir}/star",
+        "salmon_index": salmon_dir if os.path.isdir(salmon_dir) else None,
+    }
+
+
+def build_promote_commands(key, output_dir, fasta, gtf, job_id):
+    """
+    Build the bash commands that copy a freshly built index into the cache.
+
+    The run must have been started with --save_reference, so nf-core/rnaseq
+    publishes its indexes under <output_dir>/genome/index. The entry is
+    assembled in a directory of its own job and completed there, then renamed
+    into place in one step: readers never see a partial entry, and if another
+    job promoted the same index first the rename fails and this copy is dropped.
+
+    Returns:
+        list[str]: Commands to append to the job's bash_commands.
+    """
+    entry_dir = get_index_entry_dir(key)
+    tmp_dir = f"{entry_dir}.{job_id}.tmp"
+    index_dir = f"{output_dir}/genome/index"
+    metadata = json.dumps({"fasta": fasta, "gtf": gtf})
+
+    return [
+        f"rm -rf {tmp_dir} && mkdir -p {tmp_dir}",
+        f"[ -d {index_dir}/salmon ] && cp -r {index_dir}/salmon {tmp_dir}/salmon || true",
+        f"echo '{metadata}' > {tmp_dir}/index.json",
+        (
+            f"[ -d {index_dir}/star ] && [ ! -e {entry_dir} ] && "
+            f"cp -r {index_dir}/star {tmp_dir}/star && touch {tmp_dir}/.last_used {tmp_dir}/.complete && "
+            f"mv -T {tmp_dir} {entry_dir} || rm -rf {tmp_dir}"
+        ),
+    ]
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                continue
+    return total
+
+
+def list_cached_indexes():
+    """
+    List all complete cache entries, most recently used first.
+
+    Returns:
+        list[dict]: Entries with key, fasta, gtf, size_bytes and last_used (epoch seconds).
+    """
+    if not os.path.isdir(INDEX_CACHE_DIR):
+        return []
+
+    entries = []
+    for key in os.listdir(INDEX_CACHE_DIR):
+        entry_dir = get_index_entry_dir(key)
+        if key.endswith(".tmp") or not os.path.exists(f"{entry_dir}/.complete"):
+            continue
+
+        try:
+            with open(f"{entry_dir}/index.json") as f:
+                metadata = json.load(f)
+        except (OSError, ValueError):
+            metadata = {}
+
+        try:
+            last_used = os.path.getmtime(f"{entry_dir}/.last_used")
+        except OSError:
+            last_used = os.path.getmtime(f"{entry_dir}/.complete")
+
+        entries.append({
+            "key": key,
+            "fasta": metadata.get("fasta"),
+            "gtf": metadata.get("gtf"),
+            "size_bytes": _dir_size(entry_dir),
+            "last_used": last_used,
+        })
+
+    return sorted(entries, key=lambda entry: entry["last_used"], reverse=True)
+
+
+def evict_index_cache(max_entries=MAX_CACHED_INDEXES, max_bytes=MAX_CACHE_BYTES, reserve_entries=0):
+    """
+    Evict least recently used entries until the cache fits its limits.
+
+    Entries pinned by a queued or running job are skipped, so the cache may
+    stay above its limits until those jobs finished.
+
+    Args:
+        max_entries (int): Maximum number of cached indexes.
+        max_bytes (int): Maximum total size of the cache in bytes.
+        reserve_entries (int): Slots to keep free for indexes about to be promoted.
+
+    Returns:
+        list[str]: Keys of the evicted entries.
+    """
+    entries = list_cached_indexes()
+    total_bytes = sum(entry["size_bytes"] for entry in entries)
+    evicted = []
+
+    candidates = list(reversed(entries))  # Least recently used first
+    while candidates and (len(entries) + reserve_entries > max_entries or total_bytes > max_bytes):
+        entry = candidates.pop(0)
+        if is_index_pinned(entry["key"]):
+            continue
+
+        # Renamed away before the pin is checked again: a lookup pins before it
+        # checks the entry, so it either saw the entry gone (a miss) or its pin
+        # is visible here and the entry is put back.
+        entry_dir = get_index_entry_dir(entry["key"])
+        trash_dir = f"{entry_dir}.{os.getpid()}.evicted.tmp"
+        try:
+            os.rename(entry_dir, trash_dir)
+        except OSError:
+            continue
+        if is_index_pinned(entry["key"]):
+            try:
+                os.rename(trash_dir, entry_dir)
+            except OSError:
+                # The entry was promoted again meanwhile; drop this copy
+                shutil.rmtree(trash_dir, ignore_errors=True)
+            continue
+        shutil.rmtree(trash_dir, ignore_errors=True)
+
+        entries.remove(entry)
+        total_bytes -= entry["size_bytes"]
+        evicted.append(entry["key"])
+        print(f"Evicted cached index {entry['key']} (last used {time.ctime(entry['last_used'])}).")
+
+    return evicted
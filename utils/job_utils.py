@@ -0,0 +1,534 @@
+import hashlib
+import json
+import os
+import shutil
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from rq import get_current_job
+import bfabric_web_apps
+from bfabric_web_apps import run_main_job, get_logger, process_url_and_token
+from bfabric_web_apps.utils.run_main_pipeline import (
+    attach_gstore_files_to_entities_as_link,
+    save_files_from_bytes,
+    execute_and_log_bash_commands
+)
+
+from utils.samplesheet_utils import build_sample_sheet_bytes, validate_sample_sheet_bytes, SamplesheetValidationError
+from utils.dataset_utils import get_total_fastq_bytes, get_sample_count
+from utils.config_utils import build_nextflow_config
+from utils.routing_utils import estimate_job_cost
+from utils.index_cache import get_index_key, get_cached_index, build_promote_commands, evict_index_cache, unpin_index
+from utils.shard_utils import merge_shard_outputs, COUNT_MATRIX_GLOB
+from utils.submission_utils import mark_submission_finished, release_submission, update_submission
+from utils.progress_utils import track_progress, get_expected_tasks, read_trace, get_failed_tasks
+from utils.run_history import record_run, relocate_run
+from utils.resource_history import ingest_trace
+from utils.results_store import convert_count_matrices
+from utils.qc_analytics import find_counts_matrix, get_qc
+from utils.transfer_utils import (
+    get_gstore_destination, stage_output_tree, stage_output_tree_remote, verify_staged_tree,
+    update_resource_paths, TRANSFER_WORKERS
+)
+from utils.pipeline_utils import (
+    get_run_key, get_run_dir, get_job_file_path, get_reference_paths, build_run_pipeline_command, PIPELINE_DRY_RUN
+)
+
+# ------------------------------------------------------------------------------
+# OUTPUT MANIFEST RULES
+# ------------------------------------------------------------------------------
+# (glob relative to the output directory, attachment name template). Templates
+# may use {name} (file name) and {parent} (name of the containing directory).
+ATTACHMENT_RULES = [
+    ("multiqc/*/multiqc_report.html", "{name}"),
+    ("multiqc/*/multiqc_report_shard_*.html", "{name}"),
+    ("multiqc/*/multiqc_report_plots/pdf/*.pdf", "{name}"),
+    ("*/qualimap/*/qualimapReport.html", "{parent}_{name}"),
+    ("*/deseq2_qc/deseq2.plots.pdf", "{name}"),
+    ("pipeline_info/execution_report_*.html", "{name}"),
+]
+
+MANIFEST_FILE_NAME = "attachment_manifest.json"
+ATTACHMENT_WORKERS = 8
+CHECKSUM_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def build_pipeline_payload(job_id, dataset, output_dir, ram, cpus, fasta=None, gtf=None, user_id=None,
+                           dry_run=PIPELINE_DRY_RUN):
+    """
+    Assemble everything the worker needs to run nf-core/rnaseq on one dataset.
+
+    Args:
+        job_id (str): Id that keys the job's samplesheet and config on the worker.
+        dataset (dict): Dataset (or shard) to process.
+        output_dir (str): Directory where the pipeline publishes its results.
+        ram (int): RAM selected in the UI, in GB.
+        cpus (int): CPUs selected in the UI.
+        fasta (str, optional): Selected FASTA file name.
+        gtf (str, optional): Selected GTF file name.
+        user_id (int, optional): B-Fabric user who submitted the run; only they see its progress.
+        dry_run (bool): Only echo the nextflow command; see PIPELINE_DRY_RUN.
+
+    Returns:
+        dict: files_as_byte_strings, bash_commands, the cost estimate, the
+              FASTQ size, the index cache key/state, the progress settings and
+              what the worker adds to the resource history (both None for a
+              dry run) and the dry_run flag.
+    """
+    samplesheet_path = get_job_file_path(job_id, "samplesheet.csv")
+    config_path = get_job_file_path(job_id, "NFC_RNA.config")
+    trace_path = get_job_file_path(job_id, "trace.txt")
+    fastq_bytes = get_total_fastq_bytes(dataset)
+    n_samples = get_sample_count(dataset)
+
+    files_as_byte_strings = {
+        samplesheet_path: build_sample_sheet_bytes(dataset),
+        config_path: build_nextflow_config(ram_gb=ram, cpus=cpus, fastq_bytes=fastq_bytes, n_samples=n_samples),
+    }
+
+    # Each dataset/parameter combination keeps its own launch and work directory,
+    # so a resubmit resumes from the cached tasks of the previous attempt.
+    run_dir = get_run_dir(get_run_key(dataset, {"fasta": fasta, "gtf": gtf}))
+
+    # Reuse a cached STAR/Salmon index for this FASTA+GTF (pinned until the job finished),
+    # or save the one this run builds.
+    index_key = get_index_key(*get_reference_paths(fasta, gtf))
+    cached_index = get_cached_index(index_key, job_id=job_id) or {}
+
+    run_pipeline_command = build_run_pipeline_command(
+        input_path=samplesheet_path,
+        output_dir=output_dir,
+        run_dir=run_dir,
+        fasta=fasta,
+        gtf=gtf,
+        config_path=config_path,
+        star_index=cached_index.get("star_index"),
+        salmon_index=cached_index.get("salmon_index"),
+        save_reference=bool(index_key) and not cached_index,
+        trace_path=trace_path
+    )
+
+    if dry_run:
+        bash_commands = [f"mkdir -p {output_dir}", f'echo "{run_pipeline_command}"']
+    else:
+        bash_commands = [f"mkdir -p {run_dir}", f"mkdir -p {output_dir}", run_pipeline_command]
+
+    if index_key and not cached_index and not dry_run:
+        evict_index_cache(reserve_entries=1)
+        bash_commands += build_promote_commands(index_key, output_dir, fasta, gtf, job_id)
+
+    estimate = estimate_job_cost(n_samples, fastq_bytes, fasta, index_cached=bool(cached_index))
+
+    return {
+        "files_as_byte_strings": files_as_byte_strings,
+        "bash_commands": bash_commands,
+        "estimate": estimate,
+        "fastq_bytes": fastq_bytes,
+        "index_key": index_key,
+        "index_cached": bool(cached_index),
+        "progress": None if dry_run else {
+            "trace_path": trace_path,
+            "expected_tasks": get_expected_tasks(n_samples),
+            "estimate_hours": estimate["runtime_hours"],
+            "user_id": user_id,
+        },
+        "resource_history": None if dry_run else {
+            "trace_path": trace_path,
+            "input_gb": fastq_bytes / 1024 ** 3 / max(n_samples, 1),
+        },
+        "dry_run": dry_run,
+    }
+
+
+def scan_output_manifest(output_dir, rules=ATTACHMENT_RULES):
+    """
+    Find the reports of a finished run by matching the output tree against glob rules.
+
+    Args:
+        output_dir (str): Pipeline output directory.
+        rules (list[tuple]): (glob pattern, attachment name template) pairs.
+
+    Returns:
+        dict: {source path: attachment name}, with unique attachment names.
+    """
+    manifest = {}
+    used_names = set()
+
+    for pattern, template in rules:
+        for path in sorted(Path(output_dir).glob(pattern)):
+            if not path.is_file() or str(path) in manifest:
+                continue
+
+            name = template.format(name=path.name, parent=path.parent.name)
+            if name in used_names:
+                # Same report name in two places (e.g. two aligners): qualify it with its location
+                name = "_".join(path.relative_to(output_dir).parts)
+            used_names.add(name)
+            manifest[str(path)] = name
+
+    return manifest
+
+
+def file_checksum(path):
+    """
+    Return the SHA-256 of a file, read in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHECKSUM_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def write_manifest(output_dir, manifest, max_workers=ATTACHMENT_WORKERS):
+    """
+    Checksum all manifest entries concurrently and write them next to the results.
+
+    Returns:
+        str: Path of the written manifest file.
+    """
+    paths = list(manifest)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        checksums = dict(zip(paths, executor.map(file_checksum, paths)))
+
+    entries = [
+        {
+            "path": path,
+            "name": name,
+            "size": Path(path).stat().st_size,
+            "sha256": checksums[path],
+        }
+        for path, name in manifest.items()
+    ]
+
+    manifest_path = f"{output_dir}/{MANIFEST_FILE_NAME}"
+    with open(manifest_path, "w") as f:
+        json.dump(entries, f, indent=2)
+
+    return manifest_path
+
+
+def verify_manifest_checksums(output_dir, destination, max_workers=ATTACHMENT_WORKERS):
+    """
+    Check the staged copies of the manifest entries against the checksums write_manifest recorded.
+
+    Returns:
+        list[str]: Relative paths whose staged copy is missing or differs.
+    """
+    manifest_path = f"{output_dir}/{MANIFEST_FILE_NAME}"
+    if not os.path.exists(manifest_path):
+        return []
+    with open(manifest_path) as f:
+        entries = json.load(f)
+
+    relatives = [os.path.relpath(entry["path"], output_dir) for entry in entries]
+
+    def matches(entry, relative):
+        target = os.path.join(destination, relative)
+        return os.path.isfile(target) and file_checksum(target) == entry["sha256"]
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = list(executor.map(matches, entries, relatives))
+    return [relative for relative, ok in zip(relatives, results) if not ok]
+
+
+def register_attachments(token_data, manifest, max_workers=ATTACHMENT_WORKERS):
+    """
+    Copy the manifest files to gstore and link them in B-Fabric with a bounded pool.
+
+    Each copy/link round trip is independent, so running them concurrently turns
+    hundreds of sequential transfers into a few batches.
+    """
+    def attach(item):
+        source_path, file_name = item
+        # One logger per task: the Logger buffers messages and is not thread-safe.
+        attach_gstore_files_to_entities_as_link(token_data, get_logger(token_data), {source_path: file_name})
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(attach, manifest.items()))
+
+
+def _ingest_resource_history(resource_history):
+    """
+    Add the finished run's trace to the resource history; a failure only costs the observations.
+    """
+    if not resource_history:
+        return
+    try:
+        n_observations = ingest_trace(**resource_history)
+        print(f"Added {n_observations} task(s) from {resource_history['trace_path']} to the resource history.")
+    except Exception as e:
+        print(f"Failed to update the resource history: {e}")
+
+
+def check_run_outputs(output_dir=None, trace_path=None):
+    """
+    Check that a run succeeded; run_main_job reports success even when a step failed.
+
+    Args:
+        output_dir (str, optional): Must contain the merged count matrices.
+        trace_path (str, optional): Nextflow trace, which must exist and must not
+                                    contain failed tasks that were never retried successfully.
+
+    Returns:
+        list[str]: Human-readable problems; empty if the run succeeded.
+    """
+    problems = []
+    if output_dir is not None and not any(Path(output_dir).glob(COUNT_MATRIX_GLOB)):
+        problems.append(f"No merged count matrix found in {output_dir}")
+    if trace_path is not None:
+        try:
+            failed = get_failed_tasks(read_trace(trace_path))
+        except FileNotFoundError:
+            problems.append(f"Nextflow trace {trace_path} not found")
+        else:
+            if failed:
+                problems.append(f"{len(failed)} failed task(s): {', '.join(failed[:5])}")
+    return problems
+
+
+def _unpin_current_job(index_key):
+    """
+    Release the index cache pin build_pipeline_payload took for the current RQ job.
+    """
+    job = get_current_job()
+    if index_key and job is not None:
+        try:
+            unpin_index(index_key, job.id)
+        except Exception as e:
+            print(f"Failed to unpin cached index {index_key}: {e}")
+
+
+def check_fastq_files(files_as_byte_strings):
+    """
+    Validate the samplesheet among a job's files, including that its FASTQ files exist here.
+
+    Returns:
+        list[str]: All problems found; empty if the samplesheet is valid or the job has none.
+    """
+    for path, content in files_as_byte_strings.items():
+        if os.path.basename(path) == "samplesheet.csv":
+            return validate_sample_sheet_bytes(content)
+    return []
+
+
+@contextmanager
+def _track_current_job(progress):
+    """
+    Publish the live progress of the current RQ job, if progress settings were given.
+    """
+    job = get_current_job()
+    if not progress or job is None:
+        yield
+        return
+
+    with track_progress(job.id, **progress):
+        yield
+
+
+def run_rnaseq_job(files_as_byte_strings, bash_commands, resource_paths, token, output_dir,
+                   service_id=0, charge=[], attachment_rules=ATTACHMENT_RULES, max_workers=ATTACHMENT_WORKERS,
+                   submission_key=None, progress=None, run_record=None, resource_history=None, index_key=None,
+                   dry_run=False, check_files=False):
+    """
+    Worker entry point: run the pipeline, then attach whatever reports it produced.
+
+    The attachments are not known before the run (they depend on the samples
+    and on the timestamped report names), so the output directory is scanned
+    after run_main_job finished instead of passing a fixed attachment list.
+    The count matrices are converted to the results store first. Finally the
+    submission is marked finished, so identical submits keep pointing at
+    these results.
+
+    A run without count matrices or with failed tasks releases its submission
+    instead, so it can be submitted again, and fails the RQ job, so its
+    outputs are not staged. A dry run (PIPELINE_DRY_RUN) produces no outputs,
+    so it is not checked.
+
+    check_files is set when the web app prepared the submission without
+    checking the FASTQ files (it may not mount their storage); they are
+    checked here before the pipeline starts.
+    """
+    token_data = process_url_and_token(token)[1]
+    L = get_logger(token_data)
+    job_id = getattr(get_current_job(), "id", None)
+
+    problems = check_fastq_files(files_as_byte_strings) if check_files else []
+    if problems:
+        _unpin_current_job(index_key)
+        error = SamplesheetValidationError(problems)
+        L.log_operation("Error | ORIGIN: rnaseq web app", f"Run {job_id} not started: {error}")
+        if submission_key:
+            release_submission(submission_key, job_id)
+        raise error
+
+    try:
+        with _track_current_job(progress):
+            run_main_job(
+                files_as_byte_strings=files_as_byte_strings,
+                bash_commands=bash_commands,
+                resource_paths=resource_paths,
+                attachment_paths={},
+                token=token,
+                service_id=service_id,
+                charge=charge
+            )
+    finally:
+        _unpin_current_job(index_key)
+    _ingest_resource_history(resource_history)
+
+    problems = [] if dry_run else check_run_outputs(output_dir, (progress or {}).get("trace_path"))
+    if problems:
+        L.log_operation("Error | ORIGIN: rnaseq web app", f"Run {job_id} failed: {'; '.join(problems)}.")
+        if submission_key:
+            release_submission(submission_key, job_id)
+        raise RuntimeError(f"Run {job_id} failed: {'; '.join(problems)}")
+
+    # Columnar copies of the count matrices and their sample QC for the results tab
+    try:
+        matrices = convert_count_matrices(output_dir)
+        counts_matrix = find_counts_matrix(output_dir)
+        if counts_matrix:
+            get_qc(counts_matrix)
+        L.log_operation("Info | ORIGIN: rnaseq web app", f"Converted {len(matrices)} matrix file(s) of {output_dir} to the results store.")
+    except Exception as e:
+        L.log_operation("Error | ORIGIN: rnaseq web app", f"Failed to build the results store of {output_dir}: {e}")
+
+    try:
+        manifest = scan_output_manifest(output_dir, attachment_rules)
+        manifest[write_manifest(output_dir, manifest, max_workers)] = MANIFEST_FILE_NAME
+        register_attachments(token_data, manifest, max_workers)
+        L.log_operation("Success | ORIGIN: rnaseq web app", f"Registered {len(manifest)} attachment(s) from {output_dir}.")
+    except Exception as e:
+        L.log_operation("Error | ORIGIN: rnaseq web app", f"Failed to register attachments from {output_dir}: {e}")
+        print(f"Error registering attachments: {e}")
+
+    mark_submission_finished(submission_key)
+
+    if run_record:
+        try:
+            record_run(output_dir=output_dir, job_id=job_id, **run_record)
+        except Exception as e:
+            print(f"Failed to record run {output_dir}: {e}")
+
+
+def run_shard_job(files_as_byte_strings, bash_commands, token, progress=None, resource_history=None, index_key=None,
+                  check_files=False):
+    """
+    Worker entry point for one shard: run the pipeline without registering anything.
+
+    Results are registered once by run_merge_job after all shards finished.
+    A shard with failed tasks or, with check_files, missing FASTQ files fails
+    its RQ job, so the merge job never runs.
+    """
+    token_data = process_url_and_token(token)[1]
+    L = get_logger(token_data)
+
+    problems = check_fastq_files(files_as_byte_strings) if check_files else []
+    if problems:
+        _unpin_current_job(index_key)
+        error = SamplesheetValidationError(problems)
+        L.log_operation("Error | ORIGIN: rnaseq web app", f"Shard not started: {error}")
+        raise error
+
+    summary = save_files_from_bytes(files_as_byte_strings, L)
+    try:
+        with _track_current_job(progress):
+            bash_log = execute_and_log_bash_commands(bash_commands)
+    finally:
+        _unpin_current_job(index_key)
+    _ingest_resource_history(resource_history)
+
+    problems = check_run_outputs(trace_path=(progress or {}).get("trace_path"))
+    if problems:
+        L.log_operation("Error | ORIGIN: rnaseq web app", f"Shard failed: {'; '.join(problems)}.\n{bash_log}")
+        raise RuntimeError(f"Shard failed: {'; '.join(problems)}")
+    L.log_operation("Success | ORIGIN: rnaseq web app", f"Shard finished. File copy summary: {summary}\n{bash_log}")
+
+
+def run_merge_job(shard_dirs, output_dir, resource_paths, token, service_id=0, charge=[], submission_key=None,
+                  run_record=None, dry_run=False):
+    """
+    Worker entry point that runs after all shards: merge their outputs and register the result.
+
+    For an incremental rerun, shard_dirs starts with the output directory of
+    the previous run, whose samples are kept unless a shard reprocessed them.
+    The submission is released, as in run_rnaseq_job, if the merge fails or
+    yields no count matrix.
+    """
+    try:
+        merged_paths = merge_shard_outputs(shard_dirs, output_dir)
+    except Exception:
+        if submission_key:
+            release_submission(submission_key, getattr(get_current_job(), "id", None))
+        raise
+    print(f"Merged {len(merged_paths)} file(s) from {len(shard_dirs)} shard(s) into {output_dir}.")
+
+    run_rnaseq_job(
+        files_as_byte_strings={},
+        bash_commands=[],
+        resource_paths=resource_paths,
+        token=token,
+        output_dir=output_dir,
+        service_id=service_id,
+        charge=charge,
+        submission_key=submission_key,
+        run_record=run_record,
+        dry_run=dry_run
+    )
+
+
+def run_transfer_job(output_dir, token, max_workers=TRANSFER_WORKERS, submission_key=None, run_record=None):
+    """
+    Worker entry point that runs after a run: stage its output tree to gstore.
+
+    Enqueued on the transfer queue with a retry policy; a retried job only
+    finishes what the interrupted one left over. Once the staged tree is
+    verified (sizes, plus the manifest checksums for the attachments), the
+    run's resources point at gstore; if gstore is mounted, the run history and
+    the submission do as well and the local copy is removed.
+
+    The per-shard outputs of a sharded run ({output_dir}_shards) are staged
+    next to it ({destination}_shards) and then removed locally; the app only
+    reads the merged tree.
+    """
+    token_data = process_url_and_token(token)[1]
+    L = get_logger(token_data)
+    destination = get_gstore_destination(token_data, output_dir)
+    mounted = os.path.exists(bfabric_web_apps.GSTORE_REMOTE_PATH)
+    trees = [(output_dir, destination)]
+    if os.path.isdir(f"{output_dir}_shards"):
+        trees.append((f"{output_dir}_shards", f"{destination}_shards"))
+
+    try:
+        if mounted:
+            summaries = [stage_output_tree(source, target, max_workers) for source, target in trees]
+            missing = [path for source, target in trees for path in verify_staged_tree(source, target)]
+            missing += verify_manifest_checksums(output_dir, destination, max_workers)
+            if missing:
+                raise RuntimeError(f"{len(missing)} file(s) missing, incomplete or corrupt, e.g. {missing[0]}")
+        else:
+            # rsync verified the files and g-req raises if it could not move them into gstore
+            summaries = [stage_output_tree_remote(source, target, max_workers) for source, target in trees]
+        summary = summaries[0]
+        if len(summaries) > 1:
+            summary["shards"] = summaries[1]
+        summary["resources_updated"] = update_resource_paths(token_data, output_dir, destination)
+    except Exception as e:
+        L.log_operation("Error | ORIGIN: rnaseq web app", f"Staging {output_dir} to {destination} failed: {e}")
+        raise
+
+    if mounted:
+        if run_record:
+            relocate_run(run_record["entity_id"], run_record["fasta"], run_record["gtf"], output_dir, destination)
+        update_submission(submission_key, output_dir=destination)
+        shutil.rmtree(output_dir)
+    if len(trees) > 1:
+        shutil.rmtree(trees[1][0])
+
+    L.log_operation(
+        "Success | ORIGIN: rnaseq web app",
+        f"Staged {output_dir} to {destination}" + (" and removed the local copy." if mounted else "."),
+        params=summary
+    )
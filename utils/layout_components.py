@@ -1,16 +1,8 @@
 
-from dash import Input, Output, State, html, dcc
+from dash import html, dcc
+from dash.dash_table import DataTable
 import dash_bootstrap_components as dbc
 import bfabric_web_apps
-from generic.callbacks import app
-from generic.components import no_auth
-from pathlib import Path
-from dash.dash_table import DataTable
-import os
-import pandas as pd
-from bfabric_web_apps.utils.redis_queue import q
-from bfabric_web_apps import run_main_job, get_logger, read_file_as_bytes, dataset_to_dictionary
-from datetime import datetime
 
 # ------------------------------------------------------------------------------
 # 1) SIDEBAR DEFINITION
@@ -73,13 +65,39 @@ sidebar = bfabric_web_apps.components.charge_switch + [dbc.Container(
             ],
         ),
         html.Br(),
+        # Samples
+        html.P("Samples"),
+        dbc.Select(
+            id='rerun-mode',
+            options=[
+                {'label': 'All samples', 'value': 'all'},
+                {'label': 'Selected samples (merged into the last run)', 'value': 'selected'},
+                {'label': 'New samples only (merged into the last run)', 'value': 'new'},
+            ],
+            value='all'
+        ),
+        dbc.Checkbox(
+            id='force-rerun',
+            label='Run again even if an identical run already finished',
+            value=False
+        ),
+        html.Br(),
+        # Shards
+        html.P("Shards"),
+        dbc.Select(
+            id='shards',
+            options=[{'label': str(x), 'value': x} for x in [1, 2, 4, 8]],
+            value=1  # One run for the whole dataset
+        ),
+        html.Br(),
         html.P(id="sidebar_text_3", children="Submit job to which queue?"),
         dcc.Dropdown(
             options=[
+                {'label': 'auto (estimate from dataset)', 'value': 'auto'},
                 {'label': 'light', 'value': 'light'},
                 {'label': 'heavy', 'value': 'heavy'}
             ],
-            value='light',
+            value='auto',
             id='queue'
     ),
     html.Br(),
@@ -121,6 +139,10 @@ alerts = html.Div(
                   id="alert-fade-success", dismissable=True, is_open=False),
         dbc.Alert("Error: Workunit creation failed!", color="danger",
                   id="alert-fade-fail", dismissable=True, is_open=False),
+        dbc.Alert("This run was already submitted.", color="info",
+                  id="alert-fade-duplicate", dismissable=True, is_open=False),
+        dbc.Alert("Preparing the job ...", color="secondary",
+                  id="alert-fade-pending", dismissable=True, is_open=False),
     ],
     style={"margin": "20px"}
 )
@@ -138,6 +160,55 @@ infra_warning_alert = dbc.Alert(
     style={"margin": "20px"}
 )
 
+# Results of the last finished run, read page by page from the columnar results store
+results_panel = html.Div([
+    html.Div(id="results-run-info", style={"fontSize": "0.85rem", "marginBottom": "10px"}),
+    dcc.Dropdown(
+        id="results-matrix",
+        options=[],
+        placeholder="Matrix",
+        clearable=False,
+        style={"maxWidth": "90%", "marginBottom": "10px", "fontSize": "0.85rem"}
+    ),
+    dcc.Dropdown(
+        id="results-samples",
+        options=[],
+        value=[],
+        multi=True,
+        placeholder="Samples",
+        style={"maxWidth": "90%", "marginBottom": "10px", "fontSize": "0.85rem"}
+    ),
+    dbc.Input(
+        id="results-search",
+        type="text",
+        placeholder="Search gene / transcript id or name",
+        debounce=True,
+        style={"maxWidth": "90%", "marginBottom": "10px", "fontSize": "0.85rem"}
+    ),
+    DataTable(
+        id="results-table",
+        data=[],
+        columns=[],
+        page_action="custom",
+        page_current=0,
+        page_size=20,
+        style_table={'overflowX': 'auto', 'maxWidth': '90%'},
+        style_cell={
+            'textAlign': 'left',
+            'padding': '5px',
+            'fontSize': '0.85rem',
+            'font-family': 'Arial',
+            'border': '1px solid lightgrey'
+        },
+        style_header={
+            'backgroundColor': 'rgb(230, 230, 230)',
+            'fontWeight': 'bold'
+        }
+    ),
+    html.H5("Sample QC", style={"marginTop": "20px"}),
+    dcc.Loading(html.Div(id="results-qc")),
+], style={"marginTop": "10px"})
+
 
 # ------------------------------------------------------------------------------
 # 4) MAIN LAYOUT: SIDEBAR + CONTENT
@@ -170,7 +241,19 @@ app_specific_layout = dbc.Row(
                 id="page-content",
                 children=[
                     dcc.Store(id="dataset", data={}),
-                    html.Div(id="auth-div")
+                    dcc.Store(id="table-session", data=None),
+                    # Version of the queue layout this tab shows
+                    dcc.Store(id="queue-version", data=None),
+                    # Preparation job of the last submit, polled until it finished
+                    dcc.Store(id="pending-submission", data=None),
+                    dcc.Interval(id="submit-interval", interval=1000, disabled=True),
+                    dbc.Tabs([
+                        dbc.Tab(html.Div(id="auth-div"), label="Dataset"),
+                        dbc.Tab(results_panel, label="Results"),
+                    ]),
+                    # Live progress of running pipelines, refreshed from Redis
+                    dcc.Interval(id="progress-interval", interval=10 * 1000),
+                    html.Div(id="pipeline-progress", style={"margin-top": "20px"})
                 ],
                 style={
                     "margin-top": "2vh",
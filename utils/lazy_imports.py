@@ -0,0 +1,40 @@
+import importlib.util
+import sys
+
+# ------------------------------------------------------------------------------
+# LAZY MODULE IMPORTS
+# ------------------------------------------------------------------------------
+# Heavy libraries (pandas, numpy, polars) are only needed once a callback
+# actually processes a dataset. Importing them lazily keeps the cold start of
+# web server processes short; see scripts/startup_report.py for the budget.
+# Modules that must not be loaded by `import index` alone.
+STARTUP_DEFERRED_MODULES = ("pandas", "numpy", "polars")
+
+
+def lazy_import(name):
+    """
+    Return a module object that performs the actual import on first attribute access.
+
+    Usage:
+        pd = lazy_import("pandas")   # cheap
+        pd.DataFrame(...)            # pandas is imported here
+
+    Args:
+        name (str): Absolute module name.
+
+    Returns:
+        module: The (possibly not yet loaded) module.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ImportError(f"No module named '{name}'")
+
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
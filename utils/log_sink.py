@@ -0,0 +1,166 @@
+import atexit
+import queue
+import threading
+import time
+
+from requests.exceptions import ReadTimeout
+
+# ------------------------------------------------------------------------------
+# BUFFERED B-FABRIC LOGGING
+# ------------------------------------------------------------------------------
+# Every Logger.log_operation is a round trip to B-Fabric. On the submit path
+# the entries are buffered instead and background threads per process send
+# them, so the user does not wait on audit logging:
+#
+# - entries are timestamped when they are logged, not when they are sent;
+# - all entries buffered for a logger go out in one save (one round trip);
+# - one batch per logger is in flight at a time and a failed one is retried
+#   with backoff before anything newer of that logger is sent, so its entries
+#   arrive in order; other loggers are sent meanwhile;
+# - a save that timed out after it was sent may have been stored, so it is not
+#   sent again (no duplicate entries) but printed to the server log;
+# - the process waits for pending entries when it exits.
+LOG_BATCH_DELAY = 0.5  # Seconds to wait for more entries of the same logger
+LOG_MAX_RETRIES = 5
+LOG_RETRY_BACKOFF = 2  # Seconds, doubled after each failed attempt
+LOG_EXIT_TIMEOUT = 10  # Seconds to flush pending entries at process exit
+LOG_SINK_THREADS = 4
+
+_flush_queue = queue.Queue()
+_sink_threads = []
+_sink_lock = threading.Lock()
+
+
+class BufferedLogger:
+    """
+    Drop-in for the bfabric_web_apps Logger whose log_operation returns immediately.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()  # One batch of this logger in flight, which keeps its order
+        self._scheduled = False
+        self._sent = threading.Event()
+        self._sent.set()
+
+    def log_operation(self, operation, message, params=None, flush_logs=True):
+        """
+        Buffer one entry; flush_logs only decides whether a flush is scheduled.
+        """
+        with self._lock:
+            self.logger.log_operation(operation, message, params, flush_logs=False)
+            if not flush_logs or self._scheduled:
+                return
+            self._scheduled = True
+            self._sent.clear()
+        _start_sink()
+        _flush_queue.put(self)
+
+    def take_batch(self):
+        with self._lock:
+            batch, self.logger.logs = self.logger.logs, []
+            self._scheduled = False
+            return batch
+
+    def send(self, batch):
+        self.logger.power_user_wrapper.save("job", {"id": self.logger.jobid, "logthis": "\n".join(batch)})
+
+    def mark_sent(self):
+        with self._lock:
+            if not self.logger.logs:
+                self._sent.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until everything logged so far was sent; False on timeout.
+        """
+        return self._sent.wait(timeout)
+
+    def __getattr__(self, name):
+        return getattr(self.logger, name)
+
+
+def flush_logger(buffered):
+    """
+    Send everything buffered for one logger, retrying with backoff.
+
+    Returns:
+        bool: True if the entries were sent, False if they were given up on
+              (they are printed, so they still end up in the server log).
+    """
+    with buffered._send_lock:
+        return _send_batch(buffered)
+
+
+def may_have_been_saved(error):
+    """
+    Whether a failed save may still have been stored: the request went out but no answer came back.
+    """
+    return isinstance(error, (ReadTimeout, TimeoutError))
+
+
+def _send_batch(buffered):
+    batch = buffered.take_batch()
+    if not batch:
+        buffered.mark_sent()
+        return True
+
+    delay = LOG_RETRY_BACKOFF
+    for attempt in range(1, LOG_MAX_RETRIES + 1):
+        try:
+            buffered.send(batch)
+            buffered.mark_sent()
+            return True
+        except Exception as e:
+            print(f"Failed to save {len(batch)} log entries to B-Fabric (attempt {attempt}/{LOG_MAX_RETRIES}): {e}")
+            if may_have_been_saved(e):
+                print("Not resending log entries that may already be saved:\n" + "\n".join(batch))
+                buffered.mark_sent()
+                return False
+            if attempt < LOG_MAX_RETRIES:
+                time.sleep(delay)
+                delay *= 2
+
+    print("Giving up on log entries:\n" + "\n".join(batch))
+    buffered.mark_sent()
+    return False
+
+
+def _run_sink():
+    while True:
+        buffered = _flush_queue.get()
+        # Let the rest of the callback add its entries, so they share the round trip
+        time.sleep(LOG_BATCH_DELAY)
+        try:
+            flush_logger(buffered)
+        except Exception as e:
+            print(f"Log sink failed: {e}")
+        finally:
+            _flush_queue.task_done()
+
+
+def _start_sink():
+    with _sink_lock:
+        _sink_threads[:] = [thread for thread in _sink_threads if thread.is_alive()]
+        while len(_sink_threads) < LOG_SINK_THREADS:
+            thread = threading.Thread(target=_run_sink, name=f"log-sink-{len(_sink_threads)}", daemon=True)
+            thread.start()
+            _sink_threads.append(thread)
+
+
+def _flush_at_exit():
+    # The sink threads keep running while exit handlers run; wait for them to drain the queue.
+    deadline = time.time() + LOG_EXIT_TIMEOUT
+    while _flush_queue.unfinished_tasks and time.time() < deadline:
+        time.sleep(0.1)
+
+
+atexit.register(_flush_at_exit)
+
+
+def buffered_logger(logger):
+    """
+    Wrap a Logger from bfabric_web_apps.get_logger so its entries are sent in the background.
+    """
+    return BufferedLogger(logger)
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+
+# ------------------------------------------------------------------------------
+# PIPELINE LOCATIONS ON THE COMPUTE SERVER
+# ------------------------------------------------------------------------------
+NEXTFLOW_BIN = "/home/nfc/.local/bin/nextflow"
+WORK_DIR = "/STORAGE/temp_rnaseq_run"
+RUNS_DIR = f"{WORK_DIR}/runs"
+REFERENCE_DIR = f"{WORK_DIR}/fasta_and_gtf_files"
+
+DEFAULT_FASTA = "Homo_sapiens.GRCh38.dna.primary_assembly.fa"
+DEFAULT_GTF = "Homo_sapiens.GRCh38.109.gtf"
+
+# With PIPELINE_DRY_RUN=1 the worker only echoes the nextflow command (demo and
+# test setups without Nextflow); nothing that depends on a real run (resume,
+# index caching, trace progress, resource history, output checks) happens then.
+PIPELINE_DRY_RUN = os.environ.get("PIPELINE_DRY_RUN", "") == "1"
+
+
+def get_run_key(dataset, params):
+    """
+    Compute a stable key for a dataset/parameter combination.
+
+    The same dataset submitted with the same pipeline parameters always maps
+    to the same key, so a resubmit lands in the same Nextflow work directory
+    and can reuse the cached tasks of the previous attempt.
+
+    Args:
+        dataset (dict): Dataset dictionary as returned by dataset_to_dictionary.
+        params (dict): Pipeline parameters that influence the task hashes
+                       (e.g. FASTA and GTF selection).
+
+    Returns:
+        str: A short hexadecimal key.
+    """
+    payload = json.dumps({"dataset": dataset or {}, "params": params or {}}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def get_job_file_path(job_id, file_name):
+    """
+    Return the compute-server path of a file that belongs to a single job.
+
+    Files are placed directly in WORK_DIR with the job id as prefix, because
+    run_main_job writes files_as_byte_strings before any bash command runs
+    and therefore cannot rely on per-job directories existing yet.
+    """
+    return f"{WORK_DIR}/{job_id}_{file_name}"
+
+
+def get_run_dir(run_key):
+    """
+    Return the persistent launch directory for a run key.
+
+    Nextflow keeps its resume history in `.nextflow/` inside the launch directory,
+    so every dataset/parameter combination gets its own launch and work directory.
+    """
+    return f"{RUNS_DIR}/{run_key}"
+
+
+def get_reference_paths(fasta=None, gtf=None):
+    """
+    Return the compute-server paths of the selected FASTA and GTF.
+    """
+    return f"{REFERENCE_DIR}/{fasta or DEFAULT_FASTA}", f"{REFERENCE_DIR}/{gtf or DEFAULT_GTF}"
+
+
+def build_run_pipeline_command(input_path, output_dir, run_dir, fasta=None, gtf=None, config_path=None,
+                               star_index=None, salmon_index=None, save_reference=False, resume=True,
+                               trace_path=None):
+    """
+    Build the `nextflow run nf-core/rnaseq` command for one job.
+
+    Args:
+        input_path (str): Path to the samplesheet on the compute server.
+        output_dir (str): Directory where the pipeline publishes its results.
+        run_dir (str): Persistent launch directory of this dataset/parameter combination.
+        fasta (str, optional): FASTA file name inside REFERENCE_DIR.
+        gtf (str, optional): GTF file name inside REFERENCE_DIR.
+        config_path (str, optional): Job-specific Nextflow config passed with -c.
+        star_index (str, optional): Prebuilt STAR index, skips the genome index build.
+        salmon_index (str, optional): Prebuilt Salmon index.
+        save_reference (bool): Publish the built indexes so they can be cached.
+        resume (bool): Whether to reuse cached tasks from a previous run in run_dir.
+        trace_path (str, optional): Trace file the worker follows for live progress.
+
+    Returns:
+        str: The full command line.
+    """
+    fasta_path, gtf_path = get_reference_paths(fasta, gtf)
+
+    command = (
+        f"cd {run_dir} && "
+        f"{NEXTFLOW_BIN} run nf-core/rnaseq "
+        f"--input {input_path} "
+        f"--fasta {fasta_path} "
+        f"--gtf {gtf_path} "
+        f"--skip_trimming "
+        f"--outdir {output_dir} "
+        f"-profile docker "
+        f"--custom_config_base {WORK_DIR} "
+        f"-work-dir {run_dir}/work"
+    )
+
+    if star_index:
+        command += f" --star_index {star_index}"
+
+    if salmon_index:
+        command += f" --salmon_index {salmon_index}"
+
+    if save_reference:
+        command += " --save_reference"
+
+    if config_path:
+        command += f" -c {config_path}"
+
+    if trace_path:
+        command += f" -with-trace {trace_path}"
+
+    if resume:
+        command += " -resume"
+
+    return command
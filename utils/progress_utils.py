@@ -0,0 +1,257 @@
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+# ------------------------------------------------------------------------------
+# LIVE PIPELINE PROGRESS
+# ------------------------------------------------------------------------------
+# Nextflow appends one line per finished task to the trace file (-with-trace).
+# While a job runs, a thread on the worker follows that file and publishes a
+# per-process summary:
+#
+#   rnaseq:progress:<job_id>             JSON {status, started, expected_tasks, processes, ...}
+#   rnaseq:progress:active:<user_id>     sorted set of the user's job ids, scored by start time
+#
+# The app reads these records to show each user progress bars and an ETA for
+# their own runs. A run is reported failed if its job raised, the trace has
+# failed tasks that were never retried successfully, or Nextflow never wrote
+# a trace at all.
+PROGRESS_KEY_PREFIX = "rnaseq:progress"
+ACTIVE_RUNS_KEY = f"{PROGRESS_KEY_PREFIX}:active"
+PROGRESS_TTL = 60 * 60 * 24  # Seconds; finished runs stay visible for a day
+TRACE_POLL_INTERVAL = 10  # Seconds
+
+# Trace columns written by the job config (trace.raw = true: times in ms, memory in bytes)
+TRACE_FIELDS = [
+    "task_id", "hash", "name", "process", "tag", "status", "exit",
+    "submit", "start", "complete", "realtime", "%cpu", "peak_rss", "rchar", "wchar", "cpus",
+]
+
+# Rough task count of nf-core/rnaseq with the default STAR/Salmon route:
+# ~30 tasks per sample plus reference preparation and cohort-level steps.
+TASKS_PER_SAMPLE = 30
+FIXED_TASKS = 20
+
+DONE_STATUSES = ("COMPLETED", "CACHED")
+FAILED_STATUSES = ("FAILED", "ABORTED")
+
+
+def _progress_key(job_id):
+    return f"{PROGRESS_KEY_PREFIX}:{job_id}"
+
+
+def _active_runs_key(user_id):
+    return f"{ACTIVE_RUNS_KEY}:{user_id}"
+
+
+def get_expected_tasks(n_samples):
+    """
+    Return the approximate number of tasks a run over n_samples will execute.
+    """
+    return FIXED_TASKS + TASKS_PER_SAMPLE * max(int(n_samples), 1)
+
+
+def parse_trace_line(line, header):
+    """
+    Parse one tab-separated trace line into a dict keyed by the header columns.
+    """
+    values = line.rstrip("\n").split("\t")
+    return dict(zip(header, values))
+
+
+def _to_float(value):
+    try:
+        return float(str(value).rstrip("%"))
+    except ValueError:
+        return 0.0
+
+
+def summarize_tasks(tasks):
+    """
+    Aggregate trace records per process.
+
+    Returns:
+        dict: {process: {"done": int, "failed": int, "realtime_s": float}}
+    """
+    processes = {}
+    for task in tasks:
+        process = task.get("process") or task.get("name", "").split(" (")[0]
+        summary = processes.setdefault(process, {"done": 0, "failed": 0, "realtime_s": 0.0})
+        if task.get("status") in DONE_STATUSES:
+            summary["done"] += 1
+        elif task.get("status") in FAILED_STATUSES:
+            summary["failed"] += 1
+        summary["realtime_s"] += _to_float(task.get("realtime", 0)) / 1000
+    return processes
+
+
+def read_trace(trace_path):
+    """
+    Parse a whole trace file.
+
+    Returns:
+        list[dict]: One record per line, in the order Nextflow wrote them.
+    """
+    with open(trace_path) as f:
+        lines = [line for line in f.read().split("\n") if line]
+    if not lines:
+        return []
+    header = lines[0].split("\t")
+    return [parse_trace_line(line, header) for line in lines[1:]]
+
+
+def get_failed_tasks(tasks):
+    """
+    Return the names of tasks that failed and were not retried successfully.
+
+    A retried task gets a new trace line with the same name, so a failed
+    attempt followed by a completed one does not count.
+    """
+    failed = []
+    for task in tasks:
+        name = task.get("name") or task.get("process", "")
+        if task.get("status") in FAILED_STATUSES:
+            failed.append(name)
+        elif task.get("status") in DONE_STATUSES and name in failed:
+            failed.remove(name)
+    return failed
+
+
+def compute_eta(progress, now=None):
+    """
+    Project the remaining runtime of a run.
+
+    Before the first task finished, the routing estimate is the only source.
+    Afterwards, the elapsed time is extrapolated over the share of finished
+    tasks and blended with the estimate, trusting the trace more as it grows.
+
+    Returns:
+        float | None: Remaining seconds, or None if nothing is known.
+    """
+    now = now or time.time()
+    elapsed = now - progress["started"]
+    expected = max(progress.get("expected_tasks") or 1, 1)
+    done = sum(p["done"] for p in progress.get("processes", {}).values())
+    fraction = min(done / expected, 0.99)
+    estimate_s = (progress.get("estimate_hours") or 0) * 3600
+
+    if fraction <= 0:
+        return max(estimate_s - elapsed, 0) if estimate_s else None
+
+    projected = elapsed / fraction
+    total = projected if not estimate_s else fraction * projected + (1 - fraction) * estimate_s
+    return max(total - elapsed, 0)
+
+
+def write_progress(job_id, progress):
+    pipe = redis_conn.pipeline()
+    pipe.set(_progress_key(job_id), json.dumps(progress), ex=PROGRESS_TTL)
+    pipe.zadd(_active_runs_key(progress.get("user_id")), {job_id: progress["started"]})
+    pipe.execute()
+
+
+def follow_trace(job_id, trace_path, progress, stop_event, poll_interval=TRACE_POLL_INTERVAL):
+    """
+    Follow a growing trace file and publish the progress until stop_event is set.
+
+    The file is read incrementally from the last offset, so each poll only
+    parses the lines Nextflow appended since the previous one.
+    """
+    offset = 0
+    header = None
+    tasks = {}
+    partial = ""
+
+    while True:
+        stopping = stop_event.is_set()
+        try:
+            with open(trace_path) as f:
+                f.seek(offset)
+                chunk = f.read()
+                offset = f.tell()
+        except FileNotFoundError:
+            chunk = ""
+
+        lines = (partial + chunk).split("\n")
+        # An incomplete last line is completed by the next poll, unless this is the last one
+        partial = "" if stopping else lines.pop()
+        for line in lines:
+            if not line:
+                continue
+            if header is None:
+                header = line.split("\t")
+                continue
+            task = parse_trace_line(line, header)
+            tasks[task.get("task_id") or len(tasks)] = task
+
+        if chunk or stopping:
+            progress["processes"] = summarize_tasks(tasks.values())
+            progress["failed_tasks"] = get_failed_tasks(tasks.values())
+            progress["updated"] = time.time()
+            if stopping and progress["status"] == "running":
+                # run_main_job does not raise when the pipeline fails, so the trace decides
+                progress["status"] = "failed" if progress["failed_tasks"] or header is None else "finished"
+            try:
+                write_progress(job_id, progress)
+            except Exception as e:
+                print(f"Failed to publish progress of {job_id}: {e}")
+
+        if stopping:
+            return
+        stop_event.wait(poll_interval)
+
+
+@contextmanager
+def track_progress(job_id, trace_path, expected_tasks, estimate_hours=None, user_id=None):
+    """
+    Publish the progress of the Nextflow run executed inside the with-block.
+
+    Usage on the worker:
+        with track_progress(job_id, **progress):
+            run_main_job(...)
+    """
+    progress = {
+        "job_id": job_id,
+        "status": "running",
+        "started": time.time(),
+        "expected_tasks": expected_tasks,
+        "estimate_hours": estimate_hours,
+        "user_id": user_id,
+        "processes": {},
+    }
+    write_progress(job_id, progress)
+
+    stop_event = threading.Event()
+    thread = threading.Thread(target=follow_trace, args=(job_id, trace_path, progress, stop_event), daemon=True)
+    thread.start()
+
+    try:
+        yield progress
+    except Exception:
+        progress["status"] = "failed"
+        raise
+    finally:
+        stop_event.set()
+        thread.join()  # Publishes the final state and, unless set above, the final status
+
+
+def get_active_progress(user_id, max_runs=20):
+    """
+    Return the progress records of a user's most recently started runs, newest first.
+
+    Ids whose record expired are dropped from the active set on the way.
+    """
+    active_runs_key = _active_runs_key(user_id)
+    job_ids = [job_id.decode("utf-8") for job_id in redis_conn.zrevrange(active_runs_key, 0, max_runs - 1)]
+    if not job_ids:
+        return []
+
+    records = redis_conn.mget([_progress_key(job_id) for job_id in job_ids])
+    expired = [job_id for job_id, raw in zip(job_ids, records) if raw is None]
+    if expired:
+        redis_conn.zrem(active_runs_key, *expired)
+
+    return [json.loads(raw) for raw in records if raw is not None]
@@ -0,0 +1,130 @@
+from utils.cache_utils import cached_call, make_cache_key
+from utils.lazy_imports import lazy_import
+from utils.results_store import list_matrices
+
+np = lazy_import("numpy")
+pl = lazy_import("polars")
+
+# ------------------------------------------------------------------------------
+# SAMPLE QC ANALYTICS
+# ------------------------------------------------------------------------------
+# Library size, detected genes, PCA and sample-sample correlation of a run's
+# gene count matrix, computed with NumPy in chunks of genes from the
+# memory-mapped results store:
+#
+#   pass 1: library size and detected genes per sample
+#   pass 2: per-gene variance of log2 CPM (top genes kept) and the sample
+#           Gram matrix for the correlation, one chunk of rows at a time
+#   pass 3: PCA (SVD) of the top variable genes only
+#
+# Memory stays at a chunk of genes x all samples plus a samples x samples
+# matrix. Results are cached in Redis by the matrix's content hash, and the
+# worker fills the cache right after a run, so the results tab opens warm.
+COUNTS_MATRIX_SUFFIX = ".gene_counts"
+QC_CHUNK_ROWS = 5000
+QC_TOP_GENES = 500  # As DESeq2's plotPCA
+QC_COMPONENTS = 5
+PSEUDO_COUNT = 1
+QC_CACHE_TTL = 60 * 60 * 24 * 30  # Seconds
+QC_CACHE_MAX_ENTRIES = 32
+
+
+def find_counts_matrix(output_dir):
+    """
+    Return the manifest entry of the run's gene count matrix, or None.
+    """
+    return next(
+        (entry for entry in list_matrices(output_dir) if entry["name"].endswith(COUNTS_MATRIX_SUFFIX)), None
+    )
+
+
+def iter_row_chunks(entry, chunk_rows=QC_CHUNK_ROWS):
+    """
+    Yield (first row, genes x samples float64 array) for consecutive chunks of a matrix.
+    """
+    matrix = pl.read_ipc(entry["path"], columns=entry["samples"], memory_map=True, rechunk=False)
+    for offset in range(0, entry["rows"], chunk_rows):
+        chunk = matrix.slice(offset, chunk_rows).to_numpy().astype(np.float64)
+        yield offset, np.nan_to_num(chunk, copy=False)
+
+
+def log_cpm(counts, library_sizes):
+    """
+    Variance-stabilising log2 counts-per-million.
+    """
+    return np.log2(counts / library_sizes * 1e6 + PSEUDO_COUNT)
+
+
+def compute_qc(entry, chunk_rows=QC_CHUNK_ROWS, top_genes=QC_TOP_GENES, n_components=QC_COMPONENTS):
+    """
+    Compute the QC statistics of a count matrix.
+
+    Args:
+        entry (dict): Manifest entry from results_store.list_matrices.
+        chunk_rows (int): Genes per chunk.
+        top_genes (int): Most variable genes used for the PCA.
+        n_components (int): Principal components to keep.
+
+    Returns:
+        dict: samples, library_size, detected (genes with counts), pca
+              (samples x components), explained_variance (ratios),
+              correlation (samples x samples Pearson of log2 CPM) and genes.
+    """
+    n_samples = len(entry["samples"])
+
+    library_sizes = np.zeros(n_samples)
+    detected = np.zeros(n_samples, dtype=np.int64)
+    for _, chunk in iter_row_chunks(entry, chunk_rows):
+        library_sizes += chunk.sum(axis=0)
+        detected += (chunk > 0).sum(axis=0)
+    library_sizes = np.maximum(library_sizes, 1)
+
+    gram = np.zeros((n_samples, n_samples))
+    column_sums = np.zeros(n_samples)
+    top_rows = np.empty(0, dtype=np.int64)
+    top_variances = np.empty(0)
+    for offset, chunk in iter_row_chunks(entry, chunk_rows):
+        values = log_cpm(chunk, library_sizes)
+        gram += values.T @ values
+        column_sums += values.sum(axis=0)
+
+        # Keep the running top variable genes of all chunks seen so far
+        top_rows = np.concatenate([top_rows, np.arange(offset, offset + len(values))])
+        top_variances = np.concatenate([top_variances, values.var(axis=1)])
+        if len(top_rows) > top_genes:
+            keep = np.argpartition(top_variances, -top_genes)[-top_genes:]
+            top_rows, top_variances = top_rows[keep], top_variances[keep]
+
+    n_genes = max(entry["rows"], 2)
+    means = column_sums / n_genes
+    covariance = (gram - n_genes * np.outer(means, means)) / (n_genes - 1)
+    deviations = np.sqrt(np.maximum(np.diag(covariance), 1e-12))
+    correlation = np.clip(covariance / np.outer(deviations, deviations), -1, 1)
+
+    matrix = pl.read_ipc(entry["path"], columns=entry["samples"], memory_map=True, rechunk=False)
+    top = np.nan_to_num(matrix[np.sort(top_rows).tolist()].to_numpy().astype(np.float64))
+    centered = log_cpm(top, library_sizes)
+    centered -= centered.mean(axis=1, keepdims=True)
+    u, s, _ = np.linalg.svd(centered.T, full_matrices=False)
+    n_components = min(n_components, len(s))
+    explained = s ** 2 / max((s ** 2).sum(), 1e-12)
+
+    return {
+        "samples": entry["samples"],
+        "library_size": library_sizes.astype(np.int64),
+        "detected": detected,
+        "pca": (u[:, :n_components] * s[:n_components]).astype(np.float32),
+        "explained_variance": explained[:n_components],
+        "correlation": correlation.astype(np.float32),
+        "genes": entry["rows"],
+    }
+
+
+def get_qc(entry, **kwargs):
+    """
+    Return the QC statistics of a count matrix, from the cache if it was computed before.
+    """
+    key = make_cache_key(entry.get("sha256") or entry["path"], sorted(kwargs.items()))
+    return cached_call(
+        "qc", key, lambda: compute_qc(entry, **kwargs), ttl=QC_CACHE_TTL, max_entries=QC_CACHE_MAX_ENTRIES
+    )
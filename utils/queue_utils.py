@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+import plotly
+from dash import ctx
+from dash.exceptions import PreventUpdate
+from bfabric_web_apps.utils.callbacks import get_redis_queue_layout
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+# ------------------------------------------------------------------------------
+# QUEUE STATUS SNAPSHOTTER
+# ------------------------------------------------------------------------------
+# One background thread across all web server processes (elected through a
+# Redis lock) builds the queue layout once per interval and stores it:
+#
+#   rnaseq:queue:snapshot          serialized layout of the latest snapshot
+#   rnaseq:queue:snapshot:version  content hash of the latest snapshot
+#
+# The snapshot is only rewritten when the layout changed. Both keys expire a
+# few intervals after the last refresh, so when no snapshotter runs the queue
+# tab builds the layout itself instead of showing a stale one. The app starts
+# the snapshotter explicitly (see index.py); importing this module does not.
+#
+# Each tab keeps the version it shows in a dcc.Store; on an interval tick the
+# layout is only sent when the version differs (update_queue_tab in index.py).
+# The template's queue callback then only fills the tab on page load.
+SNAPSHOT_KEY = "rnaseq:queue:snapshot"
+VERSION_KEY = "rnaseq:queue:snapshot:version"
+LOCK_KEY = "rnaseq:queue:snapshot:lock"
+
+SNAPSHOT_INTERVAL = 5  # Seconds, matches the queue tab's interval
+SNAPSHOT_TTL = SNAPSHOT_INTERVAL * 3  # Seconds
+
+_snapshotter_started = False
+_snapshotter_lock = threading.Lock()
+
+
+def publish_queue_snapshot():
+    """
+    Build the queue layout once and store it if it changed.
+
+    Returns:
+        str: Version of the current snapshot.
+    """
+    layout_json = json.dumps(get_redis_queue_layout(), cls=plotly.utils.PlotlyJSONEncoder)
+    version = hashlib.sha256(layout_json.encode("utf-8")).hexdigest()[:16]
+
+    current = redis_conn.get(VERSION_KEY)
+    pipe = redis_conn.pipeline()
+    if current is None or current.decode("utf-8") != version:
+        pipe.set(SNAPSHOT_KEY, layout_json, ex=SNAPSHOT_TTL)
+        pipe.set(VERSION_KEY, version, ex=SNAPSHOT_TTL)
+    else:
+        pipe.expire(SNAPSHOT_KEY, SNAPSHOT_TTL)
+        pipe.expire(VERSION_KEY, SNAPSHOT_TTL)
+    pipe.execute()
+
+    return version
+
+
+def _hold_lock(owner):
+    """
+    Acquire or renew the snapshotter lock; True if this process owns it.
+    """
+    if redis_conn.set(LOCK_KEY, owner, nx=True, ex=SNAPSHOT_INTERVAL * 3):
+        return True
+    if redis_conn.get(LOCK_KEY) == owner.encode("utf-8"):
+        redis_conn.expire(LOCK_KEY, SNAPSHOT_INTERVAL * 3)
+        return True
+    return False
+
+
+def _snapshot_loop():
+    owner = f"{os.getpid()}:{uuid.uuid4().hex}"
+    while True:
+        try:
+            if _hold_lock(owner):
+                publish_queue_snapshot()
+        except Exception as e:
+            print(f"Queue snapshot failed: {e}")
+        time.sleep(SNAPSHOT_INTERVAL)
+
+
+def start_queue_snapshotter():
+    """
+    Start the background snapshotter thread once per process.
+    """
+    global _snapshotter_started
+    with _snapshotter_lock:
+        if _snapshotter_started:
+            return
+        threading.Thread(target=_snapshot_loop, daemon=True, name="queue-snapshotter").start()
+        _snapshotter_started = True
+
+
+def get_queue_snapshot():
+    """
+    Return the latest snapshot as a Dash component tree (JSON form), or None if there is none.
+    """
+    layout_json = redis_conn.get(SNAPSHOT_KEY)
+    return json.loads(layout_json) if layout_json else None
+
+
+def get_queue_layout():
+    """
+    get_redis_queue_layout served from the latest snapshot; built here if no snapshotter runs.
+    """
+    snapshot = get_queue_snapshot()
+    return snapshot if snapshot is not None else get_redis_queue_layout()
+
+
+def get_queue_layout_on_load():
+    """
+    get_queue_layout for the template's queue callback, skipping interval ticks.
+
+    Ticks are handled by get_queue_update, so the template's callback does not
+    resend the whole layout to every tab every few seconds.
+    """
+    if ctx.triggered_id == "queue-interval":
+        raise PreventUpdate
+    return get_queue_layout()
+
+
+def get_queue_update(last_version):
+    """
+    Return the queue layout if it changed since a tab last received it.
+
+    Args:
+        last_version (str | None): Version the tab shows.
+
+    Returns:
+        tuple: (layout, version), with layout None if the tab is up to date.
+    """
+    layout_json, version = redis_conn.mget(SNAPSHOT_KEY, VERSION_KEY)
+    if layout_json is None or version is None:
+        # No snapshotter runs; publish a snapshot from this process
+        publish_queue_snapshot()
+        layout_json, version = redis_conn.mget(SNAPSHOT_KEY, VERSION_KEY)
+
+    version = version.decode("utf-8")
+    if version == last_version:
+        return None, version
+    return json.loads(layout_json), version
@@ -0,0 +1,176 @@
+import json
+import math
+import statistics
+
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+# ------------------------------------------------------------------------------
+# PROCESS RESOURCE HISTORY
+# ------------------------------------------------------------------------------
+# Every finished run feeds its trace into a per-process history; later configs
+# request what comparable tasks actually used instead of the static model:
+#
+#   rnaseq:resources:processes          set of process names with history
+#   rnaseq:resources:task:<process>     list of JSON observations, newest first
+#
+# One observation per completed task: peak RSS, runtime, CPU utilisation and
+# I/O, plus the requested CPUs and the per-sample FASTQ size of the run (the
+# size known when the next config is built).
+RESOURCE_KEY_PREFIX = "rnaseq:resources"
+PROCESSES_KEY = f"{RESOURCE_KEY_PREFIX}:processes"
+HISTORY_SIZE = 200  # Observations kept per process
+HISTORY_TTL = 60 * 60 * 24 * 180  # Seconds
+
+MIN_OBSERVATIONS = 5  # Below this, the static model in config_utils is used
+MEMORY_MARGIN = 1.25  # Factor on the fitted upper envelope of peak RSS
+CPU_QUANTILE = 0.9
+SATURATION = 0.9  # Tasks using this share of their CPUs may need more, so CPUs are not lowered
+
+GB = 1024 ** 3
+
+
+def _task_key(process):
+    return f"{RESOURCE_KEY_PREFIX}:task:{process}"
+
+
+def _number(value):
+    try:
+        return float(str(value).rstrip("%"))
+    except ValueError:
+        return None
+
+
+def get_process_name(task):
+    """
+    Return the simple process name of a trace record, e.g. STAR_ALIGN for
+    NFCORE_RNASEQ:RNASEQ:ALIGN_STAR:STAR_ALIGN.
+    """
+    process = task.get("process") or task.get("name", "").split(" (")[0]
+    return process.split(":")[-1]
+
+
+def parse_observation(task, input_gb):
+    """
+    Turn one raw trace record into an observation, or None if it is not usable.
+    """
+    if task.get("status") != "COMPLETED":
+        return None  # Cached tasks did not run, failed ones did not finish
+
+    peak_rss = _number(task.get("peak_rss"))
+    if not peak_rss:
+        return None
+
+    return {
+        "input_gb": round(input_gb, 3),
+        "peak_rss_gb": round(peak_rss / GB, 3),
+        "realtime_s": round((_number(task.get("realtime")) or 0) / 1000, 1),
+        "cpu_used": round((_number(task.get("%cpu")) or 0) / 100, 2),
+        "cpus": int(_number(task.get("cpus")) or 0),
+        "rchar_gb": round((_number(task.get("rchar")) or 0) / GB, 3),
+    }
+
+
+def ingest_trace(trace_path, input_gb):
+    """
+    Add the completed tasks of a finished run's trace file to the history.
+
+    Args:
+        trace_path (str): Raw trace written by -with-trace (see config_utils).
+        input_gb (float): FASTQ size of a single sample of the run, in GB.
+
+    Returns:
+        int: Number of observations added.
+    """
+    with open(trace_path) as f:
+        lines = f.read().splitlines()
+    if not lines:
+        return 0
+
+    header = lines[0].split("\t")
+    observations = {}
+    for line in lines[1:]:
+        task = dict(zip(header, line.split("\t")))
+        observation = parse_observation(task, input_gb)
+        if observation:
+            observations.setdefault(get_process_name(task), []).append(json.dumps(observation))
+
+    pipe = redis_conn.pipeline()
+    for process, entries in observations.items():
+        pipe.lpush(_task_key(process), *entries)
+        pipe.ltrim(_task_key(process), 0, HISTORY_SIZE - 1)
+        pipe.expire(_task_key(process), HISTORY_TTL)
+        pipe.sadd(PROCESSES_KEY, process)
+    pipe.expire(PROCESSES_KEY, HISTORY_TTL)
+    pipe.execute()
+
+    return sum(len(entries) for entries in observations.values())
+
+
+def get_history():
+    """
+    Return {process: [observation, ...]} for every process with history.
+    """
+    processes = sorted(p.decode() if isinstance(p, bytes) else p for p in redis_conn.smembers(PROCESSES_KEY))
+    pipe = redis_conn.pipeline()
+    for process in processes:
+        pipe.lrange(_task_key(process), 0, -1)
+    return {
+        process: [json.loads(entry) for entry in entries]
+        for process, entries in zip(processes, pipe.execute()) if entries
+    }
+
+
+def fit_memory(observations, input_gb):
+    """
+    Predict the peak memory (GB) of a task at the given per-sample input size.
+
+    A least-squares line of peak RSS over input size (never decreasing) is
+    shifted up to the largest observed excess, so every past task would have
+    fit, and multiplied by MEMORY_MARGIN.
+    """
+    x = [o["input_gb"] for o in observations]
+    y = [o["peak_rss_gb"] for o in observations]
+
+    slope = 0.0
+    if len(set(x)) > 1:
+        slope = max(statistics.linear_regression(x, y).slope, 0.0)
+    intercept = statistics.fmean(y) - slope * statistics.fmean(x)
+    envelope = max(yi - (intercept + slope * xi) for xi, yi in zip(x, y))
+
+    return (intercept + slope * input_gb + envelope) * MEMORY_MARGIN
+
+
+def fit_cpus(observations):
+    """
+    Predict the CPUs a task makes use of, or None if the tasks were CPU bound
+    (they might have used more than they got, so the history cannot tell).
+    """
+    used = sorted(o["cpu_used"] for o in observations)
+    quantile = used[min(int(CPU_QUANTILE * len(used)), len(used) - 1)]
+
+    requested = [o["cpus"] for o in observations if o.get("cpus")]
+    if requested and quantile >= SATURATION * statistics.median(requested):
+        return None
+    return max(math.ceil(quantile), 1)
+
+
+def get_learned_resources(input_gb):
+    """
+    Fit a CPU and memory request for every process with enough history.
+
+    Args:
+        input_gb (float): FASTQ size of a single sample of the new run, in GB.
+
+    Returns:
+        dict: {selector: {"cpus": int | None, "memory": float (GB)}} using the
+              same '.*:<PROCESS>' selectors as config_utils.PROCESS_RESOURCES.
+    """
+    learned = {}
+    for process, observations in get_history().items():
+        if len(observations) < MIN_OBSERVATIONS:
+            continue
+        learned[f".*:{process}"] = {
+            "cpus": fit_cpus(observations),
+            "memory": fit_memory(observations, input_gb),
+        }
+    return learned
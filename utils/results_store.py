@@ -0,0 +1,167 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+from utils.lazy_imports import lazy_import
+from utils.shard_utils import COUNT_MATRIX_GLOB
+
+pl = lazy_import("polars")
+
+# ------------------------------------------------------------------------------
+# COLUMNAR RESULTS STORE
+# ------------------------------------------------------------------------------
+# After a run, every merged count/TPM matrix of the output tree is converted
+# from TSV to an uncompressed Arrow IPC file, sorted by gene (or transcript) id,
+# plus a small index of the id columns for searching:
+#
+#   <output_dir>/results_store/manifest.json
+#   <output_dir>/results_store/<aligner>/<matrix>.arrow         e.g. star_salmon/salmon.merged.gene_counts.arrow
+#   <output_dir>/results_store/<aligner>/<matrix>.index.arrow   id columns + row number
+#
+# Uncompressed IPC files can be memory-mapped: the results tab reads only the
+# selected sample columns, and of those only the rows of the visible page are
+# ever touched, so a 60k gene x 1,000 sample matrix is never loaded as a whole.
+RESULTS_STORE_DIR = "results_store"
+MANIFEST_FILE_NAME = "manifest.json"
+ROW_COLUMN = "row"
+HASH_CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def hash_file(path, chunk_size=HASH_CHUNK_SIZE):
+    """
+    SHA-256 of a file, read in chunks; identifies a matrix for caches.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_store_dir(output_dir):
+    return os.path.join(output_dir, RESULTS_STORE_DIR)
+
+
+def convert_matrix(name, tsv_path, arrow_path):
+    """
+    Convert one TSV matrix to a sorted Arrow IPC file and its id index, streaming.
+
+    Returns:
+        dict: Manifest entry of the matrix.
+    """
+    lf = pl.scan_csv(tsv_path, separator="\t")
+    schema = lf.collect_schema()
+    id_columns = [column for column, dtype in schema.items() if dtype == pl.String]
+    samples = [column for column in schema.names() if column not in id_columns]
+    if not id_columns:
+        raise ValueError(f"{tsv_path} has no id column.")
+
+    os.makedirs(os.path.dirname(arrow_path), exist_ok=True)
+    index_path = arrow_path[:-len(".arrow")] + ".index.arrow"
+
+    # Written under a temporary name, so readers never see a half-written file
+    lf.sort(id_columns[0]).sink_ipc(arrow_path + ".tmp", compression=None)
+    os.replace(arrow_path + ".tmp", arrow_path)
+
+    index = pl.scan_ipc(arrow_path, memory_map=True).select(id_columns).with_row_index(ROW_COLUMN)
+    index.sink_ipc(index_path + ".tmp", compression=None)
+    os.replace(index_path + ".tmp", index_path)
+
+    n_rows = pl.scan_ipc(index_path, memory_map=True).select(pl.len()).collect().item()
+
+    return {
+        "name": name,
+        "path": os.path.basename(arrow_path),
+        "index_path": os.path.basename(index_path),
+        "id_columns": id_columns,
+        "samples": samples,
+        "rows": n_rows,
+        "sha256": hash_file(arrow_path),
+    }
+
+
+def convert_count_matrices(output_dir, pattern=COUNT_MATRIX_GLOB):
+    """
+    Convert all merged matrices of an output tree and write the store's manifest.
+
+    Returns:
+        list[dict]: The manifest entries.
+    """
+    store_dir = get_store_dir(output_dir)
+    manifest = []
+    for tsv_path in sorted(Path(output_dir).glob(pattern)):
+        name = str(tsv_path.relative_to(output_dir).with_suffix(""))
+        manifest.append(convert_matrix(name, str(tsv_path), os.path.join(store_dir, name + ".arrow")))
+
+    if manifest:
+        with open(os.path.join(store_dir, MANIFEST_FILE_NAME), "w") as f:
+            json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def list_matrices(output_dir):
+    """
+    Return the manifest of a run's results store, or [] if the run has none.
+
+    Paths in the manifest are relative, so the store stays valid when the
+    output tree is moved or staged; they are resolved here.
+    """
+    store_dir = get_store_dir(output_dir)
+    try:
+        with open(os.path.join(store_dir, MANIFEST_FILE_NAME)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return []
+
+    for entry in manifest:
+        matrix_dir = os.path.join(store_dir, os.path.dirname(entry["name"]))
+        entry["path"] = os.path.join(matrix_dir, entry["path"])
+        entry["index_path"] = os.path.join(matrix_dir, entry["index_path"])
+    return manifest
+
+
+def get_matrix(output_dir, name):
+    """
+    Return the manifest entry of one matrix, or None.
+    """
+    return next((entry for entry in list_matrices(output_dir) if entry["name"] == name), None)
+
+
+def search_rows(entry, search):
+    """
+    Return the row numbers whose id columns contain search (case-insensitive).
+
+    Only the small index file is scanned, never the matrix itself.
+    """
+    search = search.lower()
+    condition = pl.any_horizontal(
+        pl.col(column).str.to_lowercase().str.contains(search, literal=True) for column in entry["id_columns"]
+    )
+    return pl.scan_ipc(entry["index_path"], memory_map=True).filter(condition).select(ROW_COLUMN).collect()[ROW_COLUMN]
+
+
+def read_matrix_page(entry, samples, offset, limit, search=None):
+    """
+    Read one page of a matrix, projected to the id columns and the given samples.
+
+    Args:
+        entry (dict): Manifest entry from list_matrices.
+        samples (list[str]): Sample columns to read.
+        offset (int): First row of the page (within the search result, if any).
+        limit (int): Rows per page.
+        search (str, optional): Substring of a gene/transcript id or name.
+
+    Returns:
+        tuple: (page records, number of matching rows)
+    """
+    columns = entry["id_columns"] + [s for s in samples or [] if s in entry["samples"]]
+    # Memory-mapped without rechunking: slicing and gathering only touch the page's rows.
+    matrix = pl.read_ipc(entry["path"], columns=columns, memory_map=True, rechunk=False)
+
+    if search:
+        rows = search_rows(entry, search)
+        page = matrix[rows.slice(offset, limit).to_list()]
+        return page.to_dicts(), len(rows)
+
+    return matrix.slice(offset, limit).to_dicts(), entry["rows"]
@@ -0,0 +1,80 @@
+from utils.config_utils import GB
+
+# ------------------------------------------------------------------------------
+# COST MODEL
+# ------------------------------------------------------------------------------
+# Per-reference cost of building/loading the genome index: the hours the index
+# adds to a run and the memory STAR needs to hold it.
+REFERENCE_PROFILES = {
+    "Homo_sapiens.GRCh38.dna.primary_assembly.fa": {"index_hours": 0.75, "index_memory_gb": 30},
+    "Homo_sapiens.GRCh38.dna.toplevel.fa": {"index_hours": 1.5, "index_memory_gb": 60},
+    "Homo_sapiens.GRCh38.cdna.all.fa": {"index_hours": 0.25, "index_memory_gb": 8},
+}
+DEFAULT_REFERENCE_PROFILE = {"index_hours": 0.75, "index_memory_gb": 30}
+
+BASE_HOURS = 0.25             # Pipeline start-up, container pulls, MultiQC
+HOURS_PER_SAMPLE = 0.02       # Per-sample overhead (FastQC, Qualimap, bookkeeping)
+HOURS_PER_FASTQ_GB = 0.04     # Alignment and quantification throughput
+MEMORY_PER_SAMPLE_GB = 1      # Extra peak memory per GB of FASTQ of one sample
+
+# A job goes to the heavy queue as soon as one of these limits is exceeded.
+LIGHT_QUEUE_MAX_HOURS = 2
+LIGHT_QUEUE_MAX_MEMORY_GB = 36
+
+QUEUES = ("light", "heavy")
+
+
+def estimate_job_cost(n_samples, fastq_bytes, fasta=None, index_cached=False):
+    """
+    Predict the runtime and peak memory of one nf-core/rnaseq run.
+
+    Args:
+        n_samples (int): Number of samples in the dataset.
+        fastq_bytes (int): Total FASTQ size of the dataset in bytes.
+        fasta (str, optional): Selected FASTA file name.
+        index_cached (bool): Whether a prebuilt index is reused, which skips the index build.
+
+    Returns:
+        dict: {"runtime_hours": float, "peak_memory_gb": float}
+    """
+    profile = REFERENCE_PROFILES.get(fasta, DEFAULT_REFERENCE_PROFILE)
+    fastq_gb = fastq_bytes / GB
+    per_sample_gb = fastq_gb / max(n_samples, 1)
+
+    runtime_hours = (
+        BASE_HOURS
+        + (0 if index_cached else profile["index_hours"])
+        + HOURS_PER_SAMPLE * n_samples
+        + HOURS_PER_FASTQ_GB * fastq_gb
+    )
+    peak_memory_gb = profile["index_memory_gb"] + MEMORY_PER_SAMPLE_GB * per_sample_gb
+
+    return {
+        "runtime_hours": round(runtime_hours, 2),
+        "peak_memory_gb": round(peak_memory_gb, 1),
+    }
+
+
+def route_queue(estimate, override=None):
+    """
+    Pick the queue for a job from its cost estimate.
+
+    Args:
+        estimate (dict): Result of estimate_job_cost.
+        override (str, optional): Queue chosen by the user. Anything other
+                                  than a known queue name (e.g. "auto") lets
+                                  the cost model decide.
+
+    Returns:
+        tuple: (queue name, human-readable reason)
+    """
+    if override in QUEUES:
+        return override, f"user override to '{override}'"
+
+    if estimate["runtime_hours"] > LIGHT_QUEUE_MAX_HOURS:
+        return "heavy", f"predicted runtime {estimate['runtime_hours']} h > {LIGHT_QUEUE_MAX_HOURS} h"
+
+    if estimate["peak_memory_gb"] > LIGHT_QUEUE_MAX_MEMORY_GB:
+        return "heavy", f"predicted peak memory {estimate['peak_memory_gb']} GB > {LIGHT_QUEUE_MAX_MEMORY_GB} GB"
+
+    return "light", "predicted to fit the light queue limits"
@@ -0,0 +1,118 @@
+import json
+import time
+
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+from utils.cache_utils import make_cache_key
+
+# ------------------------------------------------------------------------------
+# RUN HISTORY FOR INCREMENTAL RERUNS
+# ------------------------------------------------------------------------------
+# The last finished run of every dataset and FASTA/GTF combination is recorded,
+# so a later submit can process only selected or newly added samples and merge
+# their quantifications into that run's matrices:
+#
+#   rnaseq:runs:<entity_id>:<reference key>   JSON {output_dir, samples, job_id, finished}
+RUN_HISTORY_KEY_PREFIX = "rnaseq:runs"
+RUN_HISTORY_TTL = 60 * 60 * 24 * 180  # Seconds
+
+RERUN_MODES = ("all", "selected", "new")
+SAMPLE_COLUMN = "Sample"
+
+
+def _history_key(entity_id, fasta, gtf):
+    return f"{RUN_HISTORY_KEY_PREFIX}:{entity_id}:{make_cache_key(fasta, gtf)}"
+
+
+def record_run(entity_id, fasta, gtf, output_dir, samples, job_id=None):
+    """
+    Record a finished run as the latest result of its dataset and references.
+    """
+    if entity_id is None:
+        return
+
+    record = {
+        "output_dir": output_dir,
+        "samples": sorted(set(samples)),
+        "job_id": job_id,
+        "finished": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+    redis_conn.set(_history_key(entity_id, fasta, gtf), json.dumps(record), ex=RUN_HISTORY_TTL)
+
+
+def get_last_run(entity_id, fasta, gtf):
+    """
+    Return the record of the last finished run, or None.
+    """
+    if entity_id is None:
+        return None
+
+    raw = redis_conn.get(_history_key(entity_id, fasta, gtf))
+    return json.loads(raw) if raw is not None else None
+
+
+def relocate_run(entity_id, fasta, gtf, output_dir, new_output_dir):
+    """
+    Point the last run at the new location of its output tree, if it is still that run.
+    """
+    last_run = get_last_run(entity_id, fasta, gtf)
+    if last_run is None or last_run["output_dir"] != output_dir:
+        return
+
+    last_run["output_dir"] = new_output_dir
+    redis_conn.set(_history_key(entity_id, fasta, gtf), json.dumps(last_run), ex=RUN_HISTORY_TTL)
+
+
+def get_samples(dataset):
+    """
+    Return the sample names of a dataset in order of first appearance.
+    """
+    return list(dict.fromkeys(dataset.get(SAMPLE_COLUMN, [])))
+
+
+def subset_dataset(dataset, row_ids):
+    """
+    Return the rows row_ids (positions) of a dict-of-lists dataset.
+    """
+    return {column: [values[i] for i in row_ids] for column, values in dataset.items()}
+
+
+def get_rows_of_samples(dataset, samples):
+    """
+    Return the positions of all rows (e.g. lanes) belonging to the given samples.
+    """
+    samples = set(samples)
+    return [i for i, sample in enumerate(dataset.get(SAMPLE_COLUMN, [])) if sample in samples]
+
+
+def select_rerun_rows(dataset, mode, selected_row_ids, last_run):
+    """
+    Decide which rows of a dataset a submission processes.
+
+    Args:
+        dataset (dict): The full dataset.
+        mode (str): "all", "selected" (rows selected in the table) or
+                    "new" (samples without results in last_run).
+        selected_row_ids (list[int]): Row positions selected in the table.
+        last_run (dict | None): Record from get_last_run.
+
+    Returns:
+        tuple: (row positions to process, base run to merge into or None).
+               A selected sample always brings all of its rows along, so
+               nf-core can still merge its lanes.
+    """
+    all_rows = list(range(len(dataset.get(SAMPLE_COLUMN, []))))
+
+    if mode == "selected":
+        selected_samples = {dataset[SAMPLE_COLUMN][i] for i in selected_row_ids or []}
+        rows = get_rows_of_samples(dataset, selected_samples)
+    elif mode == "new" and last_run:
+        new_samples = set(get_samples(dataset)) - set(last_run["samples"])
+        rows = get_rows_of_samples(dataset, new_samples)
+    else:
+        return all_rows, None
+
+    # A subset of the dataset is merged into the last run, if there is one.
+    if len(rows) == len(all_rows) or not last_run:
+        return rows, None
+    return rows, last_run
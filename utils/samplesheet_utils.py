@@ -1,43 +1,253 @@
-import pandas as pd
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
 
-def create_sample_sheet_csv(dataset=None):
+from utils.lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+SAMPLESHEET_COLUMNS = ["sample", "fastq_1", "fastq_2", "strandedness"]
+FASTQ_EXTENSIONS = (".fastq.gz", ".fq.gz")
+FILE_CHECK_WORKERS = 32
+MAX_REPORTED_PROBLEMS = 25
+
+
+class SamplesheetValidationError(ValueError):
     """
-    Create a samplesheet CSV file required for nf-core/rnaseq.
+    Raised when a samplesheet fails pre-flight validation; carries every problem found.
+    """
+
+    def __init__(self, problems):
+        self.problems = problems
+        shown = problems[:MAX_REPORTED_PROBLEMS]
+        message = f"Samplesheet validation found {len(problems)} problem(s): " + "; ".join(shown)
+        if len(problems) > len(shown):
+            message += f"; ... and {len(problems) - len(shown)} more"
+        super().__init__(message)
+
+
+def build_sample_sheet_df(dataset=None):
+    """
+    Build the nf-core/rnaseq samplesheet as a DataFrame.
 
     Assumes dataset is a dictionary containing:
-    - 'Name' for sample names
-    - 'Read1' for R1 FASTQ file paths
-    - 'Read2' for R2 FASTQ file paths
+    - 'Sample' for sample names
+    - 'FASTQ Read 1' for R1 FASTQ file paths
+    - 'FASTQ Read 2' for R2 FASTQ file paths (optional, empty for single-end data)
 
-    Output:
-        Creates './samplesheet.csv' in the current directory
+    Returns:
+        pd.DataFrame: Samplesheet with the columns sample, fastq_1, fastq_2, strandedness.
     """
 
-    # Fallback if no dataset provided (e.g., during standalone testing)
     if dataset is None:
-        raise ValueError("No dataset provided to create_sample_sheet_csv().")
+        raise ValueError("No dataset provided to build the samplesheet.")
+
+    df = pd.DataFrame(dataset)
+
+    # Ensure necessary columns exist
+    for col in ["Sample", "FASTQ Read 1"]:
+        if col not in df.columns:
+            raise KeyError(f"Missing required column in dataset: {col}")
+
+    if "FASTQ Read 2" not in df.columns:
+        df["FASTQ Read 2"] = ""
+
+    return pd.DataFrame({
+        "sample": df["Sample"].fillna("").astype(str).str.strip(),
+        "fastq_1": df["FASTQ Read 1"].fillna("").astype(str).str.strip(),
+        "fastq_2": df["FASTQ Read 2"].fillna("").astype(str).str.strip(),
+        "strandedness": "auto",
+    })[SAMPLESHEET_COLUMNS]
+
+
+def _rows(mask):
+    """Format the 1-based row numbers of a boolean mask for error messages."""
+    rows = [str(i + 1) for i in mask[mask].index[:10]]
+    more = f" (+{int(mask.sum()) - len(rows)} more)" if mask.sum() > len(rows) else ""
+    return ", ".join(rows) + more
+
+
+def check_files_exist(paths, max_workers=FILE_CHECK_WORKERS):
+    """
+    Check a list of files for existence in parallel.
+
+    Network file systems answer stat calls slowly, so the checks run in a
+    thread pool instead of one after another.
+
+    Returns:
+        dict: {path: bool}
+    """
+    paths = list(paths)
+    if not paths:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(paths))) as executor:
+        return dict(zip(paths, executor.map(os.path.isfile, paths)))
+
+
+def get_storage_root(path):
+    """
+    Return the top-level directory of an absolute path (e.g. /STORAGE), or None.
+    """
+    parts = path.split("/")
+    return f"/{parts[1]}" if path.startswith("/") and len(parts) > 2 else None
+
+
+def find_unmounted_roots(paths):
+    """
+    Return the storage roots of the given paths that do not exist on this server.
+
+    A missing root means the storage is not mounted here, so none of its
+    files can be checked; it is reported once instead of as thousands of
+    missing files.
+    """
+    roots = {get_storage_root(path) for path in paths} - {None}
+    return sorted(root for root in roots if not os.path.isdir(root))
+
+
+def validate_sample_sheet(samplesheet_df, check_files=True):
+    """
+    Validate a whole samplesheet in one vectorized pass, before anything is enqueued.
 
-    try:
-        df = pd.DataFrame(dataset)
+    Checks:
+    - Sample names are present and contain no spaces.
+    - fastq_1 is present; fastq_2 is optional (single-end data).
+    - FASTQ paths end in .fastq.gz or .fq.gz.
+    - Rows of the same sample (lanes that nf-core merges) are consistently
+      single-end or paired-end, and no run is listed twice.
+    - A FASTQ file is not used by more than one sample or read.
+    - The storage the FASTQ files live on is mounted, and all FASTQ files exist.
 
-        # Ensure necessary columns exist
-        for col in ["Sample", "FASTQ Read 1", "FASTQ Read 2"]:
-            if col not in df.columns:
-                raise KeyError(f"Missing required column in dataset: {col}")
+    Args:
+        samplesheet_df (pd.DataFrame): Result of build_sample_sheet_df.
+        check_files (bool): Whether to check the FASTQ files on disk.
 
+    Returns:
+        list[str]: All problems found; empty if the samplesheet is valid.
+    """
+    df = samplesheet_df.reset_index(drop=True)
+    problems = []
+
+    if df.empty:
+        return ["The dataset contains no samples."]
+
+    missing_name = df["sample"] == ""
+    if missing_name.any():
+        problems.append(f"Missing sample name in row(s) {_rows(missing_name)}")
+
+    spaces = df["sample"].str.contains(" ", regex=False)
+    if spaces.any():
+        problems.append(f"Sample names contain spaces in row(s) {_rows(spaces)}")
+
+    missing_r1 = df["fastq_1"] == ""
+    if missing_r1.any():
+        problems.append(f"Missing FASTQ Read 1 in row(s) {_rows(missing_r1)}")
+
+    for column in ["fastq_1", "fastq_2"]:
+        bad_extension = (df[column] != "") & ~df[column].str.endswith(FASTQ_EXTENSIONS)
+        if bad_extension.any():
+            problems.append(f"{column} does not end in .fastq.gz/.fq.gz in row(s) {_rows(bad_extension)}")
+
+    # Lanes of one sample are merged by nf-core, but they must agree on the layout
+    paired = df["fastq_2"] != ""
+    mixed = paired.groupby(df["sample"]).transform("nunique") > 1
+    if mixed.any():
+        samples = ", ".join(df.loc[mixed, "sample"].unique()[:10])
+        problems.append(f"Samples mix single-end and paired-end rows: {samples}")
+
+    duplicate_rows = df.duplicated(["sample", "fastq_1", "fastq_2"], keep="first") & ~missing_r1
+    if duplicate_rows.any():
+        problems.append(f"Duplicate rows (same sample and FASTQ files) in row(s) {_rows(duplicate_rows)}")
+
+    files = pd.concat([
+        df.loc[df["fastq_1"] != "", ["sample", "fastq_1"]].rename(columns={"fastq_1": "path"}),
+        df.loc[paired, ["sample", "fastq_2"]].rename(columns={"fastq_2": "path"}),
+    ]).drop_duplicates().reset_index(drop=True)
+    reused = files.duplicated("path", keep=False)
+    if reused.any():
+        paths = ", ".join(files.loc[reused, "path"].unique()[:10])
+        problems.append(f"FASTQ files used by more than one sample or read: {paths}")
+
+    same_pair = paired & (df["fastq_1"] == df["fastq_2"])
+    if same_pair.any():
+        problems.append(f"FASTQ Read 1 and Read 2 are the same file in row(s) {_rows(same_pair)}")
 
-        df["fastq_1"] = df["FASTQ Read 1"]
-        df["fastq_2"] = df["FASTQ Read 2"]
-        df["sample"] = df["Sample"]
-        df["strandedness"] = "auto"
+    if check_files:
+        paths = files["path"].unique()
+        unmounted = find_unmounted_roots(paths)
+        if unmounted:
+            unchecked = sum(get_storage_root(path) in unmounted for path in paths)
+            problems.append(
+                f"FASTQ storage not mounted on this server: {', '.join(unmounted)} ({unchecked} file(s) could not be checked)"
+            )
+
+        exists = check_files_exist(path for path in paths if get_storage_root(path) not in unmounted)
+        missing = [path for path, found in exists.items() if not found]
+        if missing:
+            shown = ", ".join(missing[:10])
+            more = f" (+{len(missing) - 10} more)" if len(missing) > 10 else ""
+            problems.append(f"{len(missing)} FASTQ file(s) not found: {shown}{more}")
+
+    return problems
+
+
+def build_sample_sheet_bytes(dataset=None, validate=False):
+    """
+    Build the nf-core/rnaseq samplesheet for one job entirely in memory.
+
+    Nothing is written to the server's working directory, so concurrent
+    submissions cannot overwrite each other's samplesheet.
+
+    Args:
+        dataset (dict): Dataset dictionary.
+        validate (bool): Run the pre-flight validation and raise
+                         SamplesheetValidationError listing every problem.
+
+    Returns:
+        bytes: The samplesheet CSV, ready to be placed in files_as_byte_strings.
+    """
+    samplesheet_df = build_sample_sheet_df(dataset)
 
-        # Final samplesheet
-        samplesheet_df = df[["sample", "fastq_1", "fastq_2", "strandedness"]]
+    if validate:
+        problems = validate_sample_sheet(samplesheet_df)
+        if problems:
+            raise SamplesheetValidationError(problems)
 
-        # Save to CSV
-        samplesheet_df.to_csv("./samplesheet.csv", index=False)
+    return samplesheet_df.to_csv(index=False).encode("utf-8")
 
-        print("samplesheet.csv created successfully.")
 
-    except Exception as e:
-        print(f"Error while creating samplesheet: {e}")
+def validate_sample_sheet_bytes(samplesheet_bytes):
+    """
+    Validate a samplesheet built by build_sample_sheet_bytes, including its FASTQ files.
+
+    Used by the workers when the submission was prepared by the web app,
+    which may not mount the FASTQ storage.
+
+    Returns:
+        list[str]: All problems found; empty if the samplesheet is valid.
+    """
+    samplesheet_df = pd.read_csv(io.BytesIO(samplesheet_bytes), dtype=str, keep_default_na=False)
+    return validate_sample_sheet(samplesheet_df)
+
+
+def create_sample_sheet_csv(dataset=None, path="./samplesheet.csv"):
+    """
+    Create a samplesheet CSV file required for nf-core/rnaseq.
+
+    Kept for standalone testing; the app itself uses build_sample_sheet_bytes.
+
+    Output:
+        Creates the samplesheet at `path` (default './samplesheet.csv')
+
+    Raises:
+        ValueError, KeyError: If the dataset is missing or lacks required columns.
+        OSError: If the file cannot be written.
+    """
+
+    # Fallback if no dataset provided (e.g., during standalone testing)
+    if dataset is None:
+        raise ValueError("No dataset provided to create_sample_sheet_csv().")
+
+    # Built before the file is opened, so a bad dataset leaves no partial file behind
+    samplesheet_bytes = build_sample_sheet_bytes(dataset)
+    with open(path, "wb") as f:
+        f.write(samplesheet_bytes)
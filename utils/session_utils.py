@@ -0,0 +1,76 @@
+import json
+import uuid
+from functools import lru_cache
+
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+# ------------------------------------------------------------------------------
+# SERVER-SIDE DATASET SESSIONS
+# ------------------------------------------------------------------------------
+# The dataset of the open entity stays on the server; the browser's
+# dcc.Store(id="dataset") only holds a handle to it:
+#
+#   rnaseq:session:dataset:<handle>   dataset as JSON, expires after SESSION_TTL
+#
+# Every access extends the expiry, so a session lives as long as it is used.
+# Handles derived from the entity id and modification time are shared by all
+# tabs showing the same version of a dataset.
+SESSION_KEY_PREFIX = "rnaseq:session:dataset"
+SESSION_TTL = 60 * 60 * 8  # Seconds
+
+
+def _session_key(handle):
+    return f"{SESSION_KEY_PREFIX}:{handle}"
+
+
+def save_dataset(dataset, handle=None):
+    """
+    Store a dataset server-side.
+
+    Args:
+        dataset (dict): Dataset dictionary as returned by dataset_to_dictionary.
+        handle (str, optional): Handle to store it under; a random one by default.
+
+    Returns:
+        str: The handle to keep in the browser.
+    """
+    handle = handle or uuid.uuid4().hex
+    redis_conn.set(_session_key(handle), json.dumps(dataset), ex=SESSION_TTL)
+    return handle
+
+
+def touch_dataset(handle):
+    """
+    Extend the expiry of a dataset session; False if it does not exist (anymore).
+    """
+    return bool(handle) and bool(redis_conn.expire(_session_key(handle), SESSION_TTL))
+
+
+@lru_cache(maxsize=16)
+def _read_dataset(handle):
+    raw = redis_conn.get(_session_key(handle))
+    if raw is None:
+        raise KeyError(f"Dataset session {handle} expired; please reload the page.")
+    return json.loads(raw)
+
+
+def load_dataset(handle):
+    """
+    Load the dataset of a session.
+
+    Sessions are immutable, so the parsed dataset is memoized per process.
+    Callers must not modify the returned dictionary.
+
+    Raises:
+        KeyError: If the session expired.
+    """
+    if not touch_dataset(handle):
+        raise KeyError(f"Dataset session {handle} expired; please reload the page.")
+    return _read_dataset(handle)
+
+
+def get_dataset_handle(store_data):
+    """
+    Return the handle kept in dcc.Store(id="dataset"), or None if no dataset is loaded.
+    """
+    return (store_data or {}).get("handle")
@@ -0,0 +1,153 @@
+import os
+import shutil
+from pathlib import Path
+
+from utils.lazy_imports import lazy_import
+
+pd = lazy_import("pandas")
+
+# ------------------------------------------------------------------------------
+# SHARDED RUNS
+# ------------------------------------------------------------------------------
+# Large datasets can be split into shards that run as sibling jobs on several
+# workers. A final merge job combines their outputs into one result tree that
+# looks like the output of a single run.
+COUNT_MATRIX_GLOB = "*/*.merged.*.tsv"          # e.g. star_salmon/salmon.merged.gene_counts.tsv
+MULTIQC_DATA_GLOB = "multiqc/*/multiqc_data/*.txt"
+MULTIQC_REPORT_GLOB = "multiqc/*/multiqc_report.html"
+MULTIQC_SAMPLE_COLUMN = "Sample"  # First column of the per-sample MultiQC tables
+
+
+def split_dataset(dataset, n_shards):
+    """
+    Split a dataset into at most n_shards balanced shards.
+
+    All rows of one sample (e.g. its lanes) stay in the same shard so nf-core
+    can still merge them. Samples are assigned greedily to the shard with the
+    fewest rows so far.
+
+    Returns:
+        list[dict]: Non-empty shard datasets, in the same dict-of-lists format.
+    """
+    df = pd.DataFrame(dataset)
+    if df.empty or n_shards <= 1:
+        return [dataset]
+
+    groups = sorted(df.groupby("Sample", sort=False).groups.items(), key=lambda item: -len(item[1]))
+    shard_rows = [[] for _ in range(n_shards)]
+    for _, rows in groups:
+        min(shard_rows, key=len).extend(rows)
+
+    return [
+        df.loc[sorted(rows)].to_dict("list")
+        for rows in shard_rows if rows
+    ]
+
+
+def _find_relative_paths(shard_dirs, pattern):
+    paths = set()
+    for shard_dir in shard_dirs:
+        paths.update(str(path.relative_to(shard_dir)) for path in Path(shard_dir).glob(pattern))
+    return sorted(paths)
+
+
+def merge_count_matrices(shard_dirs, output_dir):
+    """
+    Merge the per-shard Salmon/featureCounts matrices column-wise.
+
+    The leading non-numeric columns (gene_id, gene_name, tx, ...) form the row
+    key; every shard contributes its own sample columns. A sample present in
+    several directories is taken from the last one, so an incremental rerun
+    passes the previous output first and the reprocessed samples replace it.
+
+    Returns:
+        list[str]: Paths of the merged matrices.
+    """
+    merged_paths = []
+
+    for relative_path in _find_relative_paths(shard_dirs, COUNT_MATRIX_GLOB):
+        merged = None
+        id_columns = None
+
+        for shard_dir in shard_dirs:
+            path = Path(shard_dir) / relative_path
+            if not path.is_file():
+                continue
+
+            matrix = pd.read_csv(path, sep="\t")
+            if id_columns is None:
+                id_columns = [c for c in matrix.columns if not pd.api.types.is_numeric_dtype(matrix[c])]
+                merged = matrix
+                continue
+
+            replaced = [c for c in matrix.columns if c in merged.columns and c not in id_columns]
+            merged = merged.drop(columns=replaced).merge(matrix, on=id_columns, how="outer")
+
+        destination = Path(output_dir) / relative_path
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        sample_columns = [c for c in merged.columns if c not in id_columns]
+        merged[sample_columns] = merged[sample_columns].fillna(0)
+        merged.to_csv(destination, sep="\t", index=False)
+        merged_paths.append(str(destination))
+
+    return merged_paths
+
+
+def merge_multiqc_data(shard_dirs, output_dir):
+    """
+    Combine the MultiQC data tables of all shards and keep every shard's report.
+
+    Tables are concatenated row-wise. Per-sample tables (first column
+    "Sample": general stats, tool summaries) keep one row per sample, the row
+    of the last directory it appears in. Other tables, such as
+    multiqc_sources.txt (first column "Module"), have many rows per key, so
+    only exact duplicate rows are dropped. The shard HTML reports are copied as multiqc_report_shard_<i>.html because
+    MultiQC reports themselves cannot be merged.
+
+    Returns:
+        list[str]: Paths of the merged tables and copied reports.
+    """
+    merged_paths = []
+
+    for relative_path in _find_relative_paths(shard_dirs, MULTIQC_DATA_GLOB):
+        tables = []
+        for shard_dir in shard_dirs:
+            path = Path(shard_dir) / relative_path
+            if path.is_file():
+                try:
+                    tables.append(pd.read_csv(path, sep="\t"))
+                except (pd.errors.ParserError, pd.errors.EmptyDataError):
+                    continue
+
+        if not tables:
+            continue
+
+        destination = Path(output_dir) / relative_path
+        destination.parent.mkdir(parents=True, exist_ok=True)
+        merged = pd.concat(tables, ignore_index=True)
+        if merged.columns[0] == MULTIQC_SAMPLE_COLUMN:
+            merged = merged.drop_duplicates(subset=MULTIQC_SAMPLE_COLUMN, keep="last")
+        else:
+            merged = merged.drop_duplicates(keep="last")
+        merged.to_csv(destination, sep="\t", index=False)
+        merged_paths.append(str(destination))
+
+    for i, shard_dir in enumerate(shard_dirs):
+        for path in Path(shard_dir).glob(MULTIQC_REPORT_GLOB):
+            destination = Path(output_dir) / path.relative_to(shard_dir).parent / f"multiqc_report_shard_{i}.html"
+            destination.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copy2(path, destination)
+            merged_paths.append(str(destination))
+
+    return merged_paths
+
+
+def merge_shard_outputs(shard_dirs, output_dir):
+    """
+    Merge the outputs of all shards into output_dir.
+
+    Returns:
+        list[str]: Paths of all merged files.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    return merge_count_matrices(shard_dirs, output_dir) + merge_multiqc_data(shard_dirs, output_dir)
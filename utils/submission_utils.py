@@ -0,0 +1,174 @@
+import json
+import time
+
+from rq.job import Job
+from rq.exceptions import NoSuchJobError
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+from utils.pipeline_utils import get_run_key
+
+# ------------------------------------------------------------------------------
+# IDEMPOTENT SUBMISSION
+# ------------------------------------------------------------------------------
+# Every submission claims a Redis key derived from the dataset contents and the
+# parameters that change the results (FASTA/GTF):
+#
+#   rnaseq:submission:<key>   JSON {job_id, output_dir, queue, status, submitted}
+#
+# The claim is taken atomically (SET NX), so a double click or two users
+# submitting the same dataset cannot enqueue the same run twice. A claim is
+# released again when its job (or a shard it waits for) failed, was cancelled
+# or vanished from RQ, and by the worker when the run did not produce its
+# results. A forced submit replaces the record of a finished run.
+SUBMISSION_KEY_PREFIX = "rnaseq:submission"
+SUBMISSION_TTL = 60 * 60 * 24 * 30  # Seconds; finished runs are reported for 30 days
+PENDING_TTL = 60 * 10  # Seconds; a claim that never got enqueued expires quickly
+ACTIVE_JOB_STATUSES = ("queued", "started", "deferred", "scheduled")
+
+
+def _submission_key(key):
+    return f"{SUBMISSION_KEY_PREFIX}:{key}"
+
+
+def get_submission_key(dataset, fasta=None, gtf=None, base_output_dir=None):
+    """
+    Compute the idempotency key of a submission.
+
+    RAM, CPUs, queue and shard count only change how a run is executed, not
+    its results, so they are not part of the key. An incremental rerun also
+    depends on the run its results are merged into.
+    """
+    params = {"fasta": fasta, "gtf": gtf}
+    if base_output_dir:
+        params["base_output_dir"] = base_output_dir
+    return get_run_key(dataset, params)
+
+
+def _get_job_status(job_id):
+    """
+    Return the RQ status of a job, or None if it vanished.
+
+    A deferred job whose dependencies failed never runs, so it is reported
+    with the status of the failed dependency.
+    """
+    try:
+        job = Job.fetch(job_id, connection=redis_conn)
+    except NoSuchJobError:
+        return None
+
+    status = job.get_status(refresh=False)
+    if status == "deferred":
+        dependencies = job.fetch_dependencies()
+        if len(dependencies) < len(job.dependency_ids):
+            return None
+        for dependency in dependencies:
+            dependency_status = dependency.get_status(refresh=False)
+            if dependency_status in ("failed", "stopped", "canceled"):
+                return dependency_status
+    return status
+
+
+def get_submission(key):
+    """
+    Return the record of a live or finished submission, or None.
+
+    Records whose job failed, was cancelled or expired from RQ before the worker
+    marked it finished are dropped, so the dataset can be submitted again.
+    """
+    raw = redis_conn.get(_submission_key(key))
+    if raw is None:
+        return None
+
+    record = json.loads(raw)
+    if record.get("status") == "finished":
+        return record
+
+    status = _get_job_status(record["job_id"])
+    if status == "finished":
+        record["status"] = "finished"
+        return record
+    if status in ACTIVE_JOB_STATUSES:
+        record["status"] = status
+        return record
+
+    # A status of "pending" means the claim was just taken and is not enqueued yet.
+    if status is None and record.get("status") == "pending":
+        return record
+
+    redis_conn.delete(_submission_key(key))
+    return None
+
+
+def claim_submission(key, job_id, output_dir, queue, force=False):
+    """
+    Atomically claim a submission key for a new job.
+
+    Args:
+        key (str): Key from get_submission_key.
+        job_id (str): Id of the new job.
+        output_dir (str): Output directory of the new job.
+        queue (str): Queue the job goes to.
+        force (bool): Take over the key of a finished run, to run it again.
+                      A queued or running identical run is still reported.
+
+    Returns:
+        dict | None: None if the claim succeeded and the job should be enqueued,
+                     otherwise the record of the existing submission.
+    """
+    record = {
+        "job_id": job_id,
+        "output_dir": output_dir,
+        "queue": queue,
+        "status": "pending",
+        "submitted": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+    for _ in range(2):
+        if redis_conn.set(_submission_key(key), json.dumps(record), nx=True, ex=PENDING_TTL):
+            return None
+
+        existing = get_submission(key)
+        if existing is not None and force and existing["status"] == "finished":
+            redis_conn.set(_submission_key(key), json.dumps(record), ex=PENDING_TTL)
+            return None
+        if existing is not None:
+            return existing
+        # The stale record was dropped by get_submission; try once more.
+
+    return get_submission(key)
+
+
+def update_submission(key, **fields):
+    """
+    Update fields of a claimed submission (e.g. its queue or status).
+    """
+    if not key:
+        return
+
+    raw = redis_conn.get(_submission_key(key))
+    if raw is None:
+        return
+
+    record = json.loads(raw)
+    record.update(fields)
+    redis_conn.set(_submission_key(key), json.dumps(record), ex=SUBMISSION_TTL)
+
+
+def release_submission(key, job_id):
+    """
+    Drop a claim again, e.g. because enqueueing failed. Only the owner may release it.
+    """
+    raw = redis_conn.get(_submission_key(key))
+    if raw is not None and json.loads(raw).get("job_id") == job_id:
+        redis_conn.delete(_submission_key(key))
+
+
+def mark_submission_finished(key):
+    """
+    Called by the worker once a successful run's results are registered, so
+    the run is still reported as finished after RQ dropped the job.
+    """
+    try:
+        update_submission(key, status="finished")
+    except Exception as e:
+        print(f"Failed to mark submission {key} as finished: {e}")
@@ -0,0 +1,378 @@
+import json
+import threading
+import time
+from datetime import datetime
+
+import bfabric_web_apps
+from bfabric_web_apps import get_logger
+from bfabric_web_apps.utils.redis_connection import redis_conn
+from bfabric_web_apps.utils.redis_queue import q
+from redis.exceptions import WatchError
+from rq import Queue, Retry, Worker
+from rq.exceptions import NoSuchJobError
+from rq.job import Job
+
+from utils.samplesheet_utils import build_sample_sheet_df, validate_sample_sheet, SamplesheetValidationError
+from utils.routing_utils import route_queue, QUEUES
+from utils.shard_utils import split_dataset
+from utils.job_utils import build_pipeline_payload, run_rnaseq_job, run_shard_job, run_merge_job, run_transfer_job
+from utils.transfer_utils import TRANSFER_QUEUE
+from utils.session_utils import load_dataset
+from utils.run_history import get_last_run, select_rerun_rows, subset_dataset, get_samples
+from utils.table_utils import get_selected_row_ids
+from utils.submission_utils import get_submission_key, claim_submission, update_submission, release_submission
+
+# ------------------------------------------------------------------------------
+# TWO-PHASE SUBMISSION
+# ------------------------------------------------------------------------------
+# The submit callback only records the user's intent (form values plus the
+# handles of the server-side dataset and table sessions) and enqueues a
+# preparation job on SUBMIT_QUEUE. That job validates the samplesheet,
+# builds the payloads and enqueues the pipeline jobs, while the browser
+# polls its status:
+#
+#   rnaseq:submit:<job_id>   JSON {status, message, updated, inline}
+#
+# status: queued -> preparing -> enqueuing -> submitted | duplicate | nothing | failed
+#
+# SUBMIT_QUEUE is served by a dedicated worker (scripts/worker.py --queues
+# submit), so submits are not stuck behind pipeline runs. If no worker listens
+# on it, the app prepares the submission in a background thread instead
+# ("inline"); the FASTQ files are then checked by the pipeline job, as the app
+# may not mount their storage.
+#
+# A submission that no worker picked up, or (inline) that was not prepared,
+# within SUBMIT_TIMEOUT is reported as failed. Status changes that race with
+# the preparation (timing out, starting, starting to enqueue) are made with
+# transition_submit_status, so a submission reported as failed never enqueues
+# a run.
+SUBMIT_QUEUE = "submit"
+SUBMIT_STATUS_KEY_PREFIX = "rnaseq:submit"
+SUBMIT_STATUS_TTL = 60 * 60 * 24  # Seconds
+SUBMIT_TIMEOUT = 60 * 10  # Seconds
+FINAL_SUBMIT_STATUSES = ("submitted", "duplicate", "nothing", "failed")
+PROJECT_ID = 37767
+OUTPUT_CONTAINER_ID = 37767
+
+
+def _status_key(job_id):
+    return f"{SUBMIT_STATUS_KEY_PREFIX}:{job_id}"
+
+
+def get_prepare_job_id(job_id):
+    return f"{job_id}_prepare"
+
+
+def set_submit_status(job_id, status, message="", inline=False):
+    record = {"status": status, "message": message, "updated": time.time(), "inline": inline}
+    redis_conn.set(_status_key(job_id), json.dumps(record), ex=SUBMIT_STATUS_TTL)
+    return record
+
+
+def transition_submit_status(job_id, from_statuses, status, message=""):
+    """
+    Set the status of a submission only if it is still one of from_statuses.
+
+    Returns:
+        dict or None: The new record, or None if the record had another status or changed meanwhile.
+    """
+    key = _status_key(job_id)
+    with redis_conn.pipeline() as pipe:
+        try:
+            pipe.watch(key)
+            raw = pipe.get(key)
+            if raw is None or json.loads(raw)["status"] not in from_statuses:
+                return None
+            record = {"status": status, "message": message, "updated": time.time(),
+                      "inline": json.loads(raw).get("inline", False)}
+            pipe.multi()
+            pipe.set(key, json.dumps(record), ex=SUBMIT_STATUS_TTL)
+            pipe.execute()
+            return record
+        except WatchError:
+            return None
+
+
+def _fail_submit_status(job_id, from_statuses, message):
+    """
+    Report a submission as failed unless it moved on meanwhile; returns its current record.
+    """
+    record = transition_submit_status(job_id, from_statuses, "failed", message)
+    if record is None:
+        raw = redis_conn.get(_status_key(job_id))
+        record = json.loads(raw) if raw is not None else None
+    return record
+
+
+def get_submit_status(job_id, timeout=SUBMIT_TIMEOUT):
+    """
+    Return the status record of a submission, or None if it is unknown.
+
+    A preparation job that died without reporting (e.g. a killed worker) or
+    that no worker picked up within timeout is reported as failed, so the
+    browser stops polling and the user can submit again. An inline
+    preparation is only timed out before it started enqueuing.
+    """
+    raw = redis_conn.get(_status_key(job_id))
+    if raw is None:
+        return None
+
+    record = json.loads(raw)
+    if record["status"] in FINAL_SUBMIT_STATUSES:
+        return record
+
+    expired = time.time() - record["updated"] > timeout
+    if record.get("inline"):
+        # Prepared by a thread of an app process, which may have been restarted
+        if expired:
+            return _fail_submit_status(
+                job_id, ("queued", "preparing"), "The submission was not prepared in time; please submit again."
+            )
+        return record
+
+    try:
+        job = Job.fetch(get_prepare_job_id(job_id), connection=redis_conn)
+        job_status = job.get_status(refresh=False)
+    except NoSuchJobError:
+        job, job_status = None, None
+    if job_status in (None, "failed", "stopped", "canceled"):
+        return _fail_submit_status(
+            job_id, ("queued", "preparing", "enqueuing"), "The preparation job was lost; please submit again."
+        )
+
+    if record["status"] == "queued" and expired:
+        # A worker that starts the job meanwhile finds the record failed and aborts
+        record = _fail_submit_status(
+            job_id, ("queued",), f"No worker picked up the submission within {timeout // 60} minutes; please submit again."
+        )
+        if record["status"] == "failed" and job.get_status(refresh=True) == "queued":
+            job.cancel()
+    return record
+
+
+def has_submit_worker():
+    """
+    Whether a live worker listens on SUBMIT_QUEUE.
+    """
+    return Worker.count(queue=Queue(SUBMIT_QUEUE, connection=redis_conn)) > 0
+
+
+def enqueue_submission(job_id, intent):
+    """
+    Record a submission and have it prepared by a submit worker, or in the background if there is none.
+
+    Args:
+        job_id (str): Id of the submission; the pipeline job gets the same id.
+        intent (dict): Form values and session handles, see run_prepare_job.
+    """
+    if not has_submit_worker():
+        set_submit_status(job_id, "queued", inline=True)
+        threading.Thread(target=run_prepare_job, args=(job_id, intent), kwargs={"inline": True},
+                         name=f"prepare-{job_id}", daemon=True).start()
+        return
+
+    set_submit_status(job_id, "queued")
+    q(SUBMIT_QUEUE).enqueue(run_prepare_job, job_id=get_prepare_job_id(job_id), kwargs={
+        "job_id": job_id,
+        "intent": intent
+    })
+
+
+def prepare_submission(job_id, intent, L, inline=False):
+    """
+    Validate a submission, build its payloads and enqueue its pipeline jobs.
+
+    With inline, the FASTQ files are not checked here but by the pipeline jobs.
+
+    Returns:
+        tuple: (status, message) with status one of "submitted", "duplicate" or "nothing",
+               or ("failed", None) if the submission timed out before anything was enqueued.
+    """
+    fasta_val, gtf_val = intent["fasta"], intent["gtf"]
+    ram_val, cpu_val = intent["ram"], intent["cpus"]
+    queue, url_params = intent["queue"], intent["url_params"]
+    user_id = intent["token_data"].get("user_data")
+
+    # The browser only holds a handle; the dataset itself is loaded server-side.
+    dataset = load_dataset(intent["dataset_handle"])
+
+    timestamp = datetime.fromtimestamp(intent["submitted"]).strftime("%Y-%m-%d_%H-%M-%S")
+    output_dir = "/STORAGE/OUTPUT_rnaseq_" + timestamp
+
+    # Process all samples, the selected ones or only those without results;
+    # a subset is merged into the matrices of the last run of this dataset.
+    entity_id = intent["entity_id"]
+    rerun_mode = intent["rerun_mode"]
+    table_session = intent["table_session"]
+    selected_row_ids = get_selected_row_ids(table_session) if rerun_mode == "selected" and table_session else []
+    rows, base_run = select_rerun_rows(dataset, rerun_mode, selected_row_ids, get_last_run(entity_id, fasta_val, gtf_val))
+    if not rows:
+        if rerun_mode == "new":
+            return "nothing", "All samples already have results in the last run; no new job was enqueued."
+        raise ValueError("No samples selected.")
+    if len(rows) < len(dataset.get("Sample", [])):
+        dataset = subset_dataset(dataset, rows)
+        L.log_operation(
+            "Info | ORIGIN: rnaseq web app",
+            f"Job {job_id} processes {len(get_samples(dataset))} sample(s)"
+            + (f", merged into {base_run['output_dir']}." if base_run else "."),
+            flush_logs=False
+        )
+    base_output_dir = base_run["output_dir"] if base_run else None
+    run_record = {
+        "entity_id": entity_id,
+        "fasta": fasta_val,
+        "gtf": gtf_val,
+        "samples": get_samples(dataset) + (base_run["samples"] if base_run else []),
+    }
+
+    # 1. Validate the whole samplesheet before anything is enqueued
+    problems = validate_sample_sheet(build_sample_sheet_df(dataset), check_files=not inline)
+    if problems:
+        raise SamplesheetValidationError(problems)
+    L.log_operation("Info | ORIGIN: rnaseq web app", f"Pipeline samplesheet validated for job {job_id}.", flush_logs=False)
+
+    # From here on the submission is not timed out any more; if it already was, nothing is enqueued.
+    if transition_submit_status(job_id, ("preparing",), "enqueuing") is None:
+        L.log_operation("Info | ORIGIN: rnaseq web app", f"Job {job_id} timed out before it was enqueued; skipped.")
+        return "failed", None
+
+    # Claim the dataset + FASTA/GTF combination; an identical run is reported instead of enqueued
+    # again, unless the user forces a finished one to run again.
+    submission_key = get_submission_key(dataset, fasta_val, gtf_val, base_output_dir)
+    existing = claim_submission(submission_key, job_id, output_dir, queue, force=intent.get("force", False))
+    if existing is not None:
+        if existing["status"] == "finished":
+            message = f"An identical run already finished (job {existing['job_id']}); its results are in {existing['output_dir']} and listed under your workunits. Tick 'Run again' to rerun it."
+        else:
+            message = f"An identical run is already {existing['status']} (job {existing['job_id']}, submitted {existing['submitted']}); no new job was enqueued."
+        L.log_operation("Info | ORIGIN: rnaseq web app", f"Duplicate submission of job {existing['job_id']} skipped.")
+        return "duplicate", message
+
+    try:
+        charge_run = [PROJECT_ID] if intent["charge_run"] and PROJECT_ID else []
+
+        # 2. Create resource paths mapping file or folder to container IDs.
+        resource_paths = {f'{output_dir}': OUTPUT_CONTAINER_ID}
+
+        # Resources each pipeline run declares, so pool workers only start it when they fit.
+        job_resources = {"cpus": int(cpu_val), "memory_gb": int(ram_val)}
+
+        shard_datasets = split_dataset(dataset, int(intent["shards"] or 1))
+
+        if len(shard_datasets) == 1 and not base_run:
+            # 3. Files as bytes (samplesheet, config) and bash commands for one run
+            payload = build_pipeline_payload(job_id, dataset, output_dir, ram_val, cpu_val, fasta_val, gtf_val, user_id)
+            L.log_operation("Info | ORIGIN: rnaseq web app", f"Job {job_id} payload built ({ram_val} GB, {cpu_val} CPUs, {payload['fastq_bytes']} FASTQ bytes, index cached: {payload['index_cached']}).", flush_logs=False)
+
+            # 4. Route the job: the cost model decides unless the user picked a queue explicitly.
+            queue, reason = route_queue(payload["estimate"], override=queue)
+            L.log_operation(
+                "Info | ORIGIN: rnaseq web app",
+                f"Job {job_id} routed to {queue} queue ({reason}).",
+                params=payload["estimate"],
+                flush_logs=False
+            )
+
+            # 5. Enqueue the main job into the Redis queue for asynchronous execution.
+            # Attachments are found by scanning the output directory once the run finished.
+            main_job = q(queue).enqueue(run_rnaseq_job, job_id=job_id, meta=job_resources, kwargs={
+                "files_as_byte_strings": payload["files_as_byte_strings"],
+                "bash_commands": payload["bash_commands"],
+                "resource_paths": resource_paths,
+                "output_dir": output_dir,
+                "token": url_params,
+                "service_id": bfabric_web_apps.SERVICE_ID,
+                "charge": charge_run,
+                "submission_key": submission_key,
+                "progress": payload["progress"],
+                "run_record": run_record,
+                "resource_history": payload["resource_history"],
+                "index_key": payload["index_key"],
+                "dry_run": payload["dry_run"],
+                "check_files": inline
+            })
+
+        else:
+            # 3-5. One sibling job per shard (or for the samples of an incremental rerun),
+            # each routed on its own estimate ...
+            shard_jobs, shard_dirs = [], []
+            for i, shard in enumerate(shard_datasets):
+                shard_job_id = f"{job_id}_shard{i}"
+                shard_dir = f"{output_dir}_shards/shard_{i}"
+                payload = build_pipeline_payload(shard_job_id, shard, shard_dir, ram_val, cpu_val, fasta_val, gtf_val, user_id)
+                shard_queue, reason = route_queue(payload["estimate"], override=queue)
+                L.log_operation(
+                    "Info | ORIGIN: rnaseq web app",
+                    f"Shard {i + 1}/{len(shard_datasets)} of job {job_id} routed to {shard_queue} queue ({reason}).",
+                    params=payload["estimate"],
+                    flush_logs=False
+                )
+                shard_jobs.append(q(shard_queue).enqueue(run_shard_job, job_id=shard_job_id, meta=job_resources, kwargs={
+                    "files_as_byte_strings": payload["files_as_byte_strings"],
+                    "bash_commands": payload["bash_commands"],
+                    "token": url_params,
+                    "progress": payload["progress"],
+                    "resource_history": payload["resource_history"],
+                    "index_key": payload["index_key"],
+                    "check_files": inline
+                }))
+                shard_dirs.append(shard_dir)
+
+            # ... and a merge job that runs once all shards finished and registers the combined result.
+            # The previous run's output goes first, so reprocessed samples replace its columns.
+            queue = queue if queue in QUEUES else "light"
+            main_job = q(queue).enqueue(run_merge_job, job_id=job_id, depends_on=shard_jobs, kwargs={
+                "shard_dirs": ([base_output_dir] if base_output_dir else []) + shard_dirs,
+                "output_dir": output_dir,
+                "resource_paths": resource_paths,
+                "token": url_params,
+                "service_id": bfabric_web_apps.SERVICE_ID,
+                "charge": charge_run,
+                "submission_key": submission_key,
+                "run_record": run_record,
+                "dry_run": payload["dry_run"]
+            })
+
+        # 6. Stage the outputs to gstore on the transfer queue once the run finished, so the
+        # pipeline worker is free right away. Retries resume an interrupted transfer.
+        q(TRANSFER_QUEUE).enqueue(run_transfer_job, job_id=f"{job_id}_transfer", depends_on=main_job,
+                                  retry=Retry(max=3, interval=[60, 600, 3600]), kwargs={
+            "output_dir": output_dir,
+            "token": url_params,
+            "submission_key": submission_key,
+            "run_record": run_record
+        })
+
+        update_submission(submission_key, queue=queue, status="queued")
+    except Exception:
+        # Free the claim so the user can retry once the problem is fixed.
+        release_submission(submission_key, job_id)
+        raise
+
+    L.log_operation("Info | ORIGIN: rnaseq web app", f"Job submitted successfully to {queue} Redis queue.")
+    return "submitted", f"Job {job_id} was submitted to the {queue} queue."
+
+
+def run_prepare_job(job_id, intent, inline=False):
+    """
+    Worker entry point of the second submit phase; reports its outcome through the status record.
+
+    inline is set when the app runs it in a thread because no submit worker is alive.
+    A submission that was already reported as failed (timed out) is not prepared.
+    """
+    L = get_logger(intent["token_data"])
+    if transition_submit_status(job_id, ("queued",), "preparing") is None:
+        L.log_operation("Info | ORIGIN: rnaseq web app", f"Job {job_id} timed out before it was prepared; skipped.")
+        return "failed"
+
+    try:
+        status, message = prepare_submission(job_id, intent, L, inline=inline)
+    except Exception as e:
+        status, message = "failed", f"Job submission failed: {str(e)}"
+        L.log_operation("Info | ORIGIN: rnaseq web app", message)
+
+    # A timed-out submission keeps the failed record it was given
+    if message is not None:
+        transition_submit_status(job_id, ("preparing", "enqueuing"), status, message)
+    return status
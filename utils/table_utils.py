@@ -0,0 +1,228 @@
+import uuid
+from functools import lru_cache
+
+from bfabric_web_apps.utils.redis_connection import redis_conn
+
+from utils.cache_utils import cached_call
+from utils.lazy_imports import lazy_import
+from utils.session_utils import load_dataset
+
+pd = lazy_import("pandas")
+
+# ------------------------------------------------------------------------------
+# SERVER-SIDE DATASET TABLE
+# ------------------------------------------------------------------------------
+# Each DataTable gets a table session on top of the server-side dataset
+# session, so the browser only ever receives the visible page and the
+# selected columns.
+#
+#   rnaseq:table:<session_id>             handle of the dataset session
+#   rnaseq:table:<session_id>:deselected  set of row ids the user deselected
+#
+# Selection defaults to "all rows", so only deselections are stored; a 10k
+# sample dataset with everything selected costs nothing to track.
+TABLE_KEY_PREFIX = "rnaseq:table"
+TABLE_SESSION_TTL = 60 * 60 * 8  # Seconds
+TABLE_CACHE_TTL = 60 * 10  # Seconds
+TABLE_CACHE_MAX_ENTRIES = 16
+ROW_ID_COLUMN = "__row_id"  # Reserved, so it never shadows a dataset attribute
+
+FILTER_OPERATORS = [
+    ["ge ", ">="],
+    ["le ", "<="],
+    ["lt ", "<"],
+    ["gt ", ">"],
+    ["ne ", "!="],
+    ["eq ", "="],
+    ["contains "],
+    ["datestartswith "],
+]
+
+
+def _dataset_key(session_id):
+    return f"{TABLE_KEY_PREFIX}:{session_id}"
+
+
+def _deselected_key(session_id):
+    return f"{TABLE_KEY_PREFIX}:{session_id}:deselected"
+
+
+def create_table_session(dataset_handle):
+    """
+    Open a table session on a stored dataset and return its id.
+    """
+    session_id = uuid.uuid4().hex
+    redis_conn.set(_dataset_key(session_id), dataset_handle, ex=TABLE_SESSION_TTL)
+    return session_id
+
+
+def _build_table_df(handle):
+    df = pd.DataFrame(load_dataset(handle))
+    df[ROW_ID_COLUMN] = range(len(df))
+    return df
+
+
+@lru_cache(maxsize=TABLE_CACHE_MAX_ENTRIES)
+def _load_table_df(handle):
+    return cached_call(
+        "table", handle, lambda: _build_table_df(handle), ttl=TABLE_CACHE_TTL, max_entries=TABLE_CACHE_MAX_ENTRIES
+    )
+
+
+def get_table_df(session_id):
+    """
+    Load the DataFrame of a table session, with a stable row id column.
+
+    Datasets behind a handle never change, so the DataFrame is memoized per
+    process, with the shared TTL cache as the fallback of a fresh process;
+    page/sort/filter requests neither re-parse nor unpickle the dataset,
+    while an expired session is still reported as expired. Callers must not
+    modify the returned DataFrame.
+    """
+    handle = redis_conn.get(_dataset_key(session_id))
+    if handle is None:
+        raise KeyError(f"Table session {session_id} expired.")
+
+    redis_conn.expire(_dataset_key(session_id), TABLE_SESSION_TTL)
+    return _load_table_df(handle.decode("utf-8"))
+
+
+def split_filter_part(filter_part):
+    """
+    Parse one clause of a DataTable filter_query, e.g. `{Sample} contains "Run_1"`.
+
+    Returns:
+        tuple: (column name, operator, value), or (None, None, None) if unparseable.
+    """
+    for operator_type in FILTER_OPERATORS:
+        for operator in operator_type:
+            if operator in filter_part:
+                name_part, value_part = filter_part.split(operator, 1)
+                name = name_part[name_part.find("{") + 1: name_part.rfind("}")]
+
+                value_part = value_part.strip()
+                v0 = value_part[0] if value_part else ""
+                if v0 and v0 == value_part[-1] and v0 in ("'", '"', "`"):
+                    value = value_part[1:-1].replace("\\" + v0, v0)
+                else:
+                    try:
+                        value = float(value_part)
+                    except ValueError:
+                        value = value_part
+
+                # word operators need spaces after them in the filter string,
+                # but we don't want these later
+                return name, operator_type[0].strip(), value
+
+    return None, None, None
+
+
+def apply_filter_query(df, filter_query):
+    """
+    Apply a DataTable filter_query to a DataFrame with vectorized masks.
+    """
+    if not filter_query:
+        return df
+
+    mask = pd.Series(True, index=df.index)
+    for filter_part in filter_query.split(" && "):
+        col_name, operator, value = split_filter_part(filter_part)
+        if col_name not in df.columns:
+            continue
+
+        column = df[col_name]
+        if operator in ("eq", "ne", "lt", "le", "gt", "ge"):
+            if isinstance(value, float):
+                column = pd.to_numeric(column, errors="coerce")
+            else:
+                column = column.astype(str)
+            mask &= getattr(column, operator)(value)
+        elif operator == "contains":
+            mask &= column.astype(str).str.contains(str(value), case=False, regex=False, na=False)
+        elif operator == "datestartswith":
+            mask &= column.astype(str).str.startswith(str(value), na=False)
+
+    return df[mask]
+
+
+def apply_sort(df, sort_by):
+    """
+    Apply a DataTable sort_by list to a DataFrame.
+    """
+    if not sort_by:
+        return df
+
+    return df.sort_values(
+        [col["column_id"] for col in sort_by],
+        ascending=[col["direction"] == "asc" for col in sort_by],
+        inplace=False,
+        kind="stable"
+    )
+
+
+def get_table_page(session_id, page_current, page_size, sort_by=None, filter_query=None, columns=None):
+    """
+    Compute the visible page of a table session.
+
+    Args:
+        session_id (str): Table session id.
+        page_current (int): Zero-based page index.
+        page_size (int): Rows per page.
+        sort_by (list, optional): DataTable sort_by.
+        filter_query (str, optional): DataTable filter_query.
+        columns (list, optional): Columns to send to the browser; all if empty.
+
+    Returns:
+        tuple: (page records, page count, selected row positions on the page)
+    """
+    df = apply_sort(apply_filter_query(get_table_df(session_id), filter_query), sort_by)
+
+    page_count = max((len(df) + page_size - 1) // page_size, 1)
+    start = page_current * page_size
+    page = df.iloc[start:start + page_size]
+
+    visible_columns = [c for c in (columns or df.columns) if c in df.columns and c != ROW_ID_COLUMN]
+    records = page[visible_columns + [ROW_ID_COLUMN]].to_dict("records")
+
+    deselected = get_deselected_row_ids(session_id)
+    selected_rows = [i for i, row_id in enumerate(page[ROW_ID_COLUMN]) if row_id not in deselected]
+
+    return records, page_count, selected_rows
+
+
+def get_deselected_row_ids(session_id):
+    return {int(row_id) for row_id in redis_conn.smembers(_deselected_key(session_id))}
+
+
+def update_page_selection(session_id, page_row_ids, selected_row_ids):
+    """
+    Record the selection state of the rows on the current page.
+
+    Args:
+        session_id (str): Table session id.
+        page_row_ids (list[int]): Row ids shown on the page.
+        selected_row_ids (list[int]): Row ids on the page that are selected.
+    """
+    selected = set(selected_row_ids or [])
+    deselected = [row_id for row_id in page_row_ids if row_id not in selected]
+
+    pipe = redis_conn.pipeline()
+    if selected:
+        pipe.srem(_deselected_key(session_id), *selected)
+    if deselected:
+        pipe.sadd(_deselected_key(session_id), *deselected)
+    pipe.expire(_deselected_key(session_id), TABLE_SESSION_TTL)
+    pipe.execute()
+
+
+def get_selected_row_ids(session_id, df=None):
+    """
+    Return the ids of all selected rows of a table session, in dataset order.
+
+    Args:
+        session_id (str): Table session id.
+        df (pd.DataFrame, optional): The session's DataFrame, if the caller already loaded it.
+    """
+    deselected = get_deselected_row_ids(session_id)
+    df = get_table_df(session_id) if df is None else df
+    return [row_id for row_id in df[ROW_ID_COLUMN] if row_id not in deselected]
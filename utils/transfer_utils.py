@@ -0,0 +1,300 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import bfabric_web_apps
+from bfabric_web_apps import get_power_user_wrapper
+
+# ------------------------------------------------------------------------------
+# RESUMABLE OUTPUT STAGING TO GSTORE
+# ------------------------------------------------------------------------------
+# After a run, its output tree is staged to gstore by a job on its own queue,
+# so pipeline workers are free again as soon as the pipeline finished:
+#
+# - same file system as gstore: files are hardlinked (or reflinked), no data moves;
+# - gstore mounted elsewhere: files are copied in parallel, large files in
+#   chunks; every finished chunk's SHA-256 is kept next to the partial file,
+#   so an interrupted copy resumes after re-verifying what is already there;
+# - gstore not mounted: rsync over ssh (--partial --append-verify) to the
+#   scratch area in parallel batches, then g-req moves it into gstore.
+#
+# Once the staged tree is complete, the run's B-Fabric resources are moved to
+# the gstore storage: run_main_job registered them on the app server's storage
+# with their local paths, which do not resolve once the local copy is gone
+# (or, without a mount, on any other host). A tree staged to a mounted gstore
+# is then read from there (results tab, reruns) and the local copy is removed;
+# without a mount, the app still needs the local copy and keeps it.
+TRANSFER_QUEUE = "transfer"
+TRANSFER_WORKERS = 8
+CHUNK_SIZE = 64 * 1024 * 1024
+PARTIAL_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+G_REQ_BIN = os.environ.get("G_REQ_BIN", "/usr/local/ngseq/bin/g-req")
+RESOURCE_QUERY_BATCH = 100
+GSTORE_STORAGE_ID = os.environ.get("GSTORE_STORAGE_ID", "2")  # B-Fabric storage whose base path is GSTORE_REMOTE_PATH
+
+
+def get_gstore_destination(token_data, output_dir):
+    """
+    Return the gstore directory of an output tree, in the entity folder the
+    attachments of the same entity use.
+    """
+    entity_class = token_data.get("entityClass_data")
+    entity_id = token_data.get("entity_id_data")
+    entity_folder = f"{entity_class}_{entity_id}" if entity_class and entity_id else "unknown_entity"
+    return f"{bfabric_web_apps.GSTORE_REMOTE_PATH}/{entity_folder}/{Path(output_dir).name}"
+
+
+def _existing_parent(path):
+    path = Path(path)
+    while not path.exists():
+        path = path.parent
+    return path
+
+
+def same_filesystem(source, destination):
+    """
+    Whether source and the (possibly not yet existing) destination share a file system.
+    """
+    return os.stat(source).st_dev == os.stat(_existing_parent(destination)).st_dev
+
+
+def link_or_reflink(source, destination):
+    """
+    Place source at destination without copying data.
+
+    Returns:
+        str | None: "hardlink" or "reflink", or None if neither is possible.
+    """
+    try:
+        os.link(source, destination)
+        return "hardlink"
+    except OSError:
+        pass
+
+    result = subprocess.run(["cp", "--reflink=always", "--preserve=timestamps", source, destination],
+                            capture_output=True)
+    return "reflink" if result.returncode == 0 else None
+
+
+def _load_state(state_path, source_stat):
+    try:
+        with open(state_path) as f:
+            state = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+    if state.get("size") != source_stat.st_size or state.get("mtime") != source_stat.st_mtime:
+        return None  # The source changed since the interrupted copy
+    return state
+
+
+def copy_file_chunked(source, destination, chunk_size=CHUNK_SIZE, max_workers=TRANSFER_WORKERS, executor=None):
+    """
+    Copy one file in parallel chunks, resuming an interrupted copy.
+
+    Data goes to destination + ".part"; the SHA-256 of every finished chunk is
+    recorded in destination + ".part.json". On resume, recorded chunks are
+    re-hashed from the partial file and only missing or corrupt ones are copied.
+    The chunks run on executor if given (shared by all files of a tree),
+    otherwise on a pool of max_workers threads of their own.
+
+    Returns:
+        int: Number of bytes actually copied (0 if everything was already there).
+    """
+    source_stat = os.stat(source)
+    partial_path = destination + PARTIAL_SUFFIX
+    state_path = destination + STATE_SUFFIX
+
+    state = _load_state(state_path, source_stat) if os.path.exists(partial_path) else None
+    if state is None:
+        state = {"size": source_stat.st_size, "mtime": source_stat.st_mtime, "chunks": {}}
+
+    n_chunks = max((source_stat.st_size + chunk_size - 1) // chunk_size, 1)
+    state_lock = threading.Lock()
+    copied = 0
+
+    src_fd = os.open(source, os.O_RDONLY)
+    dst_fd = os.open(partial_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        os.ftruncate(dst_fd, source_stat.st_size)
+
+        def verified(index):
+            digest = state["chunks"].get(str(index))
+            if digest is None:
+                return False
+            data = os.pread(dst_fd, chunk_size, index * chunk_size)
+            return hashlib.sha256(data).hexdigest() == digest
+
+        def copy_chunk(index):
+            nonlocal copied
+            if verified(index):
+                return
+            offset = index * chunk_size
+            data = os.pread(src_fd, chunk_size, offset)
+            os.pwrite(dst_fd, data, offset)
+            with state_lock:
+                state["chunks"][str(index)] = hashlib.sha256(data).hexdigest()
+                copied += len(data)
+                with open(state_path, "w") as f:
+                    json.dump(state, f)
+
+        if executor is not None:
+            list(executor.map(copy_chunk, range(n_chunks)))
+        else:
+            with ThreadPoolExecutor(max_workers=min(max_workers, n_chunks)) as chunk_executor:
+                list(chunk_executor.map(copy_chunk, range(n_chunks)))
+
+        os.fsync(dst_fd)
+    finally:
+        os.close(src_fd)
+        os.close(dst_fd)
+
+    shutil.copystat(source, partial_path)
+    os.replace(partial_path, destination)
+    if os.path.exists(state_path):
+        os.remove(state_path)
+
+    return copied
+
+
+def transfer_file(source, destination, max_workers=TRANSFER_WORKERS, executor=None):
+    """
+    Stage one file; skips files that were completely staged before.
+
+    Returns:
+        tuple: (method, bytes copied) with method one of
+               "skipped", "hardlink", "reflink" or "copy".
+    """
+    source_stat = os.stat(source)
+    if os.path.exists(destination):
+        destination_stat = os.stat(destination)
+        if destination_stat.st_size == source_stat.st_size and destination_stat.st_mtime == source_stat.st_mtime:
+            return "skipped", 0
+        os.remove(destination)
+
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+
+    if same_filesystem(source, os.path.dirname(destination)):
+        method = link_or_reflink(source, destination)
+        if method:
+            return method, 0
+
+    return "copy", copy_file_chunked(source, destination, max_workers=max_workers, executor=executor)
+
+
+def stage_output_tree(output_dir, destination, max_workers=TRANSFER_WORKERS):
+    """
+    Stage a whole output tree to a locally mounted destination.
+
+    Files are processed concurrently and large files are copied in chunks,
+    but all chunks go through one shared pool, so at most max_workers chunks
+    are read and written at a time. Running it again after an interruption
+    only finishes what is missing.
+
+    Returns:
+        dict: Number of files per method and the number of bytes copied.
+    """
+    files = [path for path in Path(output_dir).rglob("*") if path.is_file()]
+    summary = {"files": len(files), "bytes_copied": 0}
+    summary_lock = threading.Lock()
+
+    def stage(path):
+        target = os.path.join(destination, str(path.relative_to(output_dir)))
+        method, n_bytes = transfer_file(str(path), target, executor=chunk_executor)
+        with summary_lock:
+            summary[method] = summary.get(method, 0) + 1
+            summary["bytes_copied"] += n_bytes
+
+    # File threads only stat, link and wait for their chunks; the copying happens on chunk_executor.
+    with ThreadPoolExecutor(max_workers=max_workers) as chunk_executor:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            list(executor.map(stage, files))
+
+    return summary
+
+
+def verify_staged_tree(output_dir, destination):
+    """
+    Compare a staged tree with its source.
+
+    Returns:
+        list[str]: Relative paths that are missing at the destination or differ in size.
+    """
+    problems = []
+    for path in Path(output_dir).rglob("*"):
+        if not path.is_file():
+            continue
+        relative = str(path.relative_to(output_dir))
+        target = os.path.join(destination, relative)
+        if not os.path.isfile(target) or os.path.getsize(target) != path.stat().st_size:
+            problems.append(relative)
+    return problems
+
+
+def update_resource_paths(token_data, output_dir, destination, batch_size=RESOURCE_QUERY_BATCH):
+    """
+    Point the B-Fabric resources run_main_job registered for an output tree at its staged copy.
+
+    Each resource moves to the gstore storage, with its path relative to
+    that storage's base (GSTORE_REMOTE_PATH). Resources are looked up by
+    their local path, so running it again only updates the ones still
+    pointing at the output tree.
+
+    Returns:
+        int: Number of resources updated.
+    """
+    wrapper = get_power_user_wrapper(token_data)
+    local_paths = sorted(str(path) for path in Path(output_dir).rglob("*") if path.is_file())
+
+    updated = 0
+    for i in range(0, len(local_paths), batch_size):
+        for resource in wrapper.read("resource", {"relativepath": local_paths[i:i + batch_size]}):
+            staged_path = os.path.join(destination, os.path.relpath(resource["relativepath"], output_dir))
+            wrapper.save("resource", {
+                "id": resource["id"],
+                "storageid": GSTORE_STORAGE_ID,
+                "relativepath": os.path.relpath(staged_path, bfabric_web_apps.GSTORE_REMOTE_PATH)
+            })
+            updated += 1
+    return updated
+
+
+def stage_output_tree_remote(output_dir, destination, max_workers=TRANSFER_WORKERS):
+    """
+    Stage an output tree through the scratch area of the transfer host.
+
+    The files are split into max_workers batches and sent by parallel rsync
+    processes; --partial and --append-verify make an interrupted transfer
+    resume and verify the resumed files. g-req then moves the tree into gstore.
+
+    Returns:
+        dict: Number of files and batches.
+    """
+    files = sorted(str(path.relative_to(output_dir)) for path in Path(output_dir).rglob("*") if path.is_file())
+    remote_tmp_dir = f"{bfabric_web_apps.SCRATCH_PATH}/{Path(output_dir).name}"
+    ssh = f"ssh -i {bfabric_web_apps.TRX_SSH_KEY}"
+    batches = [files[i::max_workers] for i in range(max_workers) if files[i::max_workers]]
+
+    def send(batch):
+        subprocess.run(
+            ["rsync", "-a", "--partial", "--append-verify", "--files-from=-", "-e", ssh,
+             f"{output_dir}/", f"{bfabric_web_apps.TRX_LOGIN}:{remote_tmp_dir}/"],
+            input="\n".join(batch).encode("utf-8"), check=True
+        )
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        list(executor.map(send, batches))
+
+    subprocess.run(
+        ["ssh", "-i", bfabric_web_apps.TRX_SSH_KEY, bfabric_web_apps.TRX_LOGIN,
+         f"{G_REQ_BIN} copynow -f {remote_tmp_dir} {os.path.dirname(destination)}/"],
+        check=True
+    )
+    return {"files": len(files), "batches": len(batches)}
+
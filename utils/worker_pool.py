@@ -0,0 +1,199 @@
+import multiprocessing
+import os
+import threading
+import time
+
+import redis
+from rq import Worker, Queue, Connection
+from rq.exceptions import NoSuchJobError
+from rq.utils import utcnow
+from rq.worker import WorkerStatus
+from bfabric_web_apps.utils.redis_worker_init import keepalive_ping
+
+# ------------------------------------------------------------------------------
+# RESOURCE-SLOT-AWARE WORKER POOL
+# ------------------------------------------------------------------------------
+# Several RQ workers share one host-wide ledger of free CPUs and memory. A job
+# declares what it needs in job.meta ("cpus", "memory_gb"). A worker looks at
+# the jobs waiting at the front of its queues and only takes one off a queue
+# once its resources are reserved, so a job that does not fit yet stays
+# visible in the queue (and survives a worker dying) while smaller jobs behind
+# it start. A job that has waited longer than BACKFILL_LIMIT is no longer
+# overtaken, so it gets the next free slots.
+DEFAULT_JOB_CPUS = 1
+DEFAULT_JOB_MEMORY_GB = 2
+SLOT_POLL_INTERVAL = 5  # Seconds
+PEEK_DEPTH = 20  # Waiting jobs per queue considered for a free slot
+BACKFILL_LIMIT = 60 * 30  # Seconds a job may be overtaken by smaller ones
+
+
+def get_host_resources():
+    """
+    Return the CPUs and memory (GB) of this host.
+    """
+    memory_bytes = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    return os.cpu_count() or 1, int(memory_bytes / 1024 ** 3)
+
+
+class SlotLedger:
+    """
+    Free CPU and memory slots of the host, shared by all pool workers.
+    """
+
+    def __init__(self, cpus, memory_gb):
+        self.total_cpus = cpus
+        self.total_memory_gb = memory_gb
+        self.free_cpus = multiprocessing.Value("i", cpus, lock=False)
+        self.free_memory_gb = multiprocessing.Value("i", memory_gb, lock=False)
+        self.lock = multiprocessing.Lock()
+
+    def clamp(self, cpus, memory_gb):
+        # A job larger than the host would wait forever; let it run alone instead.
+        return min(cpus, self.total_cpus), min(memory_gb, self.total_memory_gb)
+
+    def try_acquire(self, cpus, memory_gb):
+        with self.lock:
+            if self.free_cpus.value >= cpus and self.free_memory_gb.value >= memory_gb:
+                self.free_cpus.value -= cpus
+                self.free_memory_gb.value -= memory_gb
+                return True
+            return False
+
+    def release(self, cpus, memory_gb):
+        with self.lock:
+            self.free_cpus.value += cpus
+            self.free_memory_gb.value += memory_gb
+
+
+def get_job_resources(job):
+    """
+    Read the resources a job declared at enqueue time.
+    """
+    meta = job.meta or {}
+    return int(meta.get("cpus", DEFAULT_JOB_CPUS)), int(meta.get("memory_gb", DEFAULT_JOB_MEMORY_GB))
+
+
+class SlotWorker(Worker):
+    """
+    RQ worker that reserves free host slots before it takes a job off its queue.
+    """
+
+    ledger = None
+    _reserved = None
+
+    def _reserve_next_job(self):
+        """
+        Take the first waiting job whose resources are free off its queue.
+
+        Returns:
+            tuple or None: (job, queue) with the job's slots reserved, or None.
+        """
+        for queue in self._ordered_queues:
+            for job_id in self.connection.lrange(queue.key, 0, PEEK_DEPTH - 1):
+                job_id = job_id.decode("utf-8")
+                try:
+                    job = self.job_class.fetch(job_id, connection=self.connection, serializer=self.serializer)
+                except NoSuchJobError:
+                    self.connection.lrem(queue.key, 1, job_id)
+                    continue
+
+                resources = self.ledger.clamp(*get_job_resources(job))
+                if self.ledger.try_acquire(*resources):
+                    # Only the worker whose LREM removed the id owns the job
+                    if self.connection.lrem(queue.key, 1, job_id):
+                        self._reserved = resources
+                        return job, queue
+                    self.ledger.release(*resources)
+                    continue
+
+                self.log.debug(f"Job {job_id} waits for {resources[0]} CPU(s) / {resources[1]} GB.")
+                if job.enqueued_at and (utcnow() - job.enqueued_at).total_seconds() > BACKFILL_LIMIT:
+                    # Waited long enough: no job behind it, in any queue, takes its slots
+                    return None
+        return None
+
+    def dequeue_job_and_maintain_ttl(self, timeout, max_idle_time=None):
+        self.set_state(WorkerStatus.IDLE)
+        self.procline("Listening on " + ",".join(self.queue_names()))
+        idle_since = time.time()
+        connection_wait_time = 1.0
+
+        while True:
+            try:
+                self.heartbeat()
+                if self.should_run_maintenance_tasks:
+                    self.run_maintenance_tasks()
+
+                result = self._reserve_next_job()
+            except redis.exceptions.ConnectionError as conn_err:
+                # Back off like rq's Worker.dequeue_job_and_maintain_ttl instead of dying
+                self.log.error(f"Could not connect to Redis instance: {conn_err} Retrying in {connection_wait_time} seconds...")
+                time.sleep(connection_wait_time)
+                connection_wait_time = min(connection_wait_time * self.exponential_backoff_factor,
+                                           self.max_connection_wait_time)
+                continue
+            connection_wait_time = 1.0
+
+            if result is not None:
+                job, queue = result
+                self.reorder_queues(reference_queue=queue)
+                job.redis_server_version = self.get_redis_server_version()
+                self.log.info(f"{queue.name}: {job.id} ({self._reserved[0]} CPU(s) / {self._reserved[1]} GB)")
+                self.heartbeat()
+                return result
+
+            if timeout is None:
+                return None  # Burst mode: nothing that fits is waiting
+            if max_idle_time is not None and time.time() - idle_since >= max_idle_time:
+                return None
+            time.sleep(SLOT_POLL_INTERVAL)
+
+    def execute_job(self, job, queue):
+        try:
+            return super().execute_job(job, queue)
+        finally:
+            if self._reserved:
+                self.ledger.release(*self._reserved)
+                self._reserved = None
+
+
+def _run_pool_worker(host, port, queue_names, ledger):
+    conn = redis.Redis(
+        host=host,
+        port=port,
+        socket_keepalive=True
+    )
+
+    # Start Redis keepalive thread
+    threading.Thread(target=keepalive_ping, args=(conn,), daemon=True).start()
+
+    SlotWorker.ledger = ledger
+    with Connection(conn):
+        worker = SlotWorker(map(Queue, queue_names))
+        worker.work(logging_level="INFO")
+
+
+def run_worker_pool(host, port, queue_names, n_workers, cpus=None, memory_gb=None):
+    """
+    Start n_workers RQ workers that share the host's CPU and memory slots.
+
+    Args:
+        host (str): Redis host.
+        port (int): Redis port.
+        queue_names (list[str]): Queues to listen on.
+        n_workers (int): Number of worker processes.
+        cpus (int, optional): CPUs to hand out; defaults to all host CPUs.
+        memory_gb (int, optional): Memory to hand out in GB; defaults to all host memory.
+    """
+    host_cpus, host_memory_gb = get_host_resources()
+    ledger = SlotLedger(cpus or host_cpus, memory_gb or host_memory_gb)
+    print(f"Starting {n_workers} worker(s) sharing {ledger.total_cpus} CPU(s) and {ledger.total_memory_gb} GB.")
+
+    processes = [
+        multiprocessing.Process(target=_run_pool_worker, args=(host, port, queue_names, ledger), name=f"rq-pool-{i}")
+        for i in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
@@ -0,0 +1,92 @@
+from dash import html
+import dash_bootstrap_components as dbc
+from bfabric_web_apps.objects.BfabricInterface import bfabric_interface
+
+from utils.cache_utils import cache_get, cache_set, make_cache_key
+
+# ------------------------------------------------------------------------------
+# INCREMENTAL WORKUNIT LIST
+# ------------------------------------------------------------------------------
+# The workunits of a user's job are cached in Redis. A sync only reads the
+# workunits that are new since the last sync plus the ones that can still change
+# (not yet AVAILABLE/FAILED), instead of re-reading the whole history.
+WORKUNIT_CACHE_TTL = 60 * 60 * 24  # Seconds
+WORKUNIT_CACHE_MAX_ENTRIES = 512
+FINAL_WORKUNIT_STATUSES = {"AVAILABLE", "FAILED"}
+
+ENVIRONMENT_URLS = {
+    "Test": "https://fgcz-bfabric-test.uzh.ch/bfabric/workunit/show.html?id=",
+    "Production": "https://fgcz-bfabric.uzh.ch/bfabric/workunit/show.html?id="
+}
+
+
+def sync_workunits(token_data):
+    """
+    Bring the cached workunit list of the user's job up to date.
+
+    Args:
+        token_data (dict): Token metadata.
+
+    Returns:
+        list[dict]: Workunits of the job, newest first.
+    """
+    cache_key = make_cache_key(token_data.get("environment"), token_data.get("user_data"), token_data.get("jobId"))
+    cached = cache_get("workunits", cache_key) or {}
+
+    # A wrapper of the user's own; the shared one only exists after an uncached token validation.
+    wrapper = bfabric_interface.token_response_to_bfabric(token_data)
+    job = wrapper.read("job", {"id": token_data.get("jobId")})[0]
+    job_workunit_ids = [wu["id"] for wu in job.get("workunit", [])]
+
+    to_fetch = [
+        wu_id for wu_id in job_workunit_ids
+        if wu_id not in cached or str(cached[wu_id].get("status", "")).upper() not in FINAL_WORKUNIT_STATUSES
+    ]
+
+    if to_fetch:
+        for wu in wrapper.read("workunit", {"id": to_fetch}):
+            cached[wu["id"]] = dict(wu)
+
+    # Drop workunits that are no longer linked to the job
+    cached = {wu_id: cached[wu_id] for wu_id in job_workunit_ids if wu_id in cached}
+    cache_set("workunits", cache_key, cached, ttl=WORKUNIT_CACHE_TTL, max_entries=WORKUNIT_CACHE_MAX_ENTRIES)
+
+    return sorted(cached.values(), key=lambda wu: wu["id"], reverse=True)
+
+
+def populate_cached_workunit_details(token_data):
+    """
+    Render the workunit cards of the current app instance from the synced cache.
+
+    Args:
+        token_data (dict): Token metadata.
+
+    Returns:
+        html.Div: A div containing the populated workunit data.
+    """
+    if not token_data:
+        return html.Div()
+
+    workunits = sync_workunits(token_data)
+    if not workunits:
+        return html.Div([html.P("No workunits found for the current job.")])
+
+    wu_cards = []
+    for wu in workunits:
+        wu_cards.append(html.A(
+            dbc.Card([
+                dbc.CardHeader(html.B(f"Workunit {wu['id']}")),
+                dbc.CardBody([
+                    html.P(f"Name: {wu.get('name', 'n/a')}"),
+                    html.P(f"Description: {wu.get('description', 'n/a')}"),
+                    html.P(f"Num Resources: {len(wu.get('resource', []))}"),
+                    html.P(f"Created: {wu.get('created', 'n/a')}"),
+                    html.P(f"Status: {wu.get('status', 'n/a')}")
+                ])
+            ], style={"width": "400px", "margin": "10px"}),
+            href=ENVIRONMENT_URLS.get(token_data.get("environment", "Test"), ENVIRONMENT_URLS["Test"]) + str(wu["id"]),
+            target="_blank",
+            style={"text-decoration": "none"}
+        ))
+
+    return dbc.Container(wu_cards, style={"display": "flex", "flex-wrap": "wrap"})